@@ -0,0 +1,45 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from typing import Iterable, List, Sequence
+
+def current_streak(completed_dates: Sequence[date], today: date, window: int | None = None) -> int:
+    """Count consecutive completed days ending at today, capped at window days.
+
+    completed_dates must be sorted ascending and free of duplicates.
+    """
+    streak = 0
+    expected = today
+    for d in reversed(completed_dates):
+        if d > today:
+            continue
+        if d != expected:
+            break
+        streak += 1
+        if window is not None and streak >= window:
+            break
+        expected -= timedelta(days=1)
+    return streak
+
+def longest_streak(completed_dates: Sequence[date]) -> int:
+    """Longest run of consecutive days in a sorted sequence of completed dates"""
+    longest = 0
+    run = 0
+    previous = None
+    for d in completed_dates:
+        if previous is not None and d - previous == timedelta(days=1):
+            run += 1
+        else:
+            run = 1
+        longest = max(longest, run)
+        previous = d
+    return longest
+
+def window_streaks(completed_dates: Sequence[date], today: date, windows: Iterable[int]) -> List[int]:
+    """Current streak capped at each window, computed from a single backwards scan"""
+    windows = list(windows)
+    full = current_streak(completed_dates, today, max(windows) if windows else None)
+    return [min(full, w) for w in windows]
+
+def count_in_range(completed_dates: Sequence[date], start: date, end: date) -> int:
+    """Number of sorted completed dates falling within [start, end]"""
+    return bisect_right(completed_dates, end) - bisect_left(completed_dates, start)
@@ -0,0 +1,51 @@
+"""Cache for computed insights and trends.
+
+Entries are keyed by the habit's ETag (see http_cache.py), which already
+encodes the habit, the day, and when the habit or its logs last changed, so
+upsert_log, archiving and any other habit update invalidate exactly that
+habit's entries: the next read looks them up under a new key and the stale
+ones age out. The version comes from the database rather than from in-process
+state, so cached values stay correct however many uvicorn workers there are.
+
+By default each worker keeps its own LRU; set ANALYTICS_CACHE_URL to a
+redis:// URL to share one cache between workers.
+"""
+import os
+from typing import Any, Awaitable, Callable
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+
+from cache import make_cache
+from http_cache import HabitValidators
+
+ANALYTICS_CACHE_URL = os.getenv("ANALYTICS_CACHE_URL")
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "4096"))
+ANALYTICS_CACHE_TTL_SECONDS = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "300"))
+
+analytics_cache = make_cache(ANALYTICS_CACHE_URL, ANALYTICS_CACHE_SIZE, ANALYTICS_CACHE_TTL_SECONDS, "analytics:")
+
+_MISSING = object()
+
+async def _call(fn, *args):
+    # A shared backend does network I/O, which must stay off the event loop
+    if analytics_cache.remote:
+        return await run_in_threadpool(fn, *args)
+    return fn(*args)
+
+async def cached(kind: str, validators: HabitValidators, params: tuple, compute: Callable[[], Awaitable[Any]]) -> Any:
+    """The cached result for this habit version and params, computing and storing it on a miss.
+
+    Results are stored in their JSON form so both backends hold the same thing;
+    None (habit not found) is never cached.
+    """
+    key = f"{kind}:{validators.etag}:{':'.join(map(str, params))}"
+    value = await _call(analytics_cache.get, key, _MISSING)
+    if value is not _MISSING:
+        return value
+    value = await compute()
+    if value is None:
+        return None
+    value = jsonable_encoder(value)
+    await _call(analytics_cache.set, key, value)
+    return value
@@ -1,28 +1,60 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
+from sqlalchemy import event
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
 
-from database import get_db
+from database import AsyncSessionLocal, get_async_db
 from models import User
+from cache import TTLCache
+import crud_async
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# When enabled, a valid token's claims are trusted as the caller's identity and
+# authenticated requests never touch the users table
+AUTH_STATELESS = os.getenv("AUTH_STATELESS", "false").lower() in ("1", "true", "yes")
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+
+user_cache = TTLCache(max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+# Raising this upgrades existing hashes as their users next log in
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 security = HTTPBearer()
 
+@dataclass(frozen=True)
+class CurrentUser:
+    """The authenticated caller, detached from any session so it can be cached"""
+    id: int
+    email: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+def _invalidate_cached_user(mapper, connection, target):
+    user_cache.delete(target.id)
+
+event.listen(User, "after_update", _invalidate_cached_user)
+event.listen(User, "after_delete", _invalidate_cached_user)
+
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(valid, new_hash): new_hash is set when the stored hash uses outdated parameters"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -33,28 +65,69 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str, credentials_exception):
+def decode_token(token: str, credentials_exception) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        return user_id
     except JWTError:
         raise credentials_exception
+    if payload.get("sub") is None:
+        raise credentials_exception
+    return payload
+
+def verify_token(token: str, credentials_exception):
+    return decode_token(token, credentials_exception)["sub"]
+
+async def load_user(db: AsyncSession, user_id: int) -> Optional[CurrentUser]:
+    """Resolve a user id to a CurrentUser, from the cache when possible"""
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+    user = await crud_async.get_user(db, user_id)
+    if user is None:
+        return None
+    current = CurrentUser(id=user.id, email=user.email, created_at=user.created_at)
+    user_cache.set(user_id, current)
+    return current
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_async_db)
+) -> CurrentUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     token = credentials.credentials
-    user_id = verify_token(token, credentials_exception)
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    claims = decode_token(token, credentials_exception)
+    try:
+        user_id = int(claims["sub"])
+    except ValueError:
+        raise credentials_exception
+    if AUTH_STATELESS:
+        return CurrentUser(id=user_id, email=claims.get("email"))
+    user = await load_user(db, user_id)
     if user is None:
         raise credentials_exception
     return user
+
+async def get_streaming_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> CurrentUser:
+    """get_current_user for long-lived responses: its session is closed before the response starts"""
+    async with AsyncSessionLocal() as db:
+        return await get_current_user(credentials, db)
+
+@dataclass(frozen=True)
+class HabitScope:
+    """A habit id from the path plus the caller it must belong to.
+
+    Resolving it costs no query: each habit-scoped data query checks
+    ownership itself and returns None when the habit isn't the caller's.
+    """
+    habit_id: int
+    user_id: int
+
+def get_habit_scope(
+    habit_id: int,
+    current_user: CurrentUser = Depends(get_current_user)
+) -> HabitScope:
+    return HabitScope(habit_id=habit_id, user_id=current_user.id)
@@ -0,0 +1,79 @@
+"""Login storm next to ordinary traffic.
+
+Some workers log in over and over (each login is a bcrypt verify) while the
+rest post check-ins. Reports latency percentiles per request type, so you can
+see whether bcrypt work slows the check-ins down, and how many logins were
+turned away with 429 once the password executor was full:
+
+    cd backend
+    uvicorn main:app --port 8000 --workers 1 &
+    python benchmarks/bench_auth_mix.py --logins 64 --checkins 32
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+
+import httpx
+
+from load_test import percentile, setup
+
+async def login_worker(client, email, deadline, results):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.post("/api/auth/login", json={"email": email, "password": "load-test"})
+        results.append((response.status_code, (time.perf_counter() - started) * 1000))
+        if response.status_code == 429:
+            await asyncio.sleep(float(response.headers.get("retry-after", "1")))
+
+async def checkin_worker(client, headers, habit_ids, deadline, results):
+    while time.perf_counter() < deadline:
+        habit_id = random.choice(habit_ids)
+        body = {"date": (date.today() - timedelta(days=random.randint(0, 30))).isoformat(), "completed": True}
+        started = time.perf_counter()
+        response = await client.post(f"/api/habits/{habit_id}/logs", headers=headers, json=body)
+        results.append((response.status_code, (time.perf_counter() - started) * 1000))
+
+def report(name, results, elapsed):
+    ok = [ms for code, ms in results if code < 400]
+    rejected = sum(1 for code, _ in results if code == 429)
+    failed = len(results) - len(ok) - rejected
+    print(f"{name:>8} {len(results):>9} {len(ok) / elapsed:>9.1f} "
+          f"{statistics.median(ok) if ok else 0:>8.1f} {percentile(ok, 95):>8.1f} {percentile(ok, 99):>8.1f} "
+          f"{rejected:>7} {failed:>7}")
+
+async def run(args):
+    connections = args.logins + args.checkins
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        headers, habit_ids = await setup(client, habits=3, days=0)
+        email = f"login-{uuid.uuid4().hex[:10]}@example.com"
+        await client.post("/api/auth/register", json={"email": email, "password": "load-test"})
+
+        logins, checkins = [], []
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(
+            *(login_worker(client, email, deadline, logins) for _ in range(args.logins)),
+            *(checkin_worker(client, headers, habit_ids, deadline, checkins) for _ in range(args.checkins)),
+        )
+        elapsed = time.perf_counter() - started
+
+        print(f"{'request':>8} {'requests':>9} {'ok rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'429s':>7} {'errors':>7}")
+        report("login", logins, elapsed)
+        report("checkin", checkins, elapsed)
+        print("password executor:", (await client.get("/api/metrics/passwords")).json())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--logins", type=int, default=64, help="concurrent login loops")
+    parser.add_argument("--checkins", type=int, default=32, help="concurrent check-in loops")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds to run")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Compare the ORM/list analytics with the NumPy columnar path.
+
+Fills a throwaway SQLite database with habits of --years of daily history,
+then times, per habit and for the whole cohort:
+
+  load     logs_in_range (ORM objects) vs columnar.load_columns (arrays)
+  streaks  analytics.current_streak/longest_streak vs their columnar versions
+  buckets  trends.buckets_from_logs vs columnar.bucket_rows (weekly, all years)
+  rolling  a 7-day rolling completion rate for every day, list vs NumPy
+
+and checks both paths return the same answers.
+
+    cd backend
+    python benchmarks/bench_columnar.py --habits 20 --years 1 5 10
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench_columnar.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+import analytics
+import columnar
+from crud import logs_in_range
+from database import Base, SessionLocal, engine
+from trends import buckets_from_logs, rolling_ranges
+
+def fill(habits: int, days: int, density: float = 0.7):
+    today = date.today()
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute("DELETE FROM habit_logs")
+        cur.execute("DELETE FROM habits")
+        cur.executemany(
+            "INSERT INTO habits (id, user_id, name, htype, archived, start_date) VALUES (?, 1, ?, 'quantity', 0, ?)",
+            [(h, f"habit {h}", (today - timedelta(days=days - 1)).isoformat()) for h in range(1, habits + 1)]
+        )
+        cur.executemany(
+            "INSERT INTO habit_logs (habit_id, date, completed, value) VALUES (?, ?, ?, ?)",
+            [
+                (h, (today - timedelta(days=i)).isoformat(), random.random() < density,
+                 random.randint(0, 10) if random.random() < 0.8 else None)
+                for h in range(1, habits + 1) for i in range(days) if random.random() < 0.9
+            ]
+        )
+        raw.commit()
+    finally:
+        raw.close()
+
+def median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+def list_rolling_rate(completed_dates, start: date, end: date, window: int):
+    done = set(completed_dates)
+    rates = []
+    day = start
+    while day <= end:
+        length = min(window, (day - start).days + 1)
+        hits = sum(1 for k in range(length) if day - timedelta(days=k) in done)
+        rates.append(hits / length * 100)
+        day += timedelta(days=1)
+    return rates
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--habits", type=int, default=20)
+    parser.add_argument("--years", nargs="+", type=int, default=[1, 5, 10])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, email, hashed_password) VALUES (1, 'bench@example.com', '')"))
+
+    today = date.today()
+    habit_ids = list(range(1, args.habits + 1))
+    print(f"{'years':>5} {'rows':>9} {'step':>8} {'lists ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for years in args.years:
+        days = years * 365
+        fill(args.habits, days)
+        start = today - timedelta(days=days - 1)
+        ranges = rolling_ranges(days // 7, 7, today)
+        db = SessionLocal()
+        try:
+            orm_logs = {h: logs_in_range(db, h, start, today) for h in habit_ids}
+            cols = columnar.load_columns(db, habit_ids, start, today)
+            per_habit = {h: cols.habit(h) for h in habit_ids}
+            pairs = {h: [(log.date, log.completed) for log in orm_logs[h]] for h in habit_ids}
+            dates = {h: [d for d, done in pairs[h] if done] for h in habit_ids}
+
+            # Both paths must agree before their timings mean anything
+            for h in habit_ids:
+                ordinals = per_habit[h].completed_ordinals()
+                assert columnar.current_streak(ordinals, today) == analytics.current_streak(dates[h], today)
+                assert columnar.longest_streak(ordinals) == analytics.longest_streak(dates[h])
+                assert columnar.bucket_rows(per_habit[h], ranges, today) == buckets_from_logs(pairs[h], ranges, today)
+
+            steps = [
+                ("load",
+                 lambda: [logs_in_range(db, h, start, today) for h in habit_ids],
+                 lambda: columnar.load_columns(db, habit_ids, start, today)),
+                ("streaks",
+                 lambda: [(analytics.current_streak(dates[h], today), analytics.longest_streak(dates[h])) for h in habit_ids],
+                 lambda: [(columnar.current_streak(c.completed_ordinals(), today), columnar.longest_streak(c.completed_ordinals()))
+                          for c in per_habit.values()]),
+                ("buckets",
+                 lambda: [buckets_from_logs(pairs[h], ranges, today) for h in habit_ids],
+                 lambda: [columnar.bucket_sums(c, ranges, today) for c in per_habit.values()]),
+                ("rolling",
+                 lambda: [list_rolling_rate(dates[h], start, today, 7) for h in habit_ids],
+                 lambda: [columnar.rolling_completion_rate(c, start, today, 7) for c in per_habit.values()]),
+            ]
+            for name, baseline, vectorized in steps:
+                before = median_ms(baseline, args.repeat)
+                after = median_ms(vectorized, args.repeat)
+                print(f"{years:>5} {len(cols):>9,} {name:>8} {before:>10.2f} {after:>10.2f} {before / after:>7.1f}x")
+        finally:
+            db.close()
+    os.remove(DB_PATH)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Time the habit_logs range queries as the table grows.
+
+Fills a throwaway SQLite database with synthetic logs (ten years per habit)
+and reports the median latency of logs_in_range and the trend functions at
+each size. With the (habit_id, date) index the numbers should stay flat;
+pass --no-index to see the full-scan behaviour for comparison.
+
+    cd backend
+    python benchmarks/bench_log_queries.py 100000 1000000 10000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench_logs.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from database import Base, SessionLocal, engine
+from crud import logs_in_range, get_weekly_trend, get_monthly_trend
+
+DAYS_PER_HABIT = 3650
+CHUNK = 50_000
+
+def fill(target_rows: int, current_rows: int, density: float = 0.7):
+    """Append habits with DAYS_PER_HABIT logs each until target_rows is reached"""
+    today = date.today()
+    first_habit = current_rows // DAYS_PER_HABIT + 1
+    last_habit = max(first_habit, target_rows // DAYS_PER_HABIT)
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.executemany(
+            "INSERT INTO habits (id, user_id, name, htype, archived, start_date) VALUES (?, 1, ?, 'boolean', 0, ?)",
+            [(h, f"habit {h}", (today - timedelta(days=DAYS_PER_HABIT - 1)).isoformat())
+             for h in range(first_habit, last_habit + 1)]
+        )
+        batch = []
+        for h in range(first_habit, last_habit + 1):
+            for i in range(DAYS_PER_HABIT):
+                batch.append((h, (today - timedelta(days=i)).isoformat(), random.random() < density))
+                if len(batch) >= CHUNK:
+                    cur.executemany("INSERT INTO habit_logs (habit_id, date, completed) VALUES (?, ?, ?)", batch)
+                    batch.clear()
+        if batch:
+            cur.executemany("INSERT INTO habit_logs (habit_id, date, completed) VALUES (?, ?, ?)", batch)
+        raw.commit()
+    finally:
+        raw.close()
+    return last_habit
+
+def median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sizes", nargs="*", type=int, default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--no-index", action="store_true", help="drop the composite index before measuring")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, email, hashed_password) VALUES (1, 'bench@example.com', '')"))
+        if args.no_index:
+            conn.execute(text("DROP INDEX uq_habit_logs_habit_id_date"))
+
+    today = date.today()
+    rows = 0
+    print(f"{'rows':>12} {'logs_in_range':>14} {'weekly':>10} {'monthly':>10}  (median ms)")
+    for size in sorted(args.sizes):
+        habits = fill(size, rows)
+        rows = habits * DAYS_PER_HABIT
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        db = SessionLocal()
+        try:
+            habit_id = random.randint(1, habits)
+            results = [
+                median_ms(lambda: logs_in_range(db, habit_id, today - timedelta(days=30), today), args.repeat),
+                median_ms(lambda: get_weekly_trend(db, habit_id), args.repeat),
+                median_ms(lambda: get_monthly_trend(db, habit_id), args.repeat),
+            ]
+        finally:
+            db.close()
+        print(f"{rows:>12,} {results[0]:>14.2f} {results[1]:>10.2f} {results[2]:>10.2f}")
+
+    with engine.connect() as conn:
+        plan = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM habit_logs WHERE habit_id = 1 AND date >= '2024-01-01' AND date <= '2024-02-01'"
+        )).all()
+    print("\nquery plan:", "; ".join(row[-1] for row in plan))
+    os.remove(DB_PATH)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""Benchmark every API endpoint and the export functions at several data sizes.
+
+For each size the suite generates a fresh SQLite database with datagen.py,
+then calls every route in main.py in-process (through FastAPI's TestClient)
+as one of the generated users, plus the CSV and PDF export functions
+directly. Per case it reports latency percentiles, the number of SQL
+statements issued per call, and the peak Python heap allocated during one
+call (tracemalloc). The analytics cache is cleared before every call, so
+insights and trends measure the query and compute path a code change
+affects; PDF jobs are served from the finished-report cache, as they are
+for a repeat download.
+
+Each size runs in its own process so module-level state (engines, caches)
+starts clean. Save a baseline, change the code, then compare against it:
+
+    cd backend
+    python benchmarks/bench_suite.py --sizes small medium --save before
+    python benchmarks/bench_suite.py --sizes small medium --compare before
+
+benchmarks/baselines/baseline.json is the committed reference for small and
+medium; compare against it with --compare baseline, and refresh it with
+--save baseline when a change moves the numbers on purpose.
+
+--compare exits with status 1 if any case got slower than --tolerance
+(beyond a 1 ms noise floor), issues more queries, or allocates more than
+--tolerance extra memory. Baselines are JSON files in benchmarks/baselines/.
+Latencies only compare meaningfully on the same machine; query counts
+compare anywhere.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datagen import DataSpec
+from load_test import percentile
+
+SIZES = {
+    "small": DataSpec(users=20, habits_per_user=5, years=1),
+    "medium": DataSpec(users=200, habits_per_user=5, years=3),
+    "large": DataSpec(users=500, habits_per_user=6, years=5),
+}
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+NOISE_FLOOR_MS = 1.0
+# Routes with no meaningful per-call latency: the event stream stays open until the client leaves
+UNBENCHMARKED = {("GET", "/api/events")}
+
+@dataclass
+class Case:
+    name: str
+    method: str = "GET"
+    route: str = ""
+    query: str = ""
+    body: Optional[Callable[[Dict, int], Dict]] = None
+    params: Optional[Callable[[Dict, int], Dict]] = None
+    call: Optional[Callable[[Dict], object]] = None  # a function case instead of a route
+    repeat: Optional[int] = None
+
+def _today(offset: int = 0) -> str:
+    return (date.today() - timedelta(days=offset)).isoformat()
+
+# Reads first, writes last, so the reads all see the generated data
+CASES = [
+    Case("GET /api/habits", route="/api/habits"),
+    Case("GET /api/dashboard", route="/api/dashboard"),
+    Case("GET activity heatmap", route="/api/activity/heatmap"),
+    Case("GET logs (30 days)", route="/api/habits/{habit_id}/logs"),
+    Case("GET logs (1 year page)", route="/api/habits/{habit_id}/logs", query="start_date={year_ago}&limit=366"),
+    Case("GET logs (all, ndjson)", route="/api/habits/{habit_id}/logs", query="start_date=2000-01-01&format=ndjson"),
+    Case("GET insights", route="/api/habits/{habit_id}/insights"),
+    Case("GET weekly trend", route="/api/habits/{habit_id}/trends/weekly", query="weeks=52"),
+    Case("GET monthly trend", route="/api/habits/{habit_id}/trends/monthly", query="months=12&calendar=true"),
+    Case("GET chart data", route="/api/habits/{habit_id}/chart-data", query="days=90"),
+    Case("GET analytics (all sections)", route="/api/habits/{habit_id}/analytics", query="days=90&weeks=12&months=6"),
+    Case("GET /api/export/csv", route="/api/export/csv"),
+    Case("GET /api/export/pdf", route="/api/export/pdf", repeat=3),
+    Case("POST pdf job", method="POST", route="/api/export/pdf/jobs"),
+    Case("GET pdf job", route="/api/export/pdf/jobs/{job_id}"),
+    Case("GET pdf job download", route="/api/export/pdf/jobs/{job_id}/download"),
+    Case("GET /api/metrics/cache", route="/api/metrics/cache"),
+    Case("GET /api/metrics/pool", route="/api/metrics/pool"),
+    Case("GET /api/metrics/passwords", route="/api/metrics/passwords"),
+    Case("GET /api/metrics/events", route="/api/metrics/events"),
+    Case("GET /metrics", route="/metrics"),
+    Case("GET /", route="/"),
+    Case("export.generate_csv_report", call=lambda ctx: _with_session(ctx["export"].generate_csv_report, ctx["user_id"])),
+    Case("export.generate_pdf_report", call=lambda ctx: _with_session(ctx["export"].generate_pdf_report, ctx["user_id"]),
+         repeat=3),
+    Case("POST /api/auth/login", method="POST", route="/api/auth/login", repeat=3,
+         body=lambda ctx, i: {"email": ctx["email"], "password": ctx["password"]}),
+    Case("POST /api/auth/register", method="POST", route="/api/auth/register", repeat=3,
+         body=lambda ctx, i: {"email": f"bench-new-{i}@example.com", "password": ctx["password"]}),
+    Case("POST log (upsert)", method="POST", route="/api/habits/{habit_id}/logs",
+         body=lambda ctx, i: {"date": _today(i % 30), "completed": i % 3 != 0}),
+    Case("POST /api/logs/bulk (30)", method="POST", route="/api/logs/bulk",
+         body=lambda ctx, i: {"logs": [
+             {"habit_id": ctx["habit_id"], "date": _today(d), "completed": (d + i) % 2 == 0} for d in range(30)
+         ]}),
+    Case("POST /api/habits", method="POST", route="/api/habits",
+         body=lambda ctx, i: {"name": f"new habit {i}", "htype": "boolean", "start_date": _today()}),
+    Case("DELETE habit (archive)", method="DELETE", route="/api/habits/{habit_id}",
+         params=lambda ctx, i: {"habit_id": ctx["spare_habit_ids"][i]}),
+]
+
+def _with_session(fn, *args):
+    from database import SessionLocal
+    with SessionLocal() as db:
+        return fn(db, *args)
+
+class QueryCounter:
+    def __init__(self, engines):
+        from sqlalchemy import event
+        self.count = 0
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._executed)
+
+    def _executed(self, *args):
+        self.count += 1
+
+def _measure(run: Callable[[int], None], repeat: int, reset: Callable[[], None], counter: QueryCounter) -> Dict:
+    latencies, queries = [], []
+    for i in range(repeat):
+        reset()
+        counter.count = 0
+        started = time.perf_counter()
+        run(i)
+        latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count)
+
+    # Measured on a separate call: tracing allocations slows everything down
+    reset()
+    tracemalloc.start()
+    try:
+        run(repeat)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "queries": statistics.median(queries),
+        "peak_kib": peak / 1024,
+    }
+
+def run_size(size: str, repeat: int) -> Dict[str, Dict]:
+    """Generate a database for size and benchmark every case against it (call in a fresh process)"""
+    # Imported here: DATABASE_URL must point at the benchmark database first
+    from fastapi.routing import APIRoute
+    from fastapi.testclient import TestClient
+    from datagen import PASSWORD, email_for, generate
+    from database import async_engine, engine
+    from models import Habit
+    from sqlalchemy import select
+    from analytics_cache import analytics_cache
+    import export
+    import main
+
+    generate(SIZES[size])
+    client = TestClient(main.app)
+    email = email_for(1)
+    token = client.post("/api/auth/login", json={"email": email, "password": PASSWORD}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    with engine.connect() as conn:
+        habit_ids = conn.execute(select(Habit.id).where(Habit.user_id == 1).order_by(Habit.id)).scalars().all()
+
+    spare_count = max(case.repeat or repeat for case in CASES) + 1
+    spare_habit_ids = [
+        client.post("/api/habits", headers=headers, json={"name": f"spare {n}", "htype": "boolean", "start_date": _today()}).json()["id"]
+        for n in range(spare_count)
+    ]
+    job = client.post("/api/export/pdf/jobs", headers=headers).json()
+    while job["status"] not in ("done", "failed"):
+        time.sleep(0.1)
+        job = client.get(f"/api/export/pdf/jobs/{job['id']}", headers=headers).json()
+
+    ctx = {
+        "user_id": 1, "email": email, "password": PASSWORD, "habit_id": habit_ids[0],
+        "spare_habit_ids": spare_habit_ids, "job_id": job["id"], "year_ago": _today(365), "export": export,
+    }
+    counter = QueryCounter([engine, async_engine.sync_engine])
+
+    def reset():
+        analytics_cache.clear()
+
+    covered = {(case.method, case.route) for case in CASES if case.call is None} | UNBENCHMARKED
+    for route in main.app.routes:
+        if isinstance(route, APIRoute):
+            for method in route.methods:
+                if (method, route.path) not in covered:
+                    print(f"warning: {method} {route.path} has no benchmark case", file=sys.stderr)
+
+    results = {}
+    for case in CASES:
+        def run(i, case=case):
+            if case.call is not None:
+                case.call(ctx)
+                return
+            values = {**ctx, **(case.params(ctx, i) if case.params else {})}
+            url = case.route.format(**values) + ("?" + case.query.format(**values) if case.query else "")
+            response = client.request(
+                case.method, url, headers=headers, json=case.body(ctx, i) if case.body else None
+            )
+            if response.status_code >= 400:
+                raise RuntimeError(f"{case.name}: {response.status_code} {response.text[:200]}")
+        results[case.name] = _measure(run, case.repeat or repeat, reset, counter)
+    return results
+
+def print_results(size: str, results: Dict[str, Dict], baseline: Optional[Dict[str, Dict]] = None):
+    print(f"\n== {size}: {asdict(SIZES[size])}")
+    print(f"{'case':<32} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'peak KiB':>10}")
+    for name, metrics in results.items():
+        line = (f"{name:<32} {metrics['p50_ms']:>9.2f} {metrics['p95_ms']:>9.2f} {metrics['p99_ms']:>9.2f} "
+                f"{metrics['queries']:>8g} {metrics['peak_kib']:>10.0f}")
+        base = (baseline or {}).get(name)
+        if base:
+            line += f"   vs {base['p50_ms']:.2f} ms, {base['queries']:g} queries, {base['peak_kib']:.0f} KiB"
+        print(line)
+
+def regressions(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    found = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if metrics["p50_ms"] > base["p50_ms"] * (1 + tolerance) and metrics["p50_ms"] - base["p50_ms"] > NOISE_FLOOR_MS:
+            found.append(f"{name}: p50 {base['p50_ms']:.2f} -> {metrics['p50_ms']:.2f} ms")
+        if metrics["queries"] > base["queries"]:
+            found.append(f"{name}: queries {base['queries']:g} -> {metrics['queries']:g}")
+        if metrics["peak_kib"] > base["peak_kib"] * (1 + tolerance) and metrics["peak_kib"] - base["peak_kib"] > 64:
+            found.append(f"{name}: peak memory {base['peak_kib']:.0f} -> {metrics['peak_kib']:.0f} KiB")
+    return found
+
+def _run_child(size: str, repeat: int) -> Dict[str, Dict]:
+    workdir = tempfile.mkdtemp()
+    output = os.path.join(workdir, "results.json")
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}", "PDF_EXPORT_WORKERS": "1"}
+    for name in ("DATABASE_REPLICA_URL", "ANALYTICS_CACHE_URL"):
+        env.pop(name, None)
+    subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", size, "--repeat", str(repeat), "--output", output],
+        env=env, check=True
+    )
+    with open(output) as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["small", "medium"])
+    parser.add_argument("--repeat", type=int, default=20, help="timed calls per case")
+    parser.add_argument("--save", metavar="NAME", help="save the results as baseline NAME")
+    parser.add_argument("--compare", metavar="NAME", help="compare against baseline NAME")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown before flagging")
+    parser.add_argument("--child", choices=list(SIZES), help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        with open(args.output, "w") as f:
+            json.dump(run_size(args.child, args.repeat), f)
+        return
+
+    baseline = {}
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)["results"]
+
+    results, found = {}, []
+    for size in args.sizes:
+        results[size] = _run_child(size, args.repeat)
+        print_results(size, results[size], baseline.get(size))
+        found += [f"[{size}] {line}" for line in regressions(results[size], baseline.get(size, {}), args.tolerance)]
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(os.path.join(BASELINE_DIR, f"{args.save}.json"), "w") as f:
+            json.dump({
+                "python": platform.python_version(), "machine": platform.platform(), "date": date.today().isoformat(),
+                "sizes": {size: asdict(SIZES[size]) for size in args.sizes}, "results": results,
+            }, f, indent=2)
+        print(f"\nsaved baseline {args.save}")
+    if args.compare:
+        print(f"\n{len(found)} regression(s) against {args.compare}")
+        for line in found:
+            print("  " + line)
+        sys.exit(1 if found else 0)
+
+if __name__ == "__main__":
+    main()
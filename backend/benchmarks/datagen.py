@@ -0,0 +1,141 @@
+"""Fill a database with synthetic users, habits and logs for benchmarking.
+
+Creates --users users with --habits habits each and --years of daily history
+per habit, then rebuilds habit_stats so the materialized statistics match the
+logs (as migrations.py/habit_stats.py would on a real database). Completed
+days come in streaks: each day repeats the previous day's outcome with
+probability --streakiness and otherwise is drawn at --density, so the
+long-run completion rate is --density whatever the streakiness. Missed days
+get an explicit "not completed" log with probability --miss-logged.
+
+Every user's password is "bench-password", and their emails are
+bench-<n>@example.com. The data is the same for the same --seed.
+
+    cd backend
+    DATABASE_URL=sqlite:///./bench.db python benchmarks/datagen.py --users 100 --habits 5 --years 3
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert, select
+
+from auth import hash_password
+from database import Base, SessionLocal, engine
+from habit_stats import rebuild_all
+from models import Habit, HabitLog, User
+
+PASSWORD = "bench-password"
+CHUNK = 50_000
+HABIT_TYPES = ("boolean", "boolean", "quantity", "time")
+
+@dataclass(frozen=True)
+class DataSpec:
+    users: int = 10
+    habits_per_user: int = 5
+    years: float = 1.0
+    density: float = 0.7
+    streakiness: float = 0.6
+    miss_logged: float = 0.3
+    seed: int = 42
+
+    @property
+    def days(self) -> int:
+        return max(1, int(self.years * 365))
+
+def email_for(n: int) -> str:
+    return f"bench-{n}@example.com"
+
+def _day_outcomes(rng: random.Random, spec: DataSpec, days: int):
+    completed = rng.random() < spec.density
+    for _ in range(days):
+        if rng.random() >= spec.streakiness:
+            completed = rng.random() < spec.density
+        yield completed
+
+def _log_rows(rng: random.Random, spec: DataSpec, habit_id: int, htype: str, goal: int | None, start: date, now: datetime):
+    for offset, completed in enumerate(_day_outcomes(rng, spec, spec.days)):
+        if not completed and rng.random() >= spec.miss_logged:
+            continue
+        value = None
+        if htype != "boolean":
+            value = rng.randint(goal, goal * 2) if completed else rng.randint(0, goal - 1)
+        yield {
+            "habit_id": habit_id, "date": start + timedelta(days=offset), "value": value,
+            "completed": completed, "created_at": now, "updated_at": now,
+        }
+
+def generate(spec: DataSpec, verbose: bool = True) -> int:
+    """Append spec's users, habits and logs to the database; returns the number of logs written"""
+    rng = random.Random(spec.seed)
+    today = date.today()
+    start = today - timedelta(days=spec.days - 1)
+    now = datetime.utcnow()
+    hashed_password = hash_password(PASSWORD)
+    Base.metadata.create_all(bind=engine)
+
+    written = 0
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        first_user = (conn.execute(select(func.max(User.id))).scalar() or 0) + 1
+        first_habit = (conn.execute(select(func.max(Habit.id))).scalar() or 0) + 1
+        conn.execute(insert(User), [
+            {"id": first_user + n, "email": email_for(first_user + n), "hashed_password": hashed_password, "created_at": now}
+            for n in range(spec.users)
+        ])
+
+        habits = []
+        for n in range(spec.users * spec.habits_per_user):
+            htype = rng.choice(HABIT_TYPES)
+            habits.append({
+                "id": first_habit + n, "user_id": first_user + n // spec.habits_per_user,
+                "name": f"{htype} habit {n % spec.habits_per_user + 1}", "htype": htype,
+                "goal": None if htype == "boolean" else rng.choice((5, 10, 30)),
+                "archived": False, "start_date": start, "created_at": now, "updated_at": now,
+            })
+        conn.execute(insert(Habit), habits)
+
+        batch = []
+        for habit in habits:
+            batch.extend(_log_rows(rng, spec, habit["id"], habit["htype"], habit["goal"], start, now))
+            if len(batch) >= CHUNK:
+                conn.execute(insert(HabitLog), batch)
+                written += len(batch)
+                batch.clear()
+        if batch:
+            conn.execute(insert(HabitLog), batch)
+            written += len(batch)
+    if verbose:
+        print(f"wrote {spec.users} users, {len(habits)} habits, {written:,} logs "
+              f"in {time.perf_counter() - started:.1f}s; rebuilding habit_stats")
+
+    with SessionLocal() as db:
+        rebuild_all(db)
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    defaults = DataSpec()
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--habits", type=int, default=defaults.habits_per_user, help="habits per user")
+    parser.add_argument("--years", type=float, default=defaults.years, help="years of daily history per habit")
+    parser.add_argument("--density", type=float, default=defaults.density, help="long-run share of completed days")
+    parser.add_argument("--streakiness", type=float, default=defaults.streakiness,
+                        help="chance a day repeats the previous day's outcome")
+    parser.add_argument("--miss-logged", type=float, default=defaults.miss_logged,
+                        help="chance a missed day still has a 'not completed' log")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    args = parser.parse_args()
+    generate(DataSpec(
+        users=args.users, habits_per_user=args.habits, years=args.years, density=args.density,
+        streakiness=args.streakiness, miss_logged=args.miss_logged, seed=args.seed
+    ))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""HTTP load test for a running API server.
+
+Registers a throwaway user, creates a few habits with some history, then
+drives a read-heavy mix of dashboard, logs, insights and check-in requests
+at each concurrency level and reports throughput and latency percentiles.
+Run it against two builds (e.g. before and after a change) to compare:
+
+    cd backend
+    uvicorn main:app --port 8000 --workers 1 &
+    python benchmarks/load_test.py --url http://localhost:8000 --concurrency 16 64 256
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+
+import httpx
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def setup(client: httpx.AsyncClient, habits: int, days: int):
+    email = f"load-{uuid.uuid4().hex[:10]}@example.com"
+    await client.post("/api/auth/register", json={"email": email, "password": "load-test"})
+    token = (await client.post("/api/auth/login", json={"email": email, "password": "load-test"})).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    today = date.today()
+    habit_ids = []
+    for i in range(habits):
+        habit = await client.post("/api/habits", headers=headers, json={
+            "name": f"habit {i}", "htype": "boolean", "start_date": (today - timedelta(days=days)).isoformat()
+        })
+        habit_ids.append(habit.json()["id"])
+        for d in range(days):
+            if random.random() < 0.7:
+                await client.post(f"/api/habits/{habit_ids[-1]}/logs", headers=headers, json={
+                    "date": (today - timedelta(days=d)).isoformat(), "completed": True
+                })
+    return headers, habit_ids
+
+def pick_request(habit_ids):
+    habit_id = random.choice(habit_ids)
+    roll = random.random()
+    if roll < 0.3:
+        return "GET", f"/api/habits/{habit_id}/insights", None
+    if roll < 0.6:
+        return "GET", f"/api/habits/{habit_id}/logs", None
+    if roll < 0.8:
+        return "GET", "/api/habits", None
+    offset = random.randint(0, 30)
+    return "POST", f"/api/habits/{habit_id}/logs", {
+        "date": (date.today() - timedelta(days=offset)).isoformat(), "completed": random.random() < 0.8
+    }
+
+async def worker(client, headers, habit_ids, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        method, path, body = pick_request(habit_ids)
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, headers=headers, json=body)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+        except httpx.HTTPError as error:
+            errors.append(type(error).__name__)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+async def run(args):
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        headers, habit_ids = await setup(client, args.habits, args.days)
+        print(f"{'concurrency':>11} {'requests':>9} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for concurrency in args.concurrency:
+            latencies, errors = [], []
+            started = time.perf_counter()
+            deadline = started + args.duration
+            await asyncio.gather(*(
+                worker(client, headers, habit_ids, deadline, latencies, errors) for _ in range(concurrency)
+            ))
+            elapsed = time.perf_counter() - started
+            print(f"{concurrency:>11} {len(latencies):>9} {len(latencies) / elapsed:>9.1f} "
+                  f"{statistics.median(latencies) if latencies else 0:>8.1f} "
+                  f"{percentile(latencies, 95):>8.1f} {percentile(latencies, 99):>8.1f} {len(errors):>7}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[16, 64, 256])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--habits", type=int, default=5)
+    parser.add_argument("--days", type=int, default=60, help="days of history to seed per habit")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
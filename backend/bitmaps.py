@@ -0,0 +1,83 @@
+"""Completion history of a habit as a bitset, one bit per day.
+
+Bit i is set when the habit was completed on origin + i days. The bitset is a
+Python int, so streaks and windowed counts are a handful of shifts, masks,
+bit_length and bit_count calls on a few hundred bytes even for decade-long
+habits, instead of a walk over one log per day. habit_stats stores it as
+little-endian bytes next to the running totals.
+"""
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterable, Optional
+
+@dataclass
+class CompletionBitmap:
+    origin: Optional[date] = None
+    bits: int = 0
+
+    @classmethod
+    def from_dates(cls, completed_dates: Iterable[date]) -> "CompletionBitmap":
+        bitmap = cls()
+        for d in completed_dates:
+            bitmap.set(d, True)
+        return bitmap
+
+    @classmethod
+    def from_bytes(cls, origin: Optional[date], data: Optional[bytes]) -> "CompletionBitmap":
+        return cls(origin=origin, bits=int.from_bytes(data or b"", "little"))
+
+    def to_bytes(self) -> bytes:
+        return self.bits.to_bytes((self.bits.bit_length() + 7) // 8, "little")
+
+    def _index(self, d: date) -> int:
+        return (d - self.origin).days
+
+    def set(self, d: date, completed: bool):
+        if self.origin is None:
+            self.origin = d
+        elif d < self.origin:
+            # Move the origin back so every bit keeps a non-negative index
+            self.bits <<= (self.origin - d).days
+            self.origin = d
+        if completed:
+            self.bits |= 1 << self._index(d)
+        else:
+            self.bits &= ~(1 << self._index(d))
+
+    def is_set(self, d: date) -> bool:
+        return self.origin is not None and d >= self.origin and bool(self.bits >> self._index(d) & 1)
+
+    def last(self) -> Optional[date]:
+        """The latest completed day, or None if there are none"""
+        if not self.bits:
+            return None
+        return self.origin + timedelta(days=self.bits.bit_length() - 1)
+
+    def count(self, start: date, end: date) -> int:
+        """Completed days in [start, end]"""
+        if self.origin is None or end < start:
+            return 0
+        lo = max(self._index(start), 0)
+        hi = self._index(end)
+        if hi < lo:
+            return 0
+        return (self.bits >> lo & ((1 << (hi - lo + 1)) - 1)).bit_count()
+
+    def run_ending(self, day: date) -> int:
+        """Consecutive completed days ending at day (0 if day itself wasn't completed)"""
+        if not self.is_set(day):
+            return 0
+        width = self._index(day) + 1
+        # The highest clear bit at or below day marks where the run starts
+        gaps = ~self.bits & ((1 << width) - 1)
+        return width - gaps.bit_length()
+
+    def longest_run(self) -> int:
+        """Longest run of consecutive completed days"""
+        longest = 0
+        runs = self.bits
+        while runs:
+            # After k steps a bit survives only if the k days after it were completed too
+            runs &= runs >> 1
+            longest += 1
+        return longest
@@ -0,0 +1,181 @@
+"""Columnar, NumPy-backed analytics over habit_logs.
+
+load_columns reads habit_logs as plain column tuples (no ORM objects, and on
+SQLite and Postgres the dates arrive as day ordinals computed by the
+database) into a LogColumns of compact arrays:
+
+    habit_ids  int32, sorted with ordinals
+    ordinals   int32 date.toordinal() of each log
+    completed  bitmap (np.packbits), unpacked on demand
+    values     int32 masked where the log has no value
+
+The functions below compute streaks, rolling completion rates, moving
+averages and bucket sums from those arrays with vector operations, for
+cohort-style and multi-year queries where looping over one object per day
+is the bottleneck. They agree with analytics.py and the trend buckets in
+trends.py; benchmarks/bench_columnar.py compares the two.
+"""
+from dataclasses import dataclass
+from datetime import date
+from functools import cached_property
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from sqlalchemy import select, cast, func, literal, Integer
+from sqlalchemy.orm import Session
+
+from models import HabitLog
+from trends import bucket_row
+
+# julianday('0001-01-01') is 1721425.5 and date(1, 1, 1).toordinal() is 1
+_SQLITE_ORDINAL_OFFSET = 1721424.5
+
+def _ordinal_column(db: Session):
+    """SQL expression for HabitLog.date as date.toordinal(), or None to convert in Python"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        return cast(func.julianday(HabitLog.date) - _SQLITE_ORDINAL_OFFSET, Integer)
+    if dialect == "postgresql":
+        return HabitLog.date - literal(date(1, 1, 1)) + 1
+    return None
+
+@dataclass(frozen=True)
+class LogColumns:
+    habit_ids: np.ndarray
+    ordinals: np.ndarray
+    completed_bits: np.ndarray
+    values: np.ma.MaskedArray
+
+    def __len__(self) -> int:
+        return len(self.ordinals)
+
+    @cached_property
+    def completed(self) -> np.ndarray:
+        return np.unpackbits(self.completed_bits, count=len(self.ordinals)).astype(bool)
+
+    def habit(self, habit_id: int) -> "LogColumns":
+        """The slice holding one habit's logs"""
+        lo, hi = np.searchsorted(self.habit_ids, [habit_id, habit_id + 1])
+        return LogColumns(
+            habit_ids=self.habit_ids[lo:hi],
+            ordinals=self.ordinals[lo:hi],
+            completed_bits=np.packbits(self.completed[lo:hi]),
+            values=self.values[lo:hi]
+        )
+
+    def completed_ordinals(self) -> np.ndarray:
+        return self.ordinals[self.completed]
+
+def from_rows(rows: List[Tuple]) -> LogColumns:
+    """Build LogColumns from (habit_id, ordinal, completed, value) tuples sorted by habit and date"""
+    count = len(rows)
+    habit_col, ordinal_col, completed_col, value_col = zip(*rows) if rows else ((), (), (), ())
+    habit_ids = np.fromiter(habit_col, dtype=np.int32, count=count)
+    ordinals = np.fromiter(ordinal_col, dtype=np.int32, count=count)
+    completed = np.fromiter(completed_col, dtype=bool, count=count)
+    raw_values = np.array(value_col, dtype=object)
+    missing = np.equal(raw_values, None)
+    values = np.where(missing, 0, raw_values).astype(np.int32)
+    return LogColumns(
+        habit_ids=habit_ids,
+        ordinals=ordinals,
+        completed_bits=np.packbits(completed),
+        values=np.ma.MaskedArray(values, mask=missing)
+    )
+
+def load_columns(db: Session, habit_ids: Iterable[int], start: date | None = None, end: date | None = None) -> LogColumns:
+    """Logs of the given habits, optionally limited to [start, end], as LogColumns"""
+    ordinal = _ordinal_column(db)
+    stmt = select(
+        HabitLog.habit_id, HabitLog.date if ordinal is None else ordinal, HabitLog.completed, HabitLog.value
+    ).where(HabitLog.habit_id.in_(list(habit_ids)))
+    if start is not None:
+        stmt = stmt.where(HabitLog.date >= start)
+    if end is not None:
+        stmt = stmt.where(HabitLog.date <= end)
+    rows = db.execute(stmt.order_by(HabitLog.habit_id.asc(), HabitLog.date.asc())).tuples().all()
+    if ordinal is None:
+        rows = [(habit_id, d.toordinal(), done, value) for habit_id, d, done, value in rows]
+    return from_rows(rows)
+
+def _runs(ordinals: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start index and length of each run of consecutive days in sorted ordinals"""
+    if len(ordinals) == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(ordinals) != 1) + 1))
+    lengths = np.diff(np.append(starts, len(ordinals)))
+    return starts, lengths
+
+def current_streak(completed_ordinals: np.ndarray, today: date, window: int | None = None) -> int:
+    """Consecutive completed days ending today, capped at window; see analytics.current_streak"""
+    upto = completed_ordinals[:np.searchsorted(completed_ordinals, today.toordinal(), side="right")]
+    if len(upto) == 0 or upto[-1] != today.toordinal():
+        return 0
+    streak = int(_runs(upto)[1][-1])
+    return min(streak, window) if window is not None else streak
+
+def longest_streak(completed_ordinals: np.ndarray) -> int:
+    lengths = _runs(completed_ordinals)[1]
+    return int(lengths.max()) if len(lengths) else 0
+
+def daily_completed(columns: LogColumns, start: date, end: date) -> np.ndarray:
+    """Dense bool array with one entry per day in [start, end] for a single habit"""
+    days = np.zeros(end.toordinal() - start.toordinal() + 1, dtype=bool)
+    ordinals = columns.completed_ordinals()
+    inside = ordinals[(ordinals >= start.toordinal()) & (ordinals <= end.toordinal())]
+    days[inside - start.toordinal()] = True
+    return days
+
+def daily_values(columns: LogColumns, start: date, end: date) -> np.ma.MaskedArray:
+    """Dense values per day in [start, end] for a single habit, masked on days without a value"""
+    size = end.toordinal() - start.toordinal() + 1
+    days = np.ma.MaskedArray(np.zeros(size, dtype=np.int32), mask=np.ones(size, dtype=bool))
+    inside = (columns.ordinals >= start.toordinal()) & (columns.ordinals <= end.toordinal())
+    days[columns.ordinals[inside] - start.toordinal()] = columns.values[inside]
+    return days
+
+def _window_sums(series: np.ndarray, window: int) -> np.ndarray:
+    # Sums over the trailing window ending at each day, shorter at the start of the series
+    totals = np.concatenate(([0], np.cumsum(series, dtype=np.int64)))
+    index = np.arange(1, len(series) + 1)
+    return totals[index] - totals[np.maximum(index - window, 0)]
+
+def rolling_completion_rate(columns: LogColumns, start: date, end: date, window: int) -> np.ndarray:
+    """Percentage of completed days in the trailing window ending at each day of [start, end]"""
+    sums = _window_sums(daily_completed(columns, start, end), window)
+    lengths = np.minimum(np.arange(1, len(sums) + 1), window)
+    return sums / lengths * 100
+
+def moving_average(columns: LogColumns, start: date, end: date, window: int) -> np.ma.MaskedArray:
+    """Trailing mean of the logged values at each day of [start, end], masked where the window has none"""
+    values = daily_values(columns, start, end)
+    sums = _window_sums(values.filled(0), window)
+    counts = _window_sums(~np.ma.getmaskarray(values), window)
+    return np.ma.MaskedArray(sums / np.maximum(counts, 1), mask=counts == 0)
+
+def bucket_sums(columns: LogColumns, ranges: List[Tuple[date, date]], today: date) -> Tuple[np.ndarray, np.ndarray]:
+    """(completed, logged) counts for a single habit in each (start, end) range, up to today"""
+    ordinals = columns.ordinals
+    starts = np.array([start.toordinal() for start, _ in ranges])
+    ends = np.minimum(np.array([end.toordinal() for _, end in ranges]), today.toordinal())
+    lo = np.searchsorted(ordinals, starts, side="left")
+    hi = np.maximum(np.searchsorted(ordinals, ends, side="right"), lo)
+    completed_before = np.concatenate(([0], np.cumsum(columns.completed, dtype=np.int64)))
+    return completed_before[hi] - completed_before[lo], hi - lo
+
+def bucket_rows(columns: LogColumns, ranges: List[Tuple[date, date]], today: date) -> List[Dict]:
+    """The same rows as trends.buckets_from_logs, from a single habit's columns"""
+    completed, logged = bucket_sums(columns, ranges, today)
+    return [
+        bucket_row(start, end, (int(done), int(total)))
+        for (start, end), done, total in zip(ranges, completed, logged)
+    ]
+
+def completion_rates_by_habit(columns: LogColumns, start: date, end: date) -> Dict[int, float]:
+    """Percentage of days in [start, end] each habit in columns was completed, for cohort comparisons"""
+    inside = (columns.ordinals >= start.toordinal()) & (columns.ordinals <= end.toordinal()) & columns.completed
+    habit_ids, counts = np.unique(columns.habit_ids[inside], return_counts=True)
+    days = end.toordinal() - start.toordinal() + 1
+    rates = {int(habit_id): 0.0 for habit_id in np.unique(columns.habit_ids)}
+    rates.update({int(habit_id): float(count / days * 100) for habit_id, count in zip(habit_ids, counts)})
+    return rates
@@ -1,9 +1,16 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from datetime import date, timedelta
-from typing import List, Dict
-from models import Habit, HabitLog, User
+from sqlalchemy import select, func, tuple_, and_, or_
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Dict, Tuple
+from models import Habit, HabitLog, HabitStats, User
 from schemas import InsightOut
+from analytics import window_streaks, count_in_range
+from queries import habit_with_logs, dialect_insert
+from trends import (
+    rolling_buckets, calendar_week_buckets, calendar_month_buckets,
+    rolling_ranges, calendar_week_ranges, calendar_month_ranges, buckets_from_logs
+)
+from habit_stats import read_prior, lock_stats, apply_log_change, rebuild_habit_stats, insights_from_stats
 
 def create_habit(db: Session, user_id: int, name: str, htype: str, goal: int | None):
     habit = Habit(user_id=user_id, name=name, htype=htype, goal=goal)
@@ -35,7 +42,50 @@ def update_habit(db: Session, habit: Habit, name: str | None, goal: int | None,
     db.refresh(habit)
     return habit
 
-def upsert_log(db: Session, habit_id: int, d: date, value: int | None, completed: bool | None):
+def _on_conflict_update(stmt, update_value: bool, update_completed: bool):
+    """Attach the (habit_id, date) conflict clause; fields not being updated keep their stored value"""
+    table = HabitLog.__table__
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.habit_id, table.c.date],
+        set_={
+            "value": stmt.excluded.value if update_value else table.c.value,
+            "completed": stmt.excluded.completed if update_completed else table.c.completed,
+            "updated_at": stmt.excluded.updated_at,
+        }
+    )
+
+def upsert_log(db: Session, habit_id: int, d: date, value: int | None, completed: bool | None, user_id: int | None = None):
+    """Insert or update the log for (habit_id, d) in a single INSERT ... ON CONFLICT statement.
+
+    Fields passed as None keep their stored value on update. The habit's
+    materialized stats are updated in the same transaction: read_prior first
+    locks its stats row, checking in the same statement that the habit is
+    user_id's, so nothing is written or locked and None is returned if it isn't.
+    Raises ValueError for a date before the habit's start date.
+    """
+    prior = read_prior(db, habit_id, d, user_id)
+    if prior is None:
+        db.rollback()
+        return None
+    if d < prior.start_date:
+        # Bounds the completion bitmap, which spans every completed day
+        db.rollback()
+        raise ValueError("Log date is before the habit's start date")
+    insert = dialect_insert(db)
+    if insert is None:
+        log = _upsert_log_fallback(db, habit_id, d, value, completed, commit=False)
+    else:
+        stmt = insert(HabitLog).values(habit_id=habit_id, date=d, value=value, completed=bool(completed))
+        stmt = _on_conflict_update(stmt, value is not None, completed is not None).returning(HabitLog)
+        log = db.scalars(stmt, execution_options={"populate_existing": True}).one()
+
+    apply_log_change(db, habit_id, d, prior, log.completed)
+    # Every column is already loaded; detach so commit doesn't expire the log and trigger a reload
+    db.expunge(log)
+    db.commit()
+    return log
+
+def _upsert_log_fallback(db: Session, habit_id: int, d: date, value: int | None, completed: bool | None, commit: bool = True):
     q = db.query(HabitLog).filter(
         HabitLog.habit_id == habit_id,
         HabitLog.date == d
@@ -45,139 +95,289 @@ def upsert_log(db: Session, habit_id: int, d: date, value: int | None, completed
             q.value = value
         if completed is not None:
             q.completed = completed
-        db.commit()
-        db.refresh(q)
+        if commit:
+            db.commit()
+            db.refresh(q)
+        else:
+            db.flush()
         return q
     newlog = HabitLog(habit_id=habit_id, date=d, value=value, completed=bool(completed))
     db.add(newlog)
-    db.commit()
-    db.refresh(newlog)
+    if commit:
+        db.commit()
+        db.refresh(newlog)
+    else:
+        db.flush()
     return newlog
 
-def logs_in_range(db: Session, habit_id: int, start: date, end: date):
-    return db.query(HabitLog).filter(
-        HabitLog.habit_id == habit_id,
-        HabitLog.date >= start,
-        HabitLog.date <= end
-    ).order_by(HabitLog.date.asc()).all()
-
-def calculate_insights(db: Session, habit_id: int) -> InsightOut:
-    """Calculate 7-day and 28-day streaks and average completion percentage"""
-    habit = db.query(Habit).filter(Habit.id == habit_id).first()
-    if not habit:
-        return None
-    
-    today = date.today()
-    
-    seven_day_streak = 0
-    for i in range(7):
-        check_date = today - timedelta(days=i)
-        log = db.query(HabitLog).filter(
-            HabitLog.habit_id == habit_id,
-            HabitLog.date == check_date
-        ).first()
-        if log and log.completed:
-            seven_day_streak += 1
-        else:
-            break
-    
-    twenty_eight_day_streak = 0
-    for i in range(28):
-        check_date = today - timedelta(days=i)
-        log = db.query(HabitLog).filter(
-            HabitLog.habit_id == habit_id,
-            HabitLog.date == check_date
-        ).first()
-        if log and log.completed:
-            twenty_eight_day_streak += 1
+def bulk_upsert_logs(db: Session, user_id: int, entries: List) -> List[Dict]:
+    """Upsert many logs across many habits in one transaction with upsert_log semantics.
+
+    Ownership is checked with a single query for the whole batch, which also
+    reads each habit's start date: entries dated before it are skipped. Entries
+    for the same habit and day are merged in order, as if upsert_log had been
+    called for each. Returns one result per entry, in input order.
+    """
+    habit_ids = {entry.habit_id for entry in entries}
+    start_dates = dict(db.execute(
+        select(Habit.id, Habit.start_date).where(Habit.id.in_(habit_ids), Habit.user_id == user_id)
+    ).all()) if habit_ids else {}
+
+    merged = {}
+    for entry in entries:
+        if entry.habit_id not in start_dates or entry.date < start_dates[entry.habit_id]:
+            continue
+        key = (entry.habit_id, entry.date)
+        current = merged.get(key, {"value": None, "completed": None})
+        merged[key] = {
+            "value": entry.value if entry.value is not None else current["value"],
+            "completed": entry.completed if entry.completed is not None else current["completed"],
+        }
+
+    # Lock every touched habit's stats before writing logs, the order upsert_log takes its locks in
+    lock_stats(db, {habit_id for habit_id, _ in merged})
+    stored = {}
+    insert = dialect_insert(db)
+    if insert is None:
+        for (habit_id, d), fields in merged.items():
+            stored[(habit_id, d)] = _upsert_log_fallback(db, habit_id, d, fields["value"], fields["completed"], commit=False)
+    else:
+        # The ON CONFLICT clause depends on which fields were supplied, so run one
+        # executemany per combination (at most four statements)
+        groups = {}
+        for (habit_id, d), fields in merged.items():
+            shape = (fields["value"] is not None, fields["completed"] is not None)
+            groups.setdefault(shape, []).append({
+                "habit_id": habit_id,
+                "date": d,
+                "value": fields["value"],
+                "completed": bool(fields["completed"]),
+            })
+        table = HabitLog.__table__
+        for (update_value, update_completed), params in groups.items():
+            stmt = _on_conflict_update(insert(table), update_value, update_completed).returning(
+                table.c.id, table.c.habit_id, table.c.date, table.c.value, table.c.completed
+            )
+            for row in db.execute(stmt, params):
+                stored[(row.habit_id, row.date)] = row
+    # A backfill can touch any part of a habit's history, so rebuild rather than apply deltas
+    for habit_id in sorted({habit_id for habit_id, _ in stored}):
+        rebuild_habit_stats(db, habit_id)
+    db.commit()
+
+    results = []
+    for index, entry in enumerate(entries):
+        log = stored.get((entry.habit_id, entry.date))
+        if log is not None:
+            status = "upserted"
         else:
-            break
+            status = "not_found" if entry.habit_id not in start_dates else "before_start_date"
+        results.append({
+            "index": index,
+            "habit_id": entry.habit_id,
+            "date": entry.date,
+            "status": status,
+            "log": log,
+        })
+    return results
+
+def logs_in_range(
+    db: Session, habit_id: int, start: date, end: date, user_id: int | None = None,
+    after: Tuple[date, int] | None = None, limit: int | None = None
+):
+    """Logs for a habit in [start, end], oldest first.
+
+    With user_id, ownership is checked in the same query and None is returned
+    if the habit isn't the user's. after and limit page through the range by
+    keyset: only logs sorting after the (date, id) of the previous page's last
+    log are returned, at most limit of them.
+    """
+    conditions = [HabitLog.date >= start, HabitLog.date <= end]
+    if after is not None:
+        conditions.append(tuple_(HabitLog.date, HabitLog.id) > tuple_(*after))
+
+    if user_id is None:
+        query = db.query(HabitLog).filter(HabitLog.habit_id == habit_id, *conditions).order_by(
+            HabitLog.date.asc(), HabitLog.id.asc()
+        )
+        return query.limit(limit).all() if limit is not None else query.all()
+
+    stmt = habit_with_logs([Habit.id, HabitLog], habit_id, user_id, *conditions).order_by(
+        HabitLog.date.asc(), HabitLog.id.asc()
+    )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    rows = db.execute(stmt).all()
+    if not rows:
+        return None
+    return [log for _, log in rows if log is not None]
+
+def build_insight(habit: Habit, dates: List[date], today: date) -> InsightOut:
+    """Build an InsightOut from a habit and its sorted completed dates"""
+    seven_day_streak, twenty_eight_day_streak = window_streaks(dates, today, (7, 28))
 
     start_date = habit.start_date
     total_days = (today - start_date).days + 1
-    
-    logs_from_start = db.query(HabitLog).filter(
-        HabitLog.habit_id == habit_id,
-        HabitLog.date >= start_date,
-        HabitLog.date <= today
-    ).all()
-    
-    total_days_completed = sum(1 for log in logs_from_start if log.completed)
+    total_days_completed = count_in_range(dates, start_date, today)
     avg_completion_percent = (total_days_completed / total_days * 100) if total_days > 0 else 0.0
-    
+
     return InsightOut(
-        habit_id=habit_id,
+        habit_id=habit.id,
         name=habit.name,
         seven_day_streak=seven_day_streak,
         twenty_eight_day_streak=twenty_eight_day_streak,
         avg_completion_percent=avg_completion_percent
     )
 
-def get_weekly_trend(db: Session, habit_id: int) -> List[Dict]:
+def calculate_insights(db: Session, habit_id: int, user_id: int | None = None) -> InsightOut:
+    """Calculate 7-day and 28-day streaks and average completion percentage.
+
+    Served from the habit's materialized stats when it has them. Otherwise the
+    habit and its completed dates come back from one joined query. With user_id
+    the habit must also belong to that user.
+    """
     today = date.today()
-    trend_data = []
-    
-    for week in range(4):
-        week_start = today - timedelta(days=(week * 7 + 7))
-        week_end = today - timedelta(days=(week * 7))
-        
-        logs = db.query(HabitLog).filter(
-            HabitLog.habit_id == habit_id,
-            HabitLog.date >= week_start,
-            HabitLog.date <= week_end
-        ).all()
-        
-        completed = sum(1 for log in logs if log.completed)
-        total = len(logs) if logs else 7
-        completion_rate = (completed / total * 100) if total > 0 else 0
-        
-        trend_data.append({
-            "week": f"Week {4 - week}",
-            "completion_rate": completion_rate,
-            "completed_days": completed,
-            "total_days": total
-        })
-    
-    return list(reversed(trend_data))
+    stmt = select(Habit, HabitStats).outerjoin(HabitStats, HabitStats.habit_id == Habit.id).where(Habit.id == habit_id)
+    if user_id is not None:
+        stmt = stmt.where(Habit.user_id == user_id)
+    row = db.execute(stmt).first()
+    if row is None:
+        return None
+    insight = insights_from_stats(row[0], row[1], today)
+    if insight is not None:
+        return insight
+
+    # Streaks look back up to 28 days regardless of start_date, so fetch the wider of the two ranges
+    rows = db.execute(
+        habit_with_logs(
+            [Habit, HabitLog.date], habit_id, user_id,
+            HabitLog.completed == True,
+            or_(HabitLog.date >= Habit.start_date, HabitLog.date >= today - timedelta(days=27)),
+            HabitLog.date <= today
+        ).order_by(HabitLog.date.asc())
+    ).all()
+    if not rows:
+        return None
+
+    habit = rows[0][0]
+    dates = [d for _, d in rows if d is not None]
+    return build_insight(habit, dates, today)
+
+def habit_last_modified(db: Session, habit_id: int, user_id: int) -> datetime | None:
+    """When the user's habit or its logs last changed, or None if the habit isn't theirs.
+
+    Log changes come from the stats row's timestamp, which every log write
+    bumps; habits without stats fall back to their newest log, then to their
+    creation time. Edits to the habit itself (renames, archiving) bump
+    habits.updated_at.
+    """
+    latest_log = select(func.max(HabitLog.updated_at)).where(HabitLog.habit_id == Habit.id).scalar_subquery()
+    row = db.execute(
+        select(func.coalesce(HabitStats.updated_at, latest_log, Habit.created_at), Habit.updated_at)
+        .select_from(Habit).outerjoin(HabitStats, HabitStats.habit_id == Habit.id)
+        .where(Habit.id == habit_id, Habit.user_id == user_id)
+    ).first()
+    if row is None:
+        return None
+    logs_changed, habit_changed = row
+    return max(logs_changed, habit_changed or logs_changed)
+
+def completed_dates_by_habit(db: Session, habit_ids: List[int], start: date, end: date) -> Dict[int, List[date]]:
+    """Sorted completed dates per habit in [start, end], fetched in one query for all habits"""
+    grouped = {habit_id: [] for habit_id in habit_ids}
+    if not habit_ids:
+        return grouped
+    rows = db.execute(
+        select(HabitLog.habit_id, HabitLog.date).where(
+            HabitLog.habit_id.in_(habit_ids),
+            HabitLog.completed == True,
+            HabitLog.date >= start,
+            HabitLog.date <= end
+        ).distinct().order_by(HabitLog.habit_id.asc(), HabitLog.date.asc())
+    ).all()
+    for habit_id, d in rows:
+        grouped[habit_id].append(d)
+    return grouped
+
+def get_dashboard(db: Session, user_id: int) -> List[Dict]:
+    """Active habits with today's log and insights, using a fixed number of queries"""
+    rows = db.execute(
+        select(Habit, HabitStats).outerjoin(HabitStats, HabitStats.habit_id == Habit.id).where(
+            Habit.user_id == user_id,
+            Habit.archived == False
+        )
+    ).all()
+    if not rows:
+        return []
 
-def get_monthly_trend(db: Session, habit_id: int) -> List[Dict]:
     today = date.today()
-    trend_data = []
-    
-    for month in range(3):
-        month_start = today - timedelta(days=(month * 30 + 30))
-        month_end = today - timedelta(days=(month * 30))
-        
-        logs = db.query(HabitLog).filter(
-            HabitLog.habit_id == habit_id,
-            HabitLog.date >= month_start,
-            HabitLog.date <= month_end
-        ).all()
-        
-        completed = sum(1 for log in logs if log.completed)
-        total = len(logs) if logs else 30
-        completion_rate = (completed / total * 100) if total > 0 else 0
-        
-        month_name = (today - timedelta(days=(month * 30))).strftime("%B")
-        trend_data.append({
-            "month": month_name,
-            "completion_rate": completion_rate,
-            "completed_days": completed,
-            "total_days": total
-        })
-    
-    return list(reversed(trend_data))
+    habit_ids = [habit.id for habit, _ in rows]
+
+    today_logs = db.query(HabitLog).filter(
+        HabitLog.habit_id.in_(habit_ids),
+        HabitLog.date == today
+    ).all()
+    today_by_habit = {log.habit_id: log for log in today_logs}
+
+    insights = {habit.id: insights_from_stats(habit, stats, today) for habit, stats in rows}
+    # Habits without usable stats fall back to one grouped fetch of completed dates
+    missing = [habit for habit, _ in rows if insights[habit.id] is None]
+    if missing:
+        range_start = min(min(habit.start_date for habit in missing), today - timedelta(days=27))
+        dates_by_habit = completed_dates_by_habit(db, [habit.id for habit in missing], range_start, today)
+        for habit in missing:
+            insights[habit.id] = build_insight(habit, dates_by_habit[habit.id], today)
+
+    return [
+        {
+            "habit": habit,
+            "today_log": today_by_habit.get(habit.id),
+            "insights": insights[habit.id]
+        }
+        for habit, _ in rows
+    ]
+
+def get_weekly_trend(db: Session, habit_id: int, weeks: int = 4, calendar: bool = False, user_id: int | None = None) -> List[Dict]:
+    """Completion per week, oldest first: rolling 7-day windows ending today, or Monday-Sunday weeks"""
+    if calendar:
+        buckets = calendar_week_buckets(db, habit_id, weeks, user_id=user_id)
+    else:
+        buckets = rolling_buckets(db, habit_id, weeks, 7, user_id=user_id)
+    if buckets is None:
+        return None
+    return _label_weeks(buckets)
+
+def _label_weeks(buckets: List[Dict]) -> List[Dict]:
+    for i, bucket in enumerate(buckets):
+        bucket["week"] = f"Week {i + 1}"
+    return buckets
+
+def get_monthly_trend(db: Session, habit_id: int, months: int = 3, calendar: bool = False, user_id: int | None = None) -> List[Dict]:
+    """Completion per month, oldest first: rolling 30-day windows ending today, or calendar months"""
+    if calendar:
+        buckets = calendar_month_buckets(db, habit_id, months, user_id=user_id)
+    else:
+        buckets = rolling_buckets(db, habit_id, months, 30, user_id=user_id)
+    if buckets is None:
+        return None
+    return _label_months(buckets)
 
-def get_daily_logs_for_chart(db: Session, habit_id: int, days: int = 30) -> List[Dict]:
+def _label_months(buckets: List[Dict]) -> List[Dict]:
+    for bucket in buckets:
+        bucket["month"] = bucket["end_date"].strftime("%B")
+    return buckets
+
+def get_daily_logs_for_chart(db: Session, habit_id: int, days: int = 30, user_id: int | None = None) -> List[Dict]:
     today = date.today()
     start_date = today - timedelta(days=days)
     
-    logs = db.query(HabitLog).filter(
-        HabitLog.habit_id == habit_id,
-        HabitLog.date >= start_date,
-        HabitLog.date <= today
-    ).order_by(HabitLog.date.asc()).all()
-    
+    logs = logs_in_range(db, habit_id, start_date, today, user_id)
+    if logs is None:
+        return None
+    return _chart_series(logs, start_date, days)
+
+def _chart_series(logs, start_date: date, days: int) -> List[Dict]:
+    """One point per day from start_date, filling days without a log"""
     log_dict = {log.date: log for log in logs}
     
     chart_data = []
@@ -191,3 +391,114 @@ def get_daily_logs_for_chart(db: Session, habit_id: int, days: int = 30) -> List
         })
     
     return chart_data
+
+ANALYTICS_SECTIONS = ("logs", "insights", "weekly", "monthly", "daily")
+
+def get_habit_analytics(
+    db: Session, habit_id: int, user_id: int, sections: Iterable[str] = ANALYTICS_SECTIONS,
+    days: int = 30, weeks: int = 4, months: int = 3, calendar: bool = False
+) -> Dict | None:
+    """Any of a habit's logs, insights, weekly and monthly trends and daily chart from one query.
+
+    The logs covering every requested window are fetched once, joined to the
+    habit and its stats, and each section is computed from them in memory.
+    Insights come from the stats row when it can answer; only a habit without
+    usable stats widens the fetch back to its start_date. Returns None if the
+    habit isn't the user's.
+    """
+    sections = set(sections)
+    today = date.today()
+    day_start = today - timedelta(days=days)
+    if calendar:
+        week_ranges = calendar_week_ranges(weeks, today)
+        month_ranges = calendar_month_ranges(months, today)
+    else:
+        week_ranges = rolling_ranges(weeks, 7, today)
+        month_ranges = rolling_ranges(months, 30, today)
+
+    starts = [today]
+    if sections & {"logs", "daily"}:
+        starts.append(day_start)
+    if "insights" in sections:
+        starts.append(today - timedelta(days=27))
+    if "weekly" in sections:
+        starts.append(week_ranges[0][0])
+    if "monthly" in sections:
+        starts.append(month_ranges[0][0])
+    in_window = HabitLog.date >= min(starts)
+    if "insights" in sections:
+        stats_unusable = or_(
+            HabitStats.habit_id.is_(None),
+            and_(HabitStats.completion_bits.is_(None), HabitStats.last_completed_date > today)
+        )
+        in_window = or_(in_window, and_(stats_unusable, HabitLog.date >= Habit.start_date))
+
+    rows = db.execute(
+        select(Habit, HabitStats, HabitLog).select_from(Habit)
+        .outerjoin(HabitStats, HabitStats.habit_id == Habit.id)
+        .outerjoin(HabitLog, and_(HabitLog.habit_id == Habit.id, in_window, HabitLog.date <= today))
+        .where(Habit.id == habit_id, Habit.user_id == user_id)
+        .order_by(HabitLog.date.asc())
+    ).all()
+    if not rows:
+        return None
+
+    habit, stats = rows[0][0], rows[0][1]
+    logs = [log for _, _, log in rows if log is not None]
+    recent = [log for log in logs if log.date >= day_start]
+    pairs = [(log.date, log.completed) for log in logs]
+
+    result = {"habit_id": habit.id}
+    if "logs" in sections:
+        result["logs"] = recent
+    if "insights" in sections:
+        result["insights"] = insights_from_stats(habit, stats, today) or build_insight(
+            habit, [log.date for log in logs if log.completed], today
+        )
+    if "weekly" in sections:
+        result["weekly"] = _label_weeks(buckets_from_logs(pairs, week_ranges, today))
+    if "monthly" in sections:
+        result["monthly"] = _label_months(buckets_from_logs(pairs, month_ranges, today))
+    if "daily" in sections:
+        result["daily"] = _chart_series(recent, day_start, days)
+    return result
+
+def run_length_encode(values: List[int]) -> List[int]:
+    """[value, run length, value, run length, ...] for consecutive equal values"""
+    runs: List[int] = []
+    for value in values:
+        if runs and runs[-2] == value:
+            runs[-1] += 1
+        else:
+            runs += [value, 1]
+    return runs
+
+def get_activity_heatmap(db: Session, user_id: int, days: int = 365, encoding: str = "dense") -> Dict:
+    """Completed habits per day over the last `days` days, across all the user's active habits.
+
+    One GROUP BY date over habit_logs joined to habits; days without completions
+    are filled in as 0. The counts are oldest first, starting at "start", either
+    one per day ("dense") or run-length encoded ("rle", see run_length_encode).
+    """
+    today = date.today()
+    start = today - timedelta(days=days - 1)
+    rows = db.execute(
+        select(HabitLog.date, func.count()).join(Habit, Habit.id == HabitLog.habit_id).where(
+            Habit.user_id == user_id,
+            Habit.archived == False,
+            HabitLog.completed == True,
+            HabitLog.date >= start,
+            HabitLog.date <= today
+        ).group_by(HabitLog.date)
+    ).all()
+
+    counts = [0] * days
+    for d, completed in rows:
+        counts[(d - start).days] = completed
+    return {
+        "start": start,
+        "end": today,
+        "max": max(counts),
+        "encoding": encoding,
+        "counts": run_length_encode(counts) if encoding == "rle" else counts,
+    }
@@ -0,0 +1,93 @@
+"""Async counterparts of crud.py for the API endpoints.
+
+Simple lookups are written against AsyncSession directly. Everything else
+runs the sync implementation through AsyncSession.run_sync, which drives the
+same code over the async driver without blocking the event loop, so each
+query still has exactly one implementation in crud.py.
+"""
+from datetime import date
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Habit, User
+from schemas import InsightOut
+import crud
+
+async def get_user(db: AsyncSession, user_id: int):
+    return (await db.execute(select(User).where(User.id == user_id))).scalars().first()
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    return (await db.execute(select(User).where(User.email == email))).scalars().first()
+
+async def create_user(db: AsyncSession, email: str, hashed_password: str):
+    user = User(email=email, hashed_password=hashed_password)
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+async def update_password_hash(db: AsyncSession, user: User, hashed_password: str):
+    user.hashed_password = hashed_password
+    await db.commit()
+    return user
+
+async def create_habit(db: AsyncSession, user_id: int, name: str, htype: str, goal: int | None, start_date: date):
+    habit = Habit(user_id=user_id, name=name, htype=htype, goal=goal, start_date=start_date)
+    db.add(habit)
+    await db.commit()
+    await db.refresh(habit)
+    return habit
+
+async def list_habits(db: AsyncSession, user_id: int):
+    return (await db.execute(
+        select(Habit).where(Habit.user_id == user_id, Habit.archived == False)
+    )).scalars().all()
+
+async def get_habit(db: AsyncSession, habit_id: int, user_id: int):
+    return (await db.execute(
+        select(Habit).where(Habit.id == habit_id, Habit.user_id == user_id)
+    )).scalars().first()
+
+async def archive_habit(db: AsyncSession, habit: Habit):
+    habit.archived = True
+    await db.commit()
+    return habit
+
+async def upsert_log(db: AsyncSession, habit_id: int, d: date, value: int | None, completed: bool | None, user_id: int | None = None):
+    return await db.run_sync(crud.upsert_log, habit_id, d, value, completed, user_id)
+
+async def bulk_upsert_logs(db: AsyncSession, user_id: int, entries: List) -> List[Dict]:
+    return await db.run_sync(crud.bulk_upsert_logs, user_id, entries)
+
+async def logs_in_range(
+    db: AsyncSession, habit_id: int, start: date, end: date, user_id: int | None = None,
+    after: Tuple[date, int] | None = None, limit: int | None = None
+):
+    return await db.run_sync(crud.logs_in_range, habit_id, start, end, user_id, after, limit)
+
+async def calculate_insights(db: AsyncSession, habit_id: int, user_id: int | None = None) -> InsightOut:
+    return await db.run_sync(crud.calculate_insights, habit_id, user_id)
+
+async def habit_last_modified(db: AsyncSession, habit_id: int, user_id: int):
+    return await db.run_sync(crud.habit_last_modified, habit_id, user_id)
+
+async def get_dashboard(db: AsyncSession, user_id: int) -> List[Dict]:
+    return await db.run_sync(crud.get_dashboard, user_id)
+
+async def get_weekly_trend(db: AsyncSession, habit_id: int, weeks: int = 4, calendar: bool = False, user_id: int | None = None) -> List[Dict]:
+    return await db.run_sync(crud.get_weekly_trend, habit_id, weeks, calendar, user_id)
+
+async def get_monthly_trend(db: AsyncSession, habit_id: int, months: int = 3, calendar: bool = False, user_id: int | None = None) -> List[Dict]:
+    return await db.run_sync(crud.get_monthly_trend, habit_id, months, calendar, user_id)
+
+async def get_daily_logs_for_chart(db: AsyncSession, habit_id: int, days: int = 30, user_id: int | None = None) -> List[Dict]:
+    return await db.run_sync(crud.get_daily_logs_for_chart, habit_id, days, user_id)
+
+async def get_habit_analytics(
+    db: AsyncSession, habit_id: int, user_id: int, sections: Iterable[str] = crud.ANALYTICS_SECTIONS,
+    days: int = 30, weeks: int = 4, months: int = 3, calendar: bool = False
+) -> Dict:
+    return await db.run_sync(crud.get_habit_analytics, habit_id, user_id, sections, days, weeks, months, calendar)
+
+async def get_activity_heatmap(db: AsyncSession, user_id: int, days: int = 365, encoding: str = "dense") -> Dict:
+    return await db.run_sync(crud.get_activity_heatmap, user_id, days, encoding)
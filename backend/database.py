@@ -1,26 +1,123 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 
+from pool_metrics import TimedQueuePool, TimedAsyncAdaptedQueuePool, instrument
+from request_metrics import instrument_engine
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./habit_tracker.db")
 
-# Configure engine based on database type
-if DATABASE_URL.startswith("postgresql"):
-    engine = create_engine(DATABASE_URL)
-else:
-    # SQLite configuration for development
-    engine = create_engine(
-        DATABASE_URL,
-        connect_args={"check_same_thread": False}
-    )
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+# Connection pool, per engine and per process (each uvicorn worker has its own)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", "true")
+
+# SQLite pragmas, applied to every new connection
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negative means KiB, so 64 MiB
+
+def _is_memory_sqlite(url: str) -> bool:
+    return url.startswith("sqlite") and (url.endswith(":memory:") or url.rstrip("/").endswith("sqlite:"))
+
+def engine_options(url: str, asyncio: bool = False) -> dict:
+    """create_engine keyword arguments for url, from the DB_POOL_* settings"""
+    if _is_memory_sqlite(url):
+        # One shared in-memory database per process; there is nothing to pool
+        return {"connect_args": {"check_same_thread": False}} if not asyncio else {}
+    options = {
+        "poolclass": TimedAsyncAdaptedQueuePool if asyncio else TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if url.startswith("sqlite") and not asyncio:
+        options["connect_args"] = {"check_same_thread": False}
+    return options
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        # WAL lets readers run alongside the single writer; busy_timeout makes a
+        # second writer wait for the lock instead of failing with "database is locked"
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size = {SQLITE_CACHE_SIZE}")
+    finally:
+        cursor.close()
+
+def configure_engine(engine, name: str):
+    """Apply SQLite pragmas on connect and start collecting pool and query metrics; engine is a sync Engine"""
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    instrument(engine, name)
+    instrument_engine(engine)
+    return engine
+
+engine = configure_engine(create_engine(DATABASE_URL, **engine_options(DATABASE_URL)), "primary")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Optional read replica for read-only endpoints and exports (see routing.py); without one
+# the replica names below are just the primary
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+if DATABASE_REPLICA_URL:
+    replica_engine = configure_engine(
+        create_engine(DATABASE_REPLICA_URL, **engine_options(DATABASE_REPLICA_URL)), "replica"
+    )
+else:
+    replica_engine = engine
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
 Base = declarative_base()
 
+def async_url(url: str) -> str:
+    """Swap the sync driver in a database URL for its asyncio counterpart"""
+    if url.startswith("postgresql"):
+        scheme, rest = url.split("://", 1)
+        return f"postgresql+asyncpg://{rest}"
+    if url.startswith("sqlite"):
+        scheme, rest = url.split("://", 1)
+        return f"sqlite+aiosqlite://{rest}"
+    return url
+
+# Async engine for the API; the sync engine above serves migrations, exports and scripts
+async_engine = create_async_engine(async_url(DATABASE_URL), **engine_options(DATABASE_URL, asyncio=True))
+configure_engine(async_engine.sync_engine, "primary_async")
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+if DATABASE_REPLICA_URL:
+    async_replica_engine = create_async_engine(
+        async_url(DATABASE_REPLICA_URL), **engine_options(DATABASE_REPLICA_URL, asyncio=True)
+    )
+    configure_engine(async_replica_engine.sync_engine, "replica_async")
+else:
+    async_replica_engine = async_engine
+AsyncReplicaSessionLocal = async_sessionmaker(
+    async_replica_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
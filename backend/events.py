@@ -0,0 +1,157 @@
+"""Per-user server-sent events.
+
+Writes publish a small delta to the user's channel: a habit log with the
+habit's updated insights after upsert_log, the new habit after create, the
+habit id after archive. A client holding GET /api/events open patches its
+state from these instead of refetching after each write.
+
+By default subscribers and publishers meet in the worker process (LocalBroker).
+Set EVENTS_BROKER_URL to a redis:// URL to deliver events across workers
+(RedisBroker, needs requirements-optional.txt): writes are published to Redis,
+and each worker holds one pub/sub connection, subscribed to the channels of
+the users connected to it. Either way a write skips building its event when
+nobody is subscribed to the user (with Redis, per PUBSUB NUMSUB).
+
+Delivery is best effort. A client that falls more than EVENTS_QUEUE_SIZE
+events behind, or that reconnects, should refetch; the first case is
+signalled with a "resync" event.
+"""
+import asyncio
+import json
+import os
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Set
+
+from fastapi.encoders import jsonable_encoder
+
+EVENTS_BROKER_URL = os.getenv("EVENTS_BROKER_URL")
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+RETRY_MILLISECONDS = 3000
+
+class LocalBroker:
+    """Fan events out to the subscribers in this process"""
+
+    remote = False
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+
+    def subscriber_count(self, user_id: int) -> int:
+        return len(self._subscribers.get(user_id, ()))
+
+    async def has_subscribers(self, user_id: int) -> bool:
+        return self.subscriber_count(user_id) > 0
+
+    async def publish(self, user_id: int, event: Dict[str, Any]):
+        for queue in list(self._subscribers.get(user_id, ())):
+            if queue.full():
+                # Too far behind to patch its state; have it refetch instead
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
+            else:
+                queue.put_nowait(event)
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int) -> AsyncIterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[user_id].add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers[user_id].discard(queue)
+            if not self._subscribers[user_id]:
+                del self._subscribers[user_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "broker": "local",
+            "users": len(self._subscribers),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+        }
+
+class RedisBroker:
+    """Publish through Redis pub/sub; deliver to this process's subscribers via a LocalBroker"""
+
+    remote = True
+
+    def __init__(self, client, prefix: str = "events:", queue_size: int = 100):
+        self.client = client
+        self.prefix = prefix
+        self.local = LocalBroker(queue_size)
+        self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self._listener = None
+
+    async def has_subscribers(self, user_id: int) -> bool:
+        # A worker subscribes to a user's channel only while it has a client for them,
+        # so the channel's subscriber count covers every worker
+        if self.local.subscriber_count(user_id):
+            return True
+        [(_, count)] = await self.client.pubsub_numsub(f"{self.prefix}{user_id}")
+        return count > 0
+
+    async def publish(self, user_id: int, event: Dict[str, Any]):
+        await self.client.publish(f"{self.prefix}{user_id}", json.dumps(event))
+
+    async def _listen(self):
+        while True:
+            message = await self._pubsub.get_message(timeout=1.0)
+            if message is None:
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            await self.local.publish(int(channel.removeprefix(self.prefix)), json.loads(message["data"]))
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int) -> AsyncIterator[asyncio.Queue]:
+        channel = f"{self.prefix}{user_id}"
+        async with self.local.subscribe(user_id) as queue:
+            # The first local subscriber for a user subscribes this worker to the user's channel
+            if self.local.subscriber_count(user_id) == 1:
+                await self._pubsub.subscribe(channel)
+            if self._listener is None or self._listener.done():
+                self._listener = asyncio.create_task(self._listen())
+            try:
+                yield queue
+            finally:
+                if self.local.subscriber_count(user_id) == 1:
+                    await self._pubsub.unsubscribe(channel)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.local.stats(), "broker": "redis"}
+
+def make_broker(url: str | None, queue_size: int):
+    """A RedisBroker for a redis:// URL (needs the redis package), else a LocalBroker"""
+    if not url:
+        return LocalBroker(queue_size)
+    import redis.asyncio
+    return RedisBroker(redis.asyncio.Redis.from_url(url), queue_size=queue_size)
+
+broker = make_broker(EVENTS_BROKER_URL, EVENTS_QUEUE_SIZE)
+
+async def has_subscribers(user_id: int) -> bool:
+    """False when nobody is listening, so a write can skip building its event"""
+    return await broker.has_subscribers(user_id)
+
+async def publish(user_id: int, event_type: str, **payload):
+    await broker.publish(user_id, {"type": event_type, **jsonable_encoder(payload)})
+
+def _format(event: Dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+async def event_stream(user_id: int) -> AsyncIterator[str]:
+    """The user's events in text/event-stream format, with a comment line as a heartbeat"""
+    async with broker.subscribe(user_id) as queue:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            yield _format(event)
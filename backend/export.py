@@ -1,8 +1,13 @@
 import csv
-from io import StringIO, BytesIO
-from datetime import datetime, date, timedelta
+import os
+from io import BytesIO
+from datetime import datetime, date
+from typing import Iterator
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from database import SessionLocal, ReplicaSessionLocal
 from models import Habit, HabitLog
+from crud import get_weekly_trend, get_monthly_trend, get_daily_logs_for_chart
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
@@ -13,28 +18,65 @@ from reportlab.graphics.charts.linecharts import HorizontalLineChart
 from reportlab.graphics.charts.barcharts import VerticalBarChart
 from reportlab.graphics import renderPDF
 
-def generate_csv_report(db: Session, user_id: int) -> str:
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    writer.writerow(["Habit Tracker Report", datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
-    writer.writerow([])
-    
-    habits = db.query(Habit).filter(Habit.user_id == user_id, Habit.archived == False).all()
-    
-    for habit in habits:
-        writer.writerow([f"Habit: {habit.name}"])
-        if habit.goal:
-            writer.writerow([f"Goal: {habit.goal}"])
-        writer.writerow(["Date", "Completed", "Value"])
-        
-        logs = db.query(HabitLog).filter(HabitLog.habit_id == habit.id).order_by(HabitLog.date.desc()).all()
-        for log in logs:
-            writer.writerow([log.date, "Yes" if log.completed else "No", log.value or ""])
-        
+CSV_CHUNK_ROWS = 1000
+# Optional cap on each habit's most recent logs listed in the PDF; 0 lists them all
+PDF_MAX_LOG_ROWS = int(os.getenv("PDF_MAX_LOG_ROWS", "0"))
+
+class _LineWriter:
+    """File-like target that hands each formatted CSV line straight back to the caller"""
+    def write(self, value):
+        return value
+
+def iter_csv_report(db: Session, user_id: int) -> Iterator[str]:
+    """Yield the CSV report in chunks from one ordered, server-side cursor query.
+
+    Memory stays bounded by CSV_CHUNK_ROWS regardless of how much history there is.
+    """
+    writer = csv.writer(_LineWriter())
+    chunk = [
+        writer.writerow(["Habit Tracker Report", datetime.now().strftime("%Y-%m-%d %H:%M:%S")]),
         writer.writerow([])
-    
-    return output.getvalue()
+    ]
+
+    stmt = select(
+        Habit.id, Habit.name, Habit.goal, HabitLog.date, HabitLog.completed, HabitLog.value
+    ).outerjoin(HabitLog, HabitLog.habit_id == Habit.id).where(
+        Habit.user_id == user_id,
+        Habit.archived == False
+    ).order_by(Habit.id.asc(), HabitLog.date.desc()).execution_options(
+        stream_results=True, yield_per=CSV_CHUNK_ROWS
+    )
+
+    current_habit = None
+    for habit_id, name, goal, log_date, completed, value in db.execute(stmt):
+        if habit_id != current_habit:
+            if current_habit is not None:
+                chunk.append(writer.writerow([]))
+            current_habit = habit_id
+            chunk.append(writer.writerow([f"Habit: {name}"]))
+            if goal:
+                chunk.append(writer.writerow([f"Goal: {goal}"]))
+            chunk.append(writer.writerow(["Date", "Completed", "Value"]))
+        if log_date is not None:
+            chunk.append(writer.writerow([log_date, "Yes" if completed else "No", value or ""]))
+        if len(chunk) >= CSV_CHUNK_ROWS:
+            yield "".join(chunk)
+            chunk = []
+
+    if current_habit is not None:
+        chunk.append(writer.writerow([]))
+    yield "".join(chunk)
+
+def stream_csv_report(user_id: int, replica: bool = False) -> Iterator[str]:
+    """iter_csv_report on its own session, for responses that outlive the request's session"""
+    db = ReplicaSessionLocal() if replica else SessionLocal()
+    try:
+        yield from iter_csv_report(db, user_id)
+    finally:
+        db.close()
+
+def generate_csv_report(db: Session, user_id: int) -> str:
+    return "".join(iter_csv_report(db, user_id))
 
 def create_daily_chart(logs_data):
     drawing = Drawing(400, 200)
@@ -43,7 +85,7 @@ def create_daily_chart(logs_data):
     completion_data = []
     
     for log in logs_data:
-        dates.append(log['date'].strftime('%m/%d'))
+        dates.append(date.fromisoformat(log['date']).strftime('%m/%d'))
         completion_data.append(1 if log['completed'] else 0)
     
     if not completion_data:
@@ -129,84 +171,17 @@ def create_monthly_chart(monthly_data):
     drawing.add(chart)
     return drawing
 
-def get_daily_logs_for_chart(db: Session, habit_id: int, days: int = 30):
-    today = date.today()
-    start_date = today - timedelta(days=days)
-    
-    logs = db.query(HabitLog).filter(
-        HabitLog.habit_id == habit_id,
-        HabitLog.date >= start_date,
-        HabitLog.date <= today
-    ).order_by(HabitLog.date.asc()).all()
-    
-    log_dict = {log.date: log for log in logs}
-    
-    chart_data = []
-    for i in range(days + 1):
-        current_date = start_date + timedelta(days=i)
-        log = log_dict.get(current_date)
-        chart_data.append({
-            "date": current_date,
-            "completed": log.completed if log else False,
-            "value": log.value if log else None
-        })
-    
-    return chart_data
-
-def get_weekly_trend(db: Session, habit_id: int):
-    today = date.today()
-    trend_data = []
-    
-    for week in range(4):
-        week_start = today - timedelta(days=(week * 7 + 7))
-        week_end = today - timedelta(days=(week * 7))
-        
-        logs = db.query(HabitLog).filter(
-            HabitLog.habit_id == habit_id,
-            HabitLog.date >= week_start,
-            HabitLog.date <= week_end
-        ).all()
-        
-        completed = sum(1 for log in logs if log.completed)
-        total = len(logs) if logs else 7
-        completion_rate = (completed / total * 100) if total > 0 else 0
-        
-        trend_data.append({
-            "week": f"Week {4 - week}",
-            "completion_rate": completion_rate,
-            "completed_days": completed,
-            "total_days": total
-        })
-    
-    return list(reversed(trend_data))
-
-def get_monthly_trend(db: Session, habit_id: int):
-    today = date.today()
-    trend_data = []
-    
-    for month in range(3):
-        month_start = today - timedelta(days=(month * 30 + 30))
-        month_end = today - timedelta(days=(month * 30))
-        
-        logs = db.query(HabitLog).filter(
-            HabitLog.habit_id == habit_id,
-            HabitLog.date >= month_start,
-            HabitLog.date <= month_end
-        ).all()
-        
-        completed = sum(1 for log in logs if log.completed)
-        total = len(logs) if logs else 30
-        completion_rate = (completed / total * 100) if total > 0 else 0
-        
-        month_name = (today - timedelta(days=(month * 30))).strftime("%B")
-        trend_data.append({
-            "month": month_name,
-            "completion_rate": completion_rate,
-            "completed_days": completed,
-            "total_days": total
-        })
-    
-    return list(reversed(trend_data))
+def pdf_log_rows(db: Session, habit_id: int, max_rows: int | None = None) -> list:
+    """The PDF's detailed log table for a habit, newest first, capped at max_rows (default PDF_MAX_LOG_ROWS)"""
+    max_rows = PDF_MAX_LOG_ROWS if max_rows is None else max_rows
+    query = db.query(HabitLog).filter(HabitLog.habit_id == habit_id).order_by(HabitLog.date.desc())
+    logs = query.limit(max_rows + 1).all() if max_rows else query.all()
+    table_data = [["Date", "Completed", "Value"]]
+    for log in logs[:max_rows or None]:
+        table_data.append([str(log.date), "Yes" if log.completed else "No", str(log.value or "")])
+    if max_rows and len(logs) > max_rows:
+        table_data.append([f"Older logs omitted ({max_rows} most recent shown)", "see CSV export", ""])
+    return table_data
 
 def generate_pdf_report(db: Session, user_id: int) -> bytes:
     buffer = BytesIO()
@@ -265,10 +240,7 @@ def generate_pdf_report(db: Session, user_id: int) -> bytes:
         story.append(monthly_chart)
         story.append(Spacer(1, 0.2*inch))
         
-        logs = db.query(HabitLog).filter(HabitLog.habit_id == habit.id).order_by(HabitLog.date.desc()).all()
-        table_data = [["Date", "Completed", "Value"]]
-        for log in logs:
-            table_data.append([str(log.date), "Yes" if log.completed else "No", str(log.value or "")])
+        table_data = pdf_log_rows(db, habit.id)
         
         if len(table_data) > 1:
             story.append(Paragraph("Detailed Logs", heading_style))
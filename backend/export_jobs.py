@@ -0,0 +1,153 @@
+"""Background PDF export jobs.
+
+Reports are rendered in a process pool so reportlab's CPU-bound layout never
+ties up a request worker. Finished PDFs are kept in a bounded cache keyed on
+the user's report version, which changes whenever a log is written, a habit is
+edited or the set of active habits changes, so repeat downloads of an unchanged
+report are free.
+
+Jobs and cached reports live in this process; with several uvicorn workers a
+client must poll the worker that accepted the job (e.g. via sticky sessions).
+"""
+import multiprocessing
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from functools import partial
+from typing import Dict, Optional
+
+from sqlalchemy import select, func, distinct
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, ReplicaSessionLocal
+from models import Habit, HabitLog
+from export import generate_pdf_report
+
+PDF_EXPORT_WORKERS = int(os.getenv("PDF_EXPORT_WORKERS", "2"))
+PDF_CACHE_SIZE = int(os.getenv("PDF_CACHE_SIZE", "32"))
+MAX_TRACKED_JOBS = 1000
+
+_lock = threading.Lock()
+_executor: Optional[ProcessPoolExecutor] = None
+_jobs: "OrderedDict[str, Dict]" = OrderedDict()
+_pending_by_key: Dict[tuple, str] = {}
+_cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+
+def _render_pdf(user_id: int, replica: bool) -> bytes:
+    db = ReplicaSessionLocal() if replica else SessionLocal()
+    try:
+        return generate_pdf_report(db, user_id)
+    finally:
+        db.close()
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            # Spawn rather than fork: forking the threaded server process can copy a lock held by
+            # another thread (logging, the pools) into the child, along with its open connections
+            _executor = ProcessPoolExecutor(
+                max_workers=PDF_EXPORT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+def report_version(db: Session, user_id: int) -> tuple:
+    """Cheap fingerprint of everything the PDF report depends on"""
+    habit_count, habit_id_sum, last_habit_write, last_log_write = db.execute(
+        select(
+            func.count(distinct(Habit.id)),
+            func.sum(distinct(Habit.id)),
+            func.max(Habit.updated_at),
+            func.max(HabitLog.updated_at)
+        ).select_from(Habit).outerjoin(HabitLog, HabitLog.habit_id == Habit.id).where(
+            Habit.user_id == user_id,
+            Habit.archived == False
+        )
+    ).one()
+    # Trend charts are relative to today, so a new day is a new report
+    return (date.today().isoformat(), habit_count, habit_id_sum, str(last_habit_write), str(last_log_write))
+
+def _new_job(user_id: int, cache_key: tuple, status: str) -> Dict:
+    job = {
+        "id": uuid.uuid4().hex,
+        "status": status,
+        "created_at": datetime.utcnow(),
+        "finished_at": datetime.utcnow() if status == "done" else None,
+        "error": None,
+        "user_id": user_id,
+        "cache_key": cache_key,
+    }
+    _jobs[job["id"]] = job
+    while len(_jobs) > MAX_TRACKED_JOBS:
+        _jobs.popitem(last=False)
+    return job
+
+def _finish_job(job_id: str, future):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        _pending_by_key.pop(job["cache_key"], None)
+        job["finished_at"] = datetime.utcnow()
+        error = future.exception()
+        if error is not None:
+            job["status"] = "failed"
+            job["error"] = str(error)
+            return
+        _cache[job["cache_key"]] = future.result()
+        _cache.move_to_end(job["cache_key"])
+        while len(_cache) > PDF_CACHE_SIZE:
+            _cache.popitem(last=False)
+        job["status"] = "done"
+
+def submit_pdf_job(db: Session, user_id: int, replica: bool = False) -> Dict:
+    """Start rendering the user's PDF report, reusing a cached or in-flight render when possible.
+
+    db and replica must point at the same database, so the report is rendered
+    from the state its cache key was computed from.
+    """
+    cache_key = (user_id,) + report_version(db, user_id)
+    with _lock:
+        if cache_key in _cache:
+            _cache.move_to_end(cache_key)
+            return _new_job(user_id, cache_key, "done")
+        pending_id = _pending_by_key.get(cache_key)
+        if pending_id in _jobs:
+            return _jobs[pending_id]
+        job = _new_job(user_id, cache_key, "pending")
+        _pending_by_key[cache_key] = job["id"]
+
+    try:
+        future = _get_executor().submit(_render_pdf, user_id, replica)
+    except Exception as error:
+        with _lock:
+            _pending_by_key.pop(cache_key, None)
+            job["status"] = "failed"
+            job["error"] = str(error)
+            job["finished_at"] = datetime.utcnow()
+        return job
+    future.add_done_callback(partial(_finish_job, job["id"]))
+    return job
+
+def get_job(job_id: str, user_id: int) -> Optional[Dict]:
+    with _lock:
+        job = _jobs.get(job_id)
+    if job is None or job["user_id"] != user_id:
+        return None
+    return job
+
+def get_job_result(job: Dict) -> Optional[bytes]:
+    """The finished PDF, or None if the job isn't done or its report has been evicted"""
+    with _lock:
+        if job["status"] != "done":
+            return None
+        return _cache.get(job["cache_key"])
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
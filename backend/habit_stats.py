@@ -0,0 +1,325 @@
+"""Materialized per-habit statistics.
+
+habit_stats holds running totals, streak state and a bitmap of completed days
+(see bitmaps.py) for each habit, and habit_period_stats holds completed/logged counts per calendar week and month.
+upsert_log keeps both up to date in its own transaction, so insights and
+calendar trends can be served without scanning all of habit_logs. A habit without a
+habit_stats row (e.g. one logged before this table existed) is built on its
+next write; readers fall back to the live queries until then.
+
+Rebuild everything from habit_logs, e.g. after a manual data fix:
+
+    python habit_stats.py            # all habits
+    python habit_stats.py --habit 42 # a single habit
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, delete, update, func
+from sqlalchemy.orm import Session
+
+from analytics import current_streak, longest_streak
+from bitmaps import CompletionBitmap
+from models import Habit, HabitLog, HabitStats, HabitPeriodStats
+from queries import dialect_insert
+from schemas import InsightOut
+
+def period_starts(d: date) -> List[Tuple[str, date]]:
+    return [("week", d - timedelta(days=d.weekday())), ("month", d.replace(day=1))]
+
+@dataclass
+class PriorState:
+    """What a log write is about to replace, read under the habit's write lock"""
+    stats: Optional[HabitStats]
+    start_date: Optional[date]
+    existed: bool
+    completed: bool
+
+def lock_stats(db: Session, habit_ids: Iterable[int]):
+    """Create any missing stats rows for habit_ids, then lock them in habit_id order.
+
+    Inserting first makes the lock cover a habit's first write too: two first
+    check-ins can't both insert the row. On SQLite the insert is the write that
+    takes the database lock, before anything is read.
+    """
+    habit_ids = sorted(set(habit_ids))
+    if not habit_ids:
+        return
+    insert = dialect_insert(db)
+    if insert is not None:
+        table = HabitStats.__table__
+        db.execute(
+            insert(table).from_select(["habit_id"], select(Habit.id).where(Habit.id.in_(habit_ids)))
+            .on_conflict_do_nothing(index_elements=[table.c.habit_id])
+        )
+    db.execute(
+        select(HabitStats.habit_id).where(HabitStats.habit_id.in_(habit_ids))
+        .order_by(HabitStats.habit_id).with_for_update()
+    )
+
+def read_prior(db: Session, habit_id: int, d: date, user_id: int | None = None) -> Optional[PriorState]:
+    """Lock the habit's stats row, then read the log the caller is about to overwrite.
+
+    The lock is taken by the first statement, an UPDATE of the stats row that
+    also checks ownership and returns the old log, so concurrent writers of one
+    habit queue up before reading anything and their deltas can't interleave.
+    Returns None, having locked nothing, if the habit isn't user_id's.
+    """
+    insert = dialect_insert(db)
+    if insert is None:
+        return _read_prior_fallback(db, habit_id, d, user_id)
+
+    habit = select(Habit.id).where(Habit.id == habit_id)
+    if user_id is not None:
+        habit = habit.where(Habit.user_id == user_id)
+    old_log = select(HabitLog.completed).where(HabitLog.habit_id == habit_id, HabitLog.date == d)
+    stmt = update(HabitStats).where(
+        HabitStats.habit_id == habit_id, HabitStats.habit_id.in_(habit)
+    ).values(updated_at=datetime.utcnow()).returning(
+        HabitStats,
+        select(Habit.start_date).where(Habit.id == habit_id).scalar_subquery(),
+        select(func.count()).select_from(old_log.subquery()).scalar_subquery(),
+        old_log.scalar_subquery(),
+    ).execution_options(synchronize_session=False, populate_existing=True)
+
+    for attempt in range(2):
+        row = db.execute(stmt).first()
+        if row is not None:
+            stats, start_date, existed, completed = row
+            return PriorState(stats=stats, start_date=start_date, existed=bool(existed), completed=bool(completed))
+        if attempt:
+            return None
+        # No stats row yet: create it (only for an owned habit). If another writer
+        # created it first, the insert waits for that writer and the UPDATE is retried.
+        table = HabitStats.__table__
+        created = db.execute(
+            insert(table).from_select(["habit_id"], habit)
+            .on_conflict_do_nothing(index_elements=[table.c.habit_id]).returning(table.c.habit_id)
+        ).first()
+        if created is not None:
+            # Locked by the insert; apply_log_change builds it from habit_logs
+            start_date = db.execute(select(Habit.start_date).where(Habit.id == habit_id)).scalar_one()
+            return PriorState(stats=None, start_date=start_date, existed=False, completed=False)
+
+def _read_prior_fallback(db: Session, habit_id: int, d: date, user_id: int | None) -> Optional[PriorState]:
+    habit = select(Habit.start_date).where(Habit.id == habit_id)
+    if user_id is not None:
+        habit = habit.where(Habit.user_id == user_id)
+    start_date = db.execute(habit).scalar_one_or_none()
+    if start_date is None:
+        return None
+    stats = db.execute(
+        select(HabitStats).where(HabitStats.habit_id == habit_id).with_for_update()
+    ).scalar_one_or_none()
+    if stats is not None:
+        stats.updated_at = datetime.utcnow()
+    old = db.execute(
+        select(HabitLog.completed).where(HabitLog.habit_id == habit_id, HabitLog.date == d)
+    ).first()
+    return PriorState(
+        stats=stats,
+        start_date=start_date,
+        existed=old is not None,
+        completed=bool(old[0]) if old else False
+    )
+
+def apply_log_change(db: Session, habit_id: int, d: date, prior: PriorState, completed: bool):
+    """Fold one log write into the habit's stats; the caller commits"""
+    if prior.stats is None:
+        rebuild_habit_stats(db, habit_id)
+        return
+
+    # read_prior has already bumped updated_at: any write, even a value-only one,
+    # changes what the read endpoints return
+    stats = prior.stats
+    logged_delta = 0 if prior.existed else 1
+    completed_delta = int(bool(completed)) - int(prior.completed)
+    if not logged_delta and not completed_delta:
+        return
+
+    if completed_delta and d >= prior.start_date:
+        stats.total_completed += completed_delta
+    _bump_periods(db, habit_id, d, completed_delta, logged_delta)
+
+    if completed_delta:
+        bitmap = load_bitmap(db, stats)
+        bitmap.set(d, completed)
+        store_bitmap(stats, bitmap)
+        last = stats.last_completed_date
+        if completed and (last is None or d > last):
+            # Completing a day after every other completed day can only extend or start the last run
+            stats.last_run_length = stats.last_run_length + 1 if last == d - timedelta(days=1) else 1
+            stats.last_completed_date = d
+            stats.longest_streak = max(stats.longest_streak, stats.last_run_length)
+        else:
+            # Backfills and un-completions can split or join runs anywhere, so recount from the bitmap
+            _recompute_streaks(stats, bitmap)
+
+def _bump_periods(db: Session, habit_id: int, d: date, completed_delta: int, logged_delta: int):
+    rows = [
+        {"habit_id": habit_id, "period": period, "period_start": start,
+         "completed": max(completed_delta, 0), "logged": logged_delta}
+        for period, start in period_starts(d)
+    ]
+    insert = dialect_insert(db)
+    if insert is None:
+        for row in rows:
+            counter = db.get(HabitPeriodStats, (habit_id, row["period"], row["period_start"]))
+            if counter is None:
+                db.add(HabitPeriodStats(**row))
+            else:
+                counter.completed += completed_delta
+                counter.logged += logged_delta
+        return
+
+    table = HabitPeriodStats.__table__
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.habit_id, table.c.period, table.c.period_start],
+        set_={
+            "completed": table.c.completed + completed_delta,
+            "logged": table.c.logged + logged_delta,
+        }
+    )
+    db.execute(stmt, rows)
+
+def _completed_dates(db: Session, habit_id: int) -> List[date]:
+    return list(db.execute(
+        select(HabitLog.date).where(HabitLog.habit_id == habit_id, HabitLog.completed == True)
+        .order_by(HabitLog.date.asc())
+    ).scalars().all())
+
+def load_bitmap(db: Session, stats: HabitStats) -> CompletionBitmap:
+    """The habit's completion bitmap, built from habit_logs if this stats row predates bitmaps"""
+    if stats.completion_bits is None:
+        return CompletionBitmap.from_dates(_completed_dates(db, stats.habit_id))
+    return CompletionBitmap.from_bytes(stats.completion_origin, stats.completion_bits)
+
+def store_bitmap(stats: HabitStats, bitmap: CompletionBitmap):
+    stats.completion_origin = bitmap.origin
+    stats.completion_bits = bitmap.to_bytes()
+
+def _recompute_streaks(stats: HabitStats, bitmap: CompletionBitmap):
+    last = bitmap.last()
+    stats.longest_streak = bitmap.longest_run()
+    stats.last_completed_date = last
+    stats.last_run_length = bitmap.run_ending(last) if last else 0
+
+def rebuild_habit_stats(db: Session, habit_id: int) -> Optional[HabitStats]:
+    """Recompute a habit's stats and period counters from habit_logs; the caller commits"""
+    # Lock before reading habit_logs so a concurrent upsert_log can't land in between
+    lock_stats(db, [habit_id])
+    habit = db.get(Habit, habit_id)
+    if habit is None:
+        return None
+
+    rows = db.execute(
+        select(HabitLog.date, HabitLog.completed).where(HabitLog.habit_id == habit_id)
+        .order_by(HabitLog.date.asc())
+    ).all()
+    dates = [d for d, completed in rows if completed]
+
+    periods: Dict[Tuple[str, date], List[int]] = {}
+    for d, completed in rows:
+        for key in period_starts(d):
+            counter = periods.setdefault(key, [0, 0])
+            counter[0] += int(bool(completed))
+            counter[1] += 1
+
+    db.execute(delete(HabitPeriodStats).where(HabitPeriodStats.habit_id == habit_id))
+    if periods:
+        db.execute(HabitPeriodStats.__table__.insert(), [
+            {"habit_id": habit_id, "period": period, "period_start": start,
+             "completed": completed, "logged": logged}
+            for (period, start), (completed, logged) in periods.items()
+        ])
+
+    stats = db.get(HabitStats, habit_id) or HabitStats(habit_id=habit_id)
+    stats.total_completed = sum(1 for d in dates if d >= habit.start_date)
+    stats.longest_streak = longest_streak(dates)
+    stats.last_completed_date = dates[-1] if dates else None
+    stats.last_run_length = current_streak(dates, dates[-1]) if dates else 0
+    store_bitmap(stats, CompletionBitmap.from_dates(dates))
+    stats.updated_at = datetime.utcnow()
+    db.add(stats)
+    db.flush()
+    return stats
+
+def rebuild_all(db: Session) -> int:
+    habit_ids = db.execute(select(Habit.id)).scalars().all()
+    for habit_id in habit_ids:
+        rebuild_habit_stats(db, habit_id)
+        db.commit()
+    return len(habit_ids)
+
+def insights_from_stats(habit: Habit, stats: Optional[HabitStats], today: date) -> Optional[InsightOut]:
+    """InsightOut straight from the stats row, or None if it can't answer for today"""
+    if stats is None:
+        return None
+    if stats.completion_bits is not None:
+        bitmap = CompletionBitmap.from_bytes(stats.completion_origin, stats.completion_bits)
+        streak = bitmap.run_ending(today)
+        total_completed = bitmap.count(habit.start_date, today)
+    elif stats.last_completed_date is not None and stats.last_completed_date > today:
+        # Without a bitmap, a completion dated after today hides the run ending today
+        return None
+    else:
+        streak = stats.last_run_length if stats.last_completed_date == today else 0
+        total_completed = stats.total_completed
+
+    total_days = (today - habit.start_date).days + 1
+    avg_completion_percent = (total_completed / total_days * 100) if total_days > 0 else 0.0
+
+    return InsightOut(
+        habit_id=habit.id,
+        name=habit.name,
+        seven_day_streak=min(streak, 7),
+        twenty_eight_day_streak=min(streak, 28),
+        avg_completion_percent=avg_completion_percent
+    )
+
+def period_counts(db: Session, habit_id: int, period: str, start: date, end: date, user_id: int | None = None):
+    """Materialized (completed, logged) counts per period_start in [start, end].
+
+    Returns (found, counts): found is False if the habit doesn't exist for this
+    user, and counts is None when the habit has no stats yet.
+    """
+    stmt = select(
+        HabitStats.habit_id, HabitPeriodStats.period_start, HabitPeriodStats.completed, HabitPeriodStats.logged
+    ).select_from(Habit).outerjoin(
+        HabitStats, HabitStats.habit_id == Habit.id
+    ).outerjoin(
+        HabitPeriodStats,
+        (HabitPeriodStats.habit_id == Habit.id) & (HabitPeriodStats.period == period)
+        & (HabitPeriodStats.period_start >= start) & (HabitPeriodStats.period_start <= end)
+    ).where(Habit.id == habit_id)
+    if user_id is not None:
+        stmt = stmt.where(Habit.user_id == user_id)
+
+    rows = db.execute(stmt).all()
+    if not rows:
+        return False, None
+    if rows[0][0] is None:
+        return True, None
+    return True, {period_start: (completed, logged) for _, period_start, completed, logged in rows if period_start is not None}
+
+if __name__ == "__main__":
+    import argparse
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild materialized habit statistics from habit_logs")
+    parser.add_argument("--habit", type=int, help="rebuild a single habit instead of all of them")
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        if args.habit is not None:
+            if rebuild_habit_stats(session, args.habit) is None:
+                raise SystemExit(f"Habit {args.habit} not found")
+            session.commit()
+            print(f"Rebuilt stats for habit {args.habit}")
+        else:
+            print(f"Rebuilt stats for {rebuild_all(session)} habits")
+    finally:
+        session.close()
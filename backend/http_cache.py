@@ -0,0 +1,81 @@
+"""Conditional GETs for the per-habit read endpoints.
+
+Every response built from a habit's logs carries an ETag and Last-Modified
+derived from when the habit's logs last changed. A client that sends either
+validator back (If-None-Match / If-Modified-Since) gets a bodyless 304 after a
+single lookup, before any logs are read or trends computed.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, time, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from auth import HabitScope, get_habit_scope
+from routing import get_read_db
+import crud_async
+
+# Revalidate on every use, and only in the caller's own cache
+CACHE_CONTROL = "private, no-cache"
+
+@dataclass(frozen=True)
+class HabitValidators:
+    etag: str
+    last_modified: datetime
+
+    def headers(self):
+        return {
+            "ETag": self.etag,
+            "Last-Modified": format_datetime(self.last_modified, usegmt=True),
+            "Cache-Control": CACHE_CONTROL,
+        }
+
+def habit_validators(habit_id: int, changed_at: datetime, today: date) -> HabitValidators:
+    # Insights and trends are relative to today, so a new day is a new representation
+    midnight = datetime.combine(today, time.min)
+    last_modified = max(changed_at, midnight).replace(tzinfo=timezone.utc, microsecond=0)
+    return HabitValidators(
+        etag=f'W/"{habit_id}-{changed_at.strftime("%Y%m%d%H%M%S%f")}-{today.isoformat()}"',
+        last_modified=last_modified
+    )
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" name the same representation
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in tags
+
+def is_not_modified(request: Request, validators: HabitValidators) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence; If-Modified-Since is ignored when both are sent
+        return _etag_matches(if_none_match, validators.etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return validators.last_modified <= since
+
+async def conditional_habit_read(
+    request: Request,
+    response: Response,
+    scope: HabitScope = Depends(get_habit_scope),
+    db: AsyncSession = Depends(get_read_db)
+) -> HabitValidators:
+    """Set the habit's validators on the response, or answer 304 if the client's copy is current"""
+    changed_at = await crud_async.habit_last_modified(db, scope.habit_id, scope.user_id)
+    if changed_at is None:
+        raise HTTPException(status_code=404, detail="Habit not found")
+
+    validators = habit_validators(scope.habit_id, changed_at, date.today())
+    if is_not_modified(request, validators):
+        raise HTTPException(status_code=304, headers=validators.headers())
+    response.headers.update(validators.headers())
+    return validators
@@ -1,26 +1,53 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta, date as date_type
+from typing import Literal
 import os
 from dotenv import load_dotenv
 
-from database import engine, get_db, Base
-from models import User, Habit, HabitLog
+from database import engine, async_engine, async_replica_engine, get_async_db, Base
 from schemas import (
     UserCreate, UserLogin, UserOut, HabitCreate, HabitOut, 
-    HabitLogUpsert, HabitLogOut, InsightOut
+    HabitLogUpsert, HabitLogOut, InsightOut, DashboardHabitOut,
+    HabitLogBulkIn, HabitLogBulkOut, ExportJobOut, ActivityHeatmapOut
 )
-from auth import create_access_token, get_current_user, hash_password, verify_password
-from crud import upsert_log, logs_in_range, calculate_insights, get_weekly_trend, get_monthly_trend, get_daily_logs_for_chart
-from export import generate_csv_report, generate_pdf_report
+from auth import (
+    create_access_token, get_current_user, get_habit_scope, hash_password, verify_and_update_password,
+    get_streaming_user, CurrentUser, HabitScope, user_cache
+)
+from crud_async import (
+    get_user_by_email, create_user, update_password_hash, create_habit, list_habits, get_habit, archive_habit,
+    upsert_log, bulk_upsert_logs, calculate_insights, get_dashboard,
+    get_weekly_trend, get_monthly_trend, get_daily_logs_for_chart, get_habit_analytics,
+    get_activity_heatmap
+)
+from crud import ANALYTICS_SECTIONS
+from export import stream_csv_report, generate_pdf_report
+from http_cache import conditional_habit_read, HabitValidators
+from analytics_cache import analytics_cache, cached
+from migrations import run_migrations
+from pagination import DEFAULT_LOG_PAGE_SIZE, MAX_LOG_PAGE_SIZE, decode_cursor, fetch_page, stream_logs_ndjson
+import events
+import export_jobs
+import password_pool
+import pool_metrics
+import request_metrics
+from request_metrics import RequestMetricsMiddleware, TimedRoute
+from routing import get_read_db, get_read_db_sync, note_write, read_from_replica
 
 load_dotenv()
 
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
+
+MAX_TREND_BUCKETS = 520
+MAX_CHART_DAYS = 366
 
 app = FastAPI(title="Habit Tracker API", version="1.0.0")
+app.router.route_class = TimedRoute
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,7 +55,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified", "Server-Timing"],
 )
+app.add_middleware(RequestMetricsMiddleware)
+
+@app.on_event("shutdown")
+async def shutdown_background_resources():
+    export_jobs.shutdown()
+    password_pool.shutdown()
+    await async_engine.dispose()
+    if async_replica_engine is not async_engine:
+        await async_replica_engine.dispose()
 
 @app.get("/")
 def root():
@@ -37,212 +74,323 @@ def root():
 # ============ AUTH ENDPOINTS ============
 
 @app.post("/api/auth/register", response_model=UserOut)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     #Register a new user
-    existing_user = db.query(User).filter(User.email == user.email).first()
+    existing_user = await get_user_by_email(db, user.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = hash_password(user.password)
-    new_user = User(email=user.email, hashed_password=hashed_password)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
+    hashed_password = await password_pool.run_password_job(hash_password, user.password)
+    return await create_user(db, user.email, hashed_password)
 
 @app.post("/api/auth/login")
-def login(user: UserLogin, db: Session = Depends(get_db)):
+async def login(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
     #Login user and return JWT token
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+    db_user = await get_user_by_email(db, user.email)
+    if not db_user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    valid, new_hash = await password_pool.run_password_job(
+        verify_and_update_password, user.password, db_user.hashed_password
+    )
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Stored with outdated bcrypt parameters; upgrade while we have the plaintext
+        await update_password_hash(db, db_user, new_hash)
     
-    access_token = create_access_token(data={"sub": str(db_user.id)})
+    access_token = create_access_token(data={"sub": str(db_user.id), "email": db_user.email})
     return {"access_token": access_token, "token_type": "bearer", "user": UserOut.from_orm(db_user)}
 
+# ============ METRICS ENDPOINTS ============
+
+@app.get("/api/metrics/cache")
+def cache_metrics():
+    #Hit rate and size of the caches
+    return {"user_cache": user_cache.stats(), "analytics_cache": analytics_cache.stats()}
+
+@app.get("/api/metrics/events")
+def event_metrics():
+    #Connected event stream subscribers in this worker
+    return events.broker.stats()
+
+@app.get("/api/metrics/pool")
+def pool_metrics_report():
+    #Connection pool usage and checkout waits per engine
+    return pool_metrics.snapshot()
+
+@app.get("/api/metrics/passwords")
+def password_metrics():
+    #Password hashing executor load and rejected requests
+    return password_pool.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    #Request, query, cache, pool and password metrics in Prometheus text format
+    return PlainTextResponse(
+        request_metrics.render({
+            "cache": {"user_cache": user_cache.stats(), "analytics_cache": analytics_cache.stats()},
+            "pool": pool_metrics.snapshot(),
+            "password_executor": {"bcrypt": password_pool.stats()},
+            "events": {"subscribers": events.broker.stats()},
+        }),
+        media_type="text/plain; version=0.0.4"
+    )
+
 # ============ HABIT ENDPOINTS ============
 
 @app.post("/api/habits", response_model=HabitOut)
-def create_new_habit(
+async def create_new_habit(
     habit: HabitCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     #Create a new habit
-    new_habit = Habit(
-        user_id=current_user.id,
-        name=habit.name,
-        htype=habit.htype,
-        goal=habit.goal,
-        start_date=habit.start_date
-    )
-    db.add(new_habit)
-    db.commit()
-    db.refresh(new_habit)
-    return new_habit
+    created = await create_habit(db, current_user.id, habit.name, habit.htype, habit.goal, habit.start_date)
+    note_write(current_user.id)
+    if await events.has_subscribers(current_user.id):
+        await events.publish(current_user.id, "habit_created", habit=HabitOut.from_orm(created))
+    return created
 
 @app.get("/api/habits", response_model=list[HabitOut])
-def get_habits(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_habits(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
     #Get all active habits for current user
-    habits = db.query(Habit).filter(
-        Habit.user_id == current_user.id,
-        Habit.archived == False
-    ).all()
-    return habits
+    return await list_habits(db, current_user.id)
+
+@app.get("/api/dashboard", response_model=list[DashboardHabitOut])
+async def get_dashboard_habits(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    #Get all active habits with today's log and streak insights in one call
+    return await get_dashboard(db, current_user.id)
+
+@app.get("/api/activity/heatmap", response_model=ActivityHeatmapOut)
+async def get_heatmap(
+    days: int = Query(365, ge=1, le=MAX_CHART_DAYS),
+    encoding: Literal["dense", "rle"] = "dense",
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    #Get completed habits per day across all active habits, for a contribution heatmap
+    return await get_activity_heatmap(db, current_user.id, days, encoding)
 
 @app.delete("/api/habits/{habit_id}")
-def delete_habit(
+async def delete_habit(
     habit_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
 
-    habit = db.query(Habit).filter(
-        Habit.id == habit_id,
-        Habit.user_id == current_user.id
-    ).first()
+    habit = await get_habit(db, habit_id, current_user.id)
     if not habit:
         raise HTTPException(status_code=404, detail="Habit not found")
     
-    habit.archived = True
-    db.commit()
+    await archive_habit(db, habit)
+    note_write(current_user.id)
+    if await events.has_subscribers(current_user.id):
+        await events.publish(current_user.id, "habit_archived", habit_id=habit_id)
     return {"message": "Habit archived"}
 
+# ============ EVENT ENDPOINTS ============
+
+@app.get("/api/events")
+async def stream_events(current_user: CurrentUser = Depends(get_streaming_user)):
+    #Server-sent events with the user's log, habit created and habit archived deltas
+    return StreamingResponse(
+        events.event_stream(current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ============ HABIT LOG ENDPOINTS ============
 
 @app.post("/api/habits/{habit_id}/logs", response_model=HabitLogOut)
-def log_habit(
-    habit_id: int,
+async def log_habit(
     log_data: HabitLogUpsert,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    scope: HabitScope = Depends(get_habit_scope),
+    db: AsyncSession = Depends(get_async_db)
 ):
     #Log a habit completion (upsert)
-    habit = db.query(Habit).filter(
-        Habit.id == habit_id,
-        Habit.user_id == current_user.id
-    ).first()
-    if not habit:
+    try:
+        log_entry = await upsert_log(db, scope.habit_id, log_data.date, log_data.value, log_data.completed, scope.user_id)
+    except ValueError as error:
+        raise HTTPException(status_code=422, detail=str(error))
+    if log_entry is None:
         raise HTTPException(status_code=404, detail="Habit not found")
-    
-    log_entry = upsert_log(db, habit_id, log_data.date, log_data.value, log_data.completed)
+    note_write(scope.user_id)
+    if await events.has_subscribers(scope.user_id):
+        insights = await calculate_insights(db, scope.habit_id, scope.user_id)
+        await events.publish(
+            scope.user_id, "log", habit_id=scope.habit_id, log=HabitLogOut.from_orm(log_entry), insights=insights
+        )
     return log_entry
 
+@app.post("/api/logs/bulk", response_model=HabitLogBulkOut)
+async def bulk_log_habits(
+    payload: HabitLogBulkIn,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    #Upsert many logs across the user's habits in one transaction
+    results = await bulk_upsert_logs(db, current_user.id, payload.logs)
+    note_write(current_user.id)
+    upserted = sum(1 for result in results if result["status"] == "upserted")
+    if upserted and await events.has_subscribers(current_user.id):
+        # A backfill can change any part of a habit's history; name the habits for clients to refetch
+        habit_ids = sorted({result["habit_id"] for result in results if result["status"] == "upserted"})
+        await events.publish(current_user.id, "logs_changed", habit_ids=habit_ids)
+    return {"upserted": upserted, "failed": len(results) - upserted, "results": results}
+
 @app.get("/api/habits/{habit_id}/logs")
-def get_habit_logs(
-    habit_id: int,
+async def get_habit_logs(
+    response: Response,
     start_date: str = None,
     end_date: str = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    #Get logs for a habit in a date range
-    habit = db.query(Habit).filter(
-        Habit.id == habit_id,
-        Habit.user_id == current_user.id
-    ).first()
-    if not habit:
-        raise HTTPException(status_code=404, detail="Habit not found")
-    
+    cursor: str = None,
+    limit: int | None = Query(None, ge=1, le=MAX_LOG_PAGE_SIZE),
+    format: Literal["json", "ndjson"] = "json",
+    validators: HabitValidators = Depends(conditional_habit_read),
+    scope: HabitScope = Depends(get_habit_scope),
+    replica: bool = Depends(read_from_replica),
+    db: AsyncSession = Depends(get_read_db)
+):
+    #Get logs for a habit in a date range, one page at a time (or all of them streamed as NDJSON)
     start = date_type.fromisoformat(start_date) if start_date else date_type.today() - timedelta(days=30)
     end = date_type.fromisoformat(end_date) if end_date else date_type.today()
-    
-    logs = logs_in_range(db, habit_id, start, end)
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Without limit or cursor the whole range comes back in one response, as before pagination
+    if limit is None and (after is not None or format == "ndjson"):
+        limit = DEFAULT_LOG_PAGE_SIZE
+
+    page = await fetch_page(db, scope.habit_id, scope.user_id, start, end, after, limit)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Habit not found")
+    logs, next_cursor = page
+
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_logs_ndjson(logs, scope.habit_id, scope.user_id, start, end, limit, replica),
+            media_type="application/x-ndjson",
+            headers=validators.headers()
+        )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [HabitLogOut.from_orm(log) for log in logs]
 
 # ============ INSIGHTS ENDPOINTS ============
 
 @app.get("/api/habits/{habit_id}/insights", response_model=InsightOut)
-def get_habit_insights(
-    habit_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_habit_insights(
+    validators: HabitValidators = Depends(conditional_habit_read),
+    scope: HabitScope = Depends(get_habit_scope),
+    db: AsyncSession = Depends(get_read_db)
 ):
     #Get insights for a specific habit
-    habit = db.query(Habit).filter(
-        Habit.id == habit_id,
-        Habit.user_id == current_user.id
-    ).first()
-    if not habit:
+    insights = await cached("insights", validators, (), lambda: calculate_insights(db, scope.habit_id, scope.user_id))
+    if insights is None:
         raise HTTPException(status_code=404, detail="Habit not found")
-    
-    return calculate_insights(db, habit_id)
+    return insights
 
 # ============ ANALYTICS ENDPOINTS ============
 
 @app.get("/api/habits/{habit_id}/trends/weekly")
-def get_weekly_trends(
-    habit_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_weekly_trends(
+    weeks: int = Query(4, ge=1, le=MAX_TREND_BUCKETS),
+    calendar: bool = False,
+    validators: HabitValidators = Depends(conditional_habit_read),
+    scope: HabitScope = Depends(get_habit_scope),
+    db: AsyncSession = Depends(get_read_db)
 ):
     #Get weekly trend data for a habit
-    habit = db.query(Habit).filter(
-        Habit.id == habit_id,
-        Habit.user_id == current_user.id
-    ).first()
-    if not habit:
+    trend = await cached(
+        "weekly", validators, (weeks, calendar),
+        lambda: get_weekly_trend(db, scope.habit_id, weeks, calendar, scope.user_id)
+    )
+    if trend is None:
         raise HTTPException(status_code=404, detail="Habit not found")
-    
-    return get_weekly_trend(db, habit_id)
+    return trend
 
 @app.get("/api/habits/{habit_id}/trends/monthly")
-def get_monthly_trends(
-    habit_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_monthly_trends(
+    months: int = Query(3, ge=1, le=MAX_TREND_BUCKETS),
+    calendar: bool = False,
+    validators: HabitValidators = Depends(conditional_habit_read),
+    scope: HabitScope = Depends(get_habit_scope),
+    db: AsyncSession = Depends(get_read_db)
 ):
     #Get monthly trend data for a habit
-    habit = db.query(Habit).filter(
-        Habit.id == habit_id,
-        Habit.user_id == current_user.id
-    ).first()
-    if not habit:
+    trend = await cached(
+        "monthly", validators, (months, calendar),
+        lambda: get_monthly_trend(db, scope.habit_id, months, calendar, scope.user_id)
+    )
+    if trend is None:
         raise HTTPException(status_code=404, detail="Habit not found")
-    
-    return get_monthly_trend(db, habit_id)
+    return trend
 
-@app.get("/api/habits/{habit_id}/chart-data")
-def get_chart_data(
-    habit_id: int,
+@app.get("/api/habits/{habit_id}/chart-data", dependencies=[Depends(conditional_habit_read)])
+async def get_chart_data(
     days: int = 30,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    scope: HabitScope = Depends(get_habit_scope),
+    db: AsyncSession = Depends(get_read_db)
 ):
     #Get daily logs for chart visualization
-    habit = db.query(Habit).filter(
-        Habit.id == habit_id,
-        Habit.user_id == current_user.id
-    ).first()
-    if not habit:
+    chart_data = await get_daily_logs_for_chart(db, scope.habit_id, days, scope.user_id)
+    if chart_data is None:
         raise HTTPException(status_code=404, detail="Habit not found")
-    
-    return get_daily_logs_for_chart(db, habit_id, days)
+    return chart_data
+
+@app.get("/api/habits/{habit_id}/analytics", dependencies=[Depends(conditional_habit_read)])
+async def get_habit_analytics_bundle(
+    sections: str = ",".join(ANALYTICS_SECTIONS),
+    days: int = Query(30, ge=1, le=MAX_CHART_DAYS),
+    weeks: int = Query(4, ge=1, le=MAX_TREND_BUCKETS),
+    months: int = Query(3, ge=1, le=MAX_TREND_BUCKETS),
+    calendar: bool = False,
+    scope: HabitScope = Depends(get_habit_scope),
+    db: AsyncSession = Depends(get_read_db)
+):
+    #Get any of logs, insights, weekly, monthly and daily chart data for a habit in one call
+    requested = {section.strip() for section in sections.split(",") if section.strip()}
+    unknown = requested - set(ANALYTICS_SECTIONS)
+    if not requested or unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"sections must be a comma-separated subset of {', '.join(ANALYTICS_SECTIONS)}"
+        )
+
+    analytics = await get_habit_analytics(db, scope.habit_id, scope.user_id, requested, days, weeks, months, calendar)
+    if analytics is None:
+        raise HTTPException(status_code=404, detail="Habit not found")
+    if "logs" in analytics:
+        analytics["logs"] = [HabitLogOut.from_orm(log) for log in analytics["logs"]]
+    return analytics
 
 # ============ EXPORT ENDPOINTS ============
 
 @app.get("/api/export/csv")
 def export_csv(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    replica: bool = Depends(read_from_replica)
 ):
-    #Export all habits to CSV
-    csv_data = generate_csv_report(db, current_user.id)
+    #Export all habits to CSV, streamed as rows are read
     filename = f"habit_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
     
     return StreamingResponse(
-        iter([csv_data]),
+        stream_csv_report(current_user.id, replica=replica),
         media_type="text/csv",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
 @app.get("/api/export/pdf")
 def export_pdf(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_read_db_sync)
 ):
     #Export all habits to PDF
     pdf_data = generate_pdf_report(db, current_user.id)
@@ -253,3 +401,48 @@ def export_pdf(
         media_type="application/pdf",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
+
+
+@app.post("/api/export/pdf/jobs", response_model=ExportJobOut, status_code=202)
+async def submit_pdf_export(
+    current_user: CurrentUser = Depends(get_current_user),
+    replica: bool = Depends(read_from_replica),
+    db: AsyncSession = Depends(get_read_db)
+):
+    #Start a background PDF export; poll the job and download when done
+    return await db.run_sync(export_jobs.submit_pdf_job, current_user.id, replica)
+
+@app.get("/api/export/pdf/jobs/{job_id}", response_model=ExportJobOut)
+def get_pdf_export_job(
+    job_id: str,
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    #Get the status of a background PDF export
+    job = export_jobs.get_job(job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job
+
+@app.get("/api/export/pdf/jobs/{job_id}/download")
+def download_pdf_export(
+    job_id: str,
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    #Download the PDF produced by a finished export job
+    job = export_jobs.get_job(job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail="Export job failed")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail="Export job is not finished")
+    pdf_data = export_jobs.get_job_result(job)
+    if pdf_data is None:
+        raise HTTPException(status_code=410, detail="Export has expired, submit a new job")
+    filename = f"habit_report_{job['finished_at'].strftime('%Y%m%d_%H%M%S')}.pdf"
+
+    return StreamingResponse(
+        iter([pdf_data]),
+        media_type="application/pdf",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
@@ -0,0 +1,81 @@
+"""Idempotent schema migrations for databases created before a model change.
+
+Base.metadata.create_all only creates missing tables, so columns and indexes added to an
+existing table have to be applied here. Run on startup from main.py, or by hand:
+
+    python migrations.py
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from database import engine as default_engine
+from models import Habit, HabitLog, HabitStats
+
+HABIT_LOG_UNIQUE_INDEX = "uq_habit_logs_habit_id_date"
+
+def _has_index(bind: Engine, table: str, name: str) -> bool:
+    return any(index["name"] == name for index in inspect(bind).get_indexes(table))
+
+def ensure_habit_log_unique_index(bind: Engine) -> bool:
+    """Collapse duplicate (habit_id, date) logs and add the unique composite index.
+
+    The most recently inserted row wins for each duplicate pair. Returns True if
+    the index was created.
+    """
+    if _has_index(bind, HabitLog.__tablename__, HABIT_LOG_UNIQUE_INDEX):
+        return False
+
+    index = next(i for i in HabitLog.__table__.indexes if i.name == HABIT_LOG_UNIQUE_INDEX)
+    with bind.begin() as conn:
+        conn.execute(text(
+            "DELETE FROM habit_logs WHERE id NOT IN "
+            "(SELECT MAX(id) FROM habit_logs GROUP BY habit_id, date)"
+        ))
+        index.create(conn)
+    return True
+
+def _add_updated_at(bind: Engine, table: str) -> bool:
+    columns = {column["name"] for column in inspect(bind).get_columns(table)}
+    if "updated_at" in columns:
+        return False
+
+    with bind.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN updated_at TIMESTAMP"))
+        conn.execute(text(f"UPDATE {table} SET updated_at = created_at"))
+    return True
+
+def ensure_habit_log_updated_at(bind: Engine) -> bool:
+    """Add habit_logs.updated_at, backfilled from created_at. Returns True if the column was added."""
+    return _add_updated_at(bind, HabitLog.__tablename__)
+
+def ensure_habit_updated_at(bind: Engine) -> bool:
+    """Add habits.updated_at, backfilled from created_at. Returns True if the column was added."""
+    return _add_updated_at(bind, Habit.__tablename__)
+
+def ensure_habit_stats_bitmap(bind: Engine) -> bool:
+    """Add the completion bitmap columns to habit_stats. Returns True if they were added.
+
+    Existing rows keep a NULL bitmap until their habit's next write or a
+    `python habit_stats.py` rebuild fills it in.
+    """
+    if not inspect(bind).has_table(HabitStats.__tablename__):
+        return False
+    columns = {column["name"] for column in inspect(bind).get_columns(HabitStats.__tablename__)}
+    if "completion_bits" in columns:
+        return False
+
+    binary = "BYTEA" if bind.dialect.name == "postgresql" else "BLOB"
+    with bind.begin() as conn:
+        conn.execute(text("ALTER TABLE habit_stats ADD COLUMN completion_origin DATE"))
+        conn.execute(text(f"ALTER TABLE habit_stats ADD COLUMN completion_bits {binary}"))
+    return True
+
+def run_migrations(bind: Engine = default_engine):
+    ensure_habit_log_unique_index(bind)
+    ensure_habit_log_updated_at(bind)
+    ensure_habit_updated_at(bind)
+    ensure_habit_stats_bitmap(bind)
+
+if __name__ == "__main__":
+    run_migrations()
+    print("Migrations applied")
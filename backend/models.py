@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Date, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -23,6 +23,7 @@ class Habit(Base):
     goal = Column(Integer, nullable=True)
     archived = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     start_date = Column(Date, nullable=False)
     
     user = relationship("User", back_populates="habits")
@@ -37,5 +38,32 @@ class HabitLog(Base):
     value = Column(Integer, nullable=True) 
     completed = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     habit = relationship("Habit", back_populates="logs")
+
+    # One log per habit per day; also serves every habit_id + date range query
+    __table_args__ = (
+        Index("uq_habit_logs_habit_id_date", "habit_id", "date", unique=True),
+    )
+
+class HabitStats(Base):
+    __tablename__ = "habit_stats"
+
+    habit_id = Column(Integer, ForeignKey("habits.id"), primary_key=True)
+    total_completed = Column(Integer, nullable=False, default=0)  # completed days on or after start_date
+    last_completed_date = Column(Date, nullable=True)
+    last_run_length = Column(Integer, nullable=False, default=0)  # consecutive days ending at last_completed_date
+    longest_streak = Column(Integer, nullable=False, default=0)
+    completion_origin = Column(Date, nullable=True)  # day of bit 0 in completion_bits
+    completion_bits = Column(LargeBinary, nullable=True)  # bitmaps.CompletionBitmap of completed days
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class HabitPeriodStats(Base):
+    __tablename__ = "habit_period_stats"
+
+    habit_id = Column(Integer, ForeignKey("habits.id"), primary_key=True)
+    period = Column(String, primary_key=True)  # "week" (starting Monday) or "month"
+    period_start = Column(Date, primary_key=True)
+    completed = Column(Integer, nullable=False, default=0)
+    logged = Column(Integer, nullable=False, default=0)
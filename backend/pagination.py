@@ -0,0 +1,69 @@
+"""Keyset pagination over a habit's logs.
+
+A page ends with the (date, id) of its last log, handed to the client as an
+opaque cursor; the next page starts strictly after it. Unlike an offset, that
+costs the same index range scan however deep into the history the page is.
+"""
+import base64
+from datetime import date
+from typing import AsyncIterator, List, Tuple
+
+from database import AsyncSessionLocal, AsyncReplicaSessionLocal
+from schemas import HabitLogOut
+import crud_async
+
+DEFAULT_LOG_PAGE_SIZE = 366
+MAX_LOG_PAGE_SIZE = 1000
+
+def encode_cursor(log) -> str:
+    raw = f"{log.date.isoformat()}:{log.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[date, int]:
+    """(date, id) from a cursor made by encode_cursor; ValueError if it isn't one"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        day, log_id = raw.split(":")
+        return date.fromisoformat(day), int(log_id)
+    except (UnicodeDecodeError, ValueError) as error:
+        raise ValueError("Invalid cursor") from error
+
+async def fetch_page(db, habit_id: int, user_id: int, start: date, end: date, after: Tuple[date, int] | None, limit: int | None):
+    """(logs, next_cursor) for one page, or None if the habit isn't the user's.
+
+    With limit None the page is the whole range and there is no next cursor.
+    """
+    # One extra row tells whether another page follows without a COUNT
+    logs = await crud_async.logs_in_range(db, habit_id, start, end, user_id, after, limit + 1 if limit else None)
+    if logs is None:
+        return None
+    if limit and len(logs) > limit:
+        logs = logs[:limit]
+        return logs, encode_cursor(logs[-1])
+    return logs, None
+
+def _ndjson(logs: List) -> str:
+    return "".join(HabitLogOut.model_validate(log).model_dump_json() + "\n" for log in logs)
+
+async def stream_logs_ndjson(
+    first_page: List, habit_id: int, user_id: int, start: date, end: date, page_size: int, replica: bool = False
+) -> AsyncIterator[str]:
+    """Every log in [start, end] as NDJSON, read one keyset page at a time.
+
+    The caller has already fetched (and ownership-checked) the first page; later
+    pages are read in a session of our own because the request's session is
+    closed once the endpoint returns.
+    """
+    yield _ndjson(first_page)
+    if len(first_page) < page_size:
+        return
+    after = (first_page[-1].date, first_page[-1].id)
+    async with (AsyncReplicaSessionLocal if replica else AsyncSessionLocal)() as db:
+        while True:
+            logs = await crud_async.logs_in_range(db, habit_id, start, end, user_id, after, page_size)
+            if not logs:
+                return
+            yield _ndjson(logs)
+            if len(logs) < page_size:
+                return
+            after = (logs[-1].date, logs[-1].id)
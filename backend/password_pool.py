@@ -0,0 +1,61 @@
+"""Bounded executor for bcrypt work.
+
+Hashing and verifying passwords is deliberately slow CPU work. Running it on
+the shared threadpool lets a login storm (for example when a cohort's tokens
+expire together) take every thread the rest of the API needs. It runs here
+instead: on PASSWORD_HASH_WORKERS dedicated threads (bcrypt releases the GIL,
+so they hash in parallel) with at most PASSWORD_HASH_QUEUE jobs waiting.
+Beyond that, callers get a 429 straight away instead of queueing without
+bound.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from fastapi import HTTPException, status
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+RETRY_AFTER_SECONDS = 1
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password")
+# One slot per running or waiting job
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+_lock = threading.Lock()
+_counters = {"completed": 0, "rejected": 0, "in_flight": 0}
+
+def _finished(future):
+    _slots.release()
+    with _lock:
+        _counters["in_flight"] -= 1
+        _counters["completed"] += 1
+
+async def run_password_job(fn: Callable, *args) -> Any:
+    """Run fn(*args) on the password executor, or raise 429 if it is saturated"""
+    if not _slots.acquire(blocking=False):
+        with _lock:
+            _counters["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many password checks in progress, try again shortly",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+    with _lock:
+        _counters["in_flight"] += 1
+    future = _executor.submit(fn, *args)
+    # The slot is freed when the job ends, even if the request gives up waiting first
+    future.add_done_callback(_finished)
+    return await asyncio.wrap_future(future)
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        return {
+            "workers": PASSWORD_HASH_WORKERS,
+            "capacity": PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE,
+            **_counters,
+        }
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
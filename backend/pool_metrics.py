@@ -0,0 +1,118 @@
+"""Connection pool instrumentation.
+
+instrument(engine, name) records, per engine, how long callers waited to
+check a connection out of the pool, how often they timed out waiting, and
+how long connections were held, next to the pool's own size/in-use counters.
+GET /api/metrics/pool reports them: sustained waits with every connection
+checked out mean the pool (or the database) is too small for the load.
+"""
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+class PoolStats:
+    def __init__(self, engine):
+        self.engine = engine
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.held_seconds_total = 0.0
+        self.held_seconds_max = 0.0
+        self._lock = threading.Lock()
+
+    def record_wait(self, seconds: float, timed_out: bool):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def record_held(self, seconds: float):
+        with self._lock:
+            self.held_seconds_total += seconds
+            self.held_seconds_max = max(self.held_seconds_max, seconds)
+
+    def snapshot(self) -> Dict:
+        pool = self.engine.pool
+        counters = {}
+        if isinstance(pool, QueuePool):
+            counters = {
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+            }
+        with self._lock:
+            return {
+                "pool": type(pool).__name__,
+                **counters,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": (self.wait_seconds_total / self.checkouts * 1000) if self.checkouts else 0.0,
+                "wait_ms_max": self.wait_seconds_max * 1000,
+                "held_ms_avg": (self.held_seconds_total / self.checkouts * 1000) if self.checkouts else 0.0,
+                "held_ms_max": self.held_seconds_max * 1000,
+            }
+
+pools: Dict[str, PoolStats] = {}
+
+class _TimedCheckout:
+    """Mixin timing QueuePool._do_get, where a checkout blocks when the pool is exhausted"""
+
+    _stats = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            if self._stats is not None:
+                self._stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        if self._stats is not None:
+            self._stats.record_wait(time.perf_counter() - started, timed_out=False)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep reporting into the same stats
+        pool = super().recreate()
+        pool._stats = self._stats
+        return pool
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+def instrument(engine, name: str) -> PoolStats:
+    """Start collecting pool metrics for a (sync) engine under name"""
+    pool = engine.pool
+    stats = PoolStats(engine)
+    pool._stats = stats
+
+    @event.listens_for(pool, "checkout")
+    def _checked_out(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(pool, "checkin")
+    def _checked_in(dbapi_connection, connection_record):
+        started = connection_record.info.pop("checked_out_at", None)
+        if started is not None:
+            stats.record_held(time.perf_counter() - started)
+
+    if not isinstance(pool, _TimedCheckout):
+        # Pools without a queue (e.g. in-memory SQLite) never wait; count checkouts here instead
+        event.listen(pool, "checkout", lambda *args: stats.record_wait(0.0, timed_out=False))
+
+    pools[name] = stats
+    return stats
+
+def snapshot() -> Dict[str, Dict]:
+    return {name: stats.snapshot() for name, stats in pools.items()}
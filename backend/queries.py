@@ -0,0 +1,29 @@
+from sqlalchemy import select, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from models import Habit, HabitLog
+
+def dialect_insert(db: Session):
+    """The dialect's insert() supporting ON CONFLICT, or None if it has none"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return pg_insert
+    if dialect == "sqlite":
+        return sqlite_insert
+    return None
+
+def habit_with_logs(columns, habit_id: int, user_id: int | None, *log_conditions):
+    """SELECT columns FROM habits LEFT JOIN the habit's logs matching log_conditions.
+
+    When user_id is given the habit must belong to that user, so ownership is
+    checked by the same statement that fetches the data: no rows at all means
+    the habit was not found, while a habit without matching logs still yields
+    one row whose log columns are NULL.
+    """
+    stmt = select(*columns).select_from(Habit).outerjoin(
+        HabitLog, and_(HabitLog.habit_id == Habit.id, *log_conditions)
+    ).where(Habit.id == habit_id)
+    if user_id is not None:
+        stmt = stmt.where(Habit.user_id == user_id)
+    return stmt
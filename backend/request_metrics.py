@@ -0,0 +1,259 @@
+"""Per-request SQL and timing instrumentation.
+
+RequestMetricsMiddleware tracks every HTTP request in a RequestTimings, and
+the engine hooks installed by instrument_engine add each SQL statement and
+its duration to the request that issued it. TimedRoute splits the route's
+time into handler (the endpoint function, including its queries) and
+serialize (validating and encoding what the endpoint returned). Each
+response reports them in a Server-Timing header, which browser dev tools
+show in the network panel:
+
+    Server-Timing: db;dur=3.1;desc="4 queries", handler;dur=5.0, serialize;dur=0.4, total;dur=6.2
+
+The header goes out before the body, so for streamed responses (NDJSON logs,
+CSV export) it only covers the work done before the first chunk; the
+per-route totals at GET /metrics include the whole stream. Statements slower
+than SLOW_QUERY_MS are logged with the route that issued them.
+
+Metrics are kept per worker process, like the cache and pool metrics.
+"""
+import asyncio
+import functools
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_PREFIX = "habit_tracker"
+
+logger = logging.getLogger("habit_tracker.slow_queries")
+
+@dataclass
+class RequestTimings:
+    method: str
+    route: Optional[str] = None  # the route's path template, once the router has matched one
+    started: float = field(default_factory=time.perf_counter)
+    queries: int = 0
+    db_seconds: float = 0.0
+    handler_seconds: float = 0.0
+    serialize_seconds: float = 0.0
+    endpoint_finished: Optional[float] = None
+
+    def server_timing(self) -> str:
+        total = time.perf_counter() - self.started
+        return (
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries", '
+            f"handler;dur={self.handler_seconds * 1000:.1f}, "
+            f"serialize;dur={self.serialize_seconds * 1000:.1f}, "
+            f"total;dur={total * 1000:.1f}"
+        )
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+class _RouteTotals:
+    def __init__(self):
+        self.count = 0
+        self.duration_seconds = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.handler_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.slow_queries = 0
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._responses: Dict[Tuple[str, str, int], int] = defaultdict(int)
+        self._routes: Dict[Tuple[str, str], _RouteTotals] = defaultdict(_RouteTotals)
+
+    def observe(self, timings: RequestTimings, status: int):
+        duration = time.perf_counter() - timings.started
+        key = (timings.method, timings.route or "unmatched")
+        with self._lock:
+            self._responses[(*key, status)] += 1
+            totals = self._routes[key]
+            totals.count += 1
+            totals.duration_seconds += duration
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    totals.buckets[i] += 1
+            totals.queries += timings.queries
+            totals.db_seconds += timings.db_seconds
+            totals.handler_seconds += timings.handler_seconds
+            totals.serialize_seconds += timings.serialize_seconds
+
+    def slow_query(self, timings: RequestTimings):
+        with self._lock:
+            self._routes[(timings.method, timings.route or "unmatched")].slow_queries += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            responses = dict(self._responses)
+            routes = {key: vars(totals).copy() for key, totals in self._routes.items()}
+
+        lines = _family("http_requests_total", "counter", "Responses by route and status")
+        lines += [
+            _sample("http_requests_total", {"method": method, "route": route, "status": status}, count)
+            for (method, route, status), count in sorted(responses.items())
+        ]
+        lines += _family("http_request_duration_seconds", "histogram", "Time from request to last byte of the response")
+        for (method, route), totals in sorted(routes.items()):
+            labels = {"method": method, "route": route}
+            for bound, count in zip(DURATION_BUCKETS, totals["buckets"]):
+                lines.append(_sample("http_request_duration_seconds_bucket", {**labels, "le": bound}, count))
+            lines.append(_sample("http_request_duration_seconds_bucket", {**labels, "le": "+Inf"}, totals["count"]))
+            lines.append(_sample("http_request_duration_seconds_sum", labels, totals["duration_seconds"]))
+            lines.append(_sample("http_request_duration_seconds_count", labels, totals["count"]))
+        for name, kind, help_text, key in (
+            ("db_queries_total", "counter", "SQL statements issued", "queries"),
+            ("db_seconds_total", "counter", "Time spent executing SQL statements", "db_seconds"),
+            ("handler_seconds_total", "counter", "Time spent in endpoint functions", "handler_seconds"),
+            ("serialize_seconds_total", "counter", "Time spent serializing endpoint results", "serialize_seconds"),
+            ("slow_queries_total", "counter", f"SQL statements slower than {SLOW_QUERY_MS:g} ms", "slow_queries"),
+        ):
+            lines += _family(name, kind, help_text)
+            lines += [
+                _sample(name, {"method": method, "route": route}, totals[key])
+                for (method, route), totals in sorted(routes.items())
+            ]
+        return lines
+
+registry = MetricsRegistry()
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _family(name: str, kind: str, help_text: str) -> List[str]:
+    return [f"# HELP {METRIC_PREFIX}_{name} {help_text}", f"# TYPE {METRIC_PREFIX}_{name} {kind}"]
+
+def _sample(name: str, labels: Dict[str, Any], value: float) -> str:
+    label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+    return f"{METRIC_PREFIX}_{name}{{{label_text}}} {value:g}" if labels else f"{METRIC_PREFIX}_{name} {value:g}"
+
+def stats_samples(family: str, stats_by_name: Dict[str, Dict[str, Any]]) -> List[str]:
+    """One gauge per numeric field of {name: stats dict}, e.g. the cache or pool metrics"""
+    fields: Dict[str, List[str]] = {}
+    for name, stats in stats_by_name.items():
+        for key, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                fields.setdefault(key, []).append(_sample(f"{family}_{key}", {"name": name}, value))
+    lines = []
+    for key, samples in fields.items():
+        lines += _family(f"{family}_{key}", "gauge", f"{family} {key.replace('_', ' ')}")
+        lines += samples
+    return lines
+
+def render(stats: Dict[str, Dict[str, Dict[str, Any]]]) -> str:
+    """Request metrics plus stats_samples for each {family: {name: stats}} in Prometheus text format"""
+    lines = registry.samples()
+    for family, stats_by_name in stats.items():
+        lines += stats_samples(family, stats_by_name)
+    return "\n".join(lines) + "\n"
+
+def instrument_engine(engine):
+    """Count and time every statement on a (sync) engine against the current request"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop("query_started", time.perf_counter())
+        timings = _current.get()
+        if timings is not None:
+            timings.queries += 1
+            timings.db_seconds += elapsed
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            where = f"{timings.method} {timings.route or 'unmatched'}" if timings is not None else "outside a request"
+            if timings is not None:
+                registry.slow_query(timings)
+            logger.warning("slow query (%.1f ms) in %s: %s", elapsed * 1000, where, " ".join(statement.split())[:1000])
+
+def _finish_endpoint(started: float):
+    timings = _current.get()
+    if timings is not None:
+        now = time.perf_counter()
+        timings.handler_seconds += now - started
+        timings.endpoint_finished = now
+
+def _timed_endpoint(endpoint):
+    # Keep the endpoint's signature (for FastAPI's dependency injection) and whether it is async
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _finish_endpoint(started)
+    else:
+        @functools.wraps(endpoint)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _finish_endpoint(started)
+    return timed
+
+class TimedRoute(APIRoute):
+    """APIRoute that records its path template and handler/serialize times on the current request"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        route = self.path
+
+        async def timed_handler(request):
+            timings = _current.get()
+            if timings is not None:
+                timings.route = route
+            response = await handler(request)
+            # Everything between the endpoint returning and the response existing is serialization
+            if timings is not None and timings.endpoint_finished is not None:
+                timings.serialize_seconds = time.perf_counter() - timings.endpoint_finished
+            return response
+
+        return timed_handler
+
+class RequestMetricsMiddleware:
+    """ASGI middleware: one RequestTimings per request, a Server-Timing header, and the per-route totals"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings(method=scope["method"])
+        token = _current.set(timings)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message).append("Server-Timing", timings.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            registry.observe(timings, status)
@@ -0,0 +1,56 @@
+"""Route read-only work to the replica, except right after the caller's own writes.
+
+Endpoints that only read take their session from get_read_db (or
+get_read_db_sync) instead of get_async_db. Those sessions go to the replica
+set by DATABASE_REPLICA_URL, unless the same user wrote something within the
+last REPLICA_READ_YOUR_WRITES_SECONDS. In that case they go to the primary,
+so a user never reads back an older state than the one they just saved
+while the replica catches up.
+
+Writes are remembered in the process that served them. With several workers,
+set the window comfortably above the replica's lag, and use sticky sessions
+if a user must see their own writes on every worker.
+"""
+import os
+from typing import AsyncIterator, Iterator
+
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from auth import CurrentUser, get_current_user
+from cache import TTLCache
+from database import (
+    DATABASE_REPLICA_URL, AsyncSessionLocal, AsyncReplicaSessionLocal, SessionLocal, ReplicaSessionLocal
+)
+
+REPLICA_READ_YOUR_WRITES_SECONDS = float(os.getenv("REPLICA_READ_YOUR_WRITES_SECONDS", "10"))
+
+recent_writers = TTLCache(max_size=100_000, ttl=REPLICA_READ_YOUR_WRITES_SECONDS)
+
+def note_write(user_id: int):
+    """Pin the user's reads to the primary for the read-your-writes window"""
+    if DATABASE_REPLICA_URL:
+        recent_writers.set(user_id, True)
+
+def use_replica(user_id: int) -> bool:
+    return bool(DATABASE_REPLICA_URL) and recent_writers.get(user_id) is None
+
+def read_from_replica(current_user: CurrentUser = Depends(get_current_user)) -> bool:
+    """use_replica for the caller, decided once per request: FastAPI caches the
+    result, so an endpoint depending on it opens its own sessions (streamed
+    bodies, export jobs) on the same database as its get_read_db session"""
+    return use_replica(current_user.id)
+
+async def get_read_db(replica: bool = Depends(read_from_replica)) -> AsyncIterator[AsyncSession]:
+    factory = AsyncReplicaSessionLocal if replica else AsyncSessionLocal
+    async with factory() as db:
+        yield db
+
+def get_read_db_sync(replica: bool = Depends(read_from_replica)) -> Iterator[Session]:
+    factory = ReplicaSessionLocal if replica else SessionLocal
+    db = factory()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from datetime import date, datetime
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from datetime import date, datetime, timedelta
+from typing import List, Literal, Optional
 
 # User schemas
 class UserCreate(BaseModel):
@@ -39,11 +39,21 @@ class HabitOut(BaseModel):
         from_attributes = True
 
 # Habit log schemas
+# Logs may be dated at most this many days ahead, for clients in time zones ahead of the server
+MAX_LOG_DAYS_AHEAD = 1
+
 class HabitLogUpsert(BaseModel):
     date: date
     value: Optional[int] = None
     completed: Optional[bool] = None
 
+    @field_validator("date")
+    @classmethod
+    def not_in_the_future(cls, value: date) -> date:
+        if value > date.today() + timedelta(days=MAX_LOG_DAYS_AHEAD):
+            raise ValueError("date is in the future")
+        return value
+
 class HabitLogOut(BaseModel):
     id: int
     habit_id: int
@@ -54,6 +64,26 @@ class HabitLogOut(BaseModel):
     class Config:
         from_attributes = True
 
+MAX_BULK_LOGS = 5000
+
+class HabitLogBulkEntry(HabitLogUpsert):
+    habit_id: int
+
+class HabitLogBulkIn(BaseModel):
+    logs: List[HabitLogBulkEntry] = Field(..., max_length=MAX_BULK_LOGS)
+
+class HabitLogBulkResult(BaseModel):
+    index: int
+    habit_id: int
+    date: date
+    status: Literal["upserted", "not_found", "before_start_date"]
+    log: Optional[HabitLogOut] = None
+
+class HabitLogBulkOut(BaseModel):
+    upserted: int
+    failed: int
+    results: List[HabitLogBulkResult]
+
 # Insight schemas
 class InsightOut(BaseModel):
     habit_id: int
@@ -61,3 +91,24 @@ class InsightOut(BaseModel):
     seven_day_streak: int
     twenty_eight_day_streak: int
     avg_completion_percent: float
+
+# Dashboard schemas
+class DashboardHabitOut(BaseModel):
+    habit: HabitOut
+    today_log: Optional[HabitLogOut]
+    insights: InsightOut
+
+class ActivityHeatmapOut(BaseModel):
+    start: date
+    end: date
+    max: int
+    encoding: Literal["dense", "rle"]
+    counts: List[int]
+
+# Export job schemas
+class ExportJobOut(BaseModel):
+    id: str
+    status: Literal["pending", "done", "failed"]
+    created_at: datetime
+    finished_at: Optional[datetime]
+    error: Optional[str]
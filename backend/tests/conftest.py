@@ -0,0 +1,90 @@
+import itertools
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+# database.py builds its engines at import time, so point it at a scratch file first
+_db_dir = tempfile.mkdtemp(prefix="habit-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+# Cheapest bcrypt cost; tests register a user each
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Base, engine, SessionLocal  # noqa: E402
+import models  # noqa: E402,F401
+
+Base.metadata.create_all(bind=engine)
+
+_user_numbers = itertools.count()
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    import main
+    return TestClient(main.app)
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+def _register(client):
+    email = f"user{next(_user_numbers)}@example.com"
+    client.post("/api/auth/register", json={"email": email, "password": "pw"})
+    body = client.post("/api/auth/login", json={"email": email, "password": "pw"}).json()
+    return SimpleNamespace(id=body["user"]["id"], email=email, headers={"Authorization": f"Bearer {body['access_token']}"})
+
+@pytest.fixture
+def user(client):
+    """A freshly registered user with a bearer token in headers"""
+    return _register(client)
+
+@pytest.fixture
+def other_user(client):
+    """A second registered user, for ownership checks"""
+    return _register(client)
+
+@pytest.fixture
+def habit(client, user):
+    """A boolean habit of user's that started two years ago"""
+    return client.post("/api/habits", headers=user.headers, json={
+        "name": "Run", "htype": "boolean", "start_date": str(date.today() - timedelta(days=730)),
+    }).json()["id"]
+
+@pytest.fixture
+def make_habit(db):
+    """Create a user and a habit straight in the database.
+
+    logs maps date -> completed (or (completed, value)); they are inserted as
+    plain rows, so the habit has no stats yet and reads take the live queries.
+    """
+    from models import Habit, HabitLog, User
+
+    def make(start_date, logs=None, htype="boolean", goal=None):
+        user = User(email=f"direct{next(_user_numbers)}@example.com", hashed_password="not-a-hash")
+        db.add(user)
+        db.flush()
+        habit = Habit(user_id=user.id, name="Habit", htype=htype, goal=goal, start_date=start_date)
+        db.add(habit)
+        db.flush()
+        for d, entry in (logs or {}).items():
+            completed, value = entry if isinstance(entry, tuple) else (entry, None)
+            db.add(HabitLog(habit_id=habit.id, date=d, completed=completed, value=value))
+        db.commit()
+        return habit
+    return make
+
+@pytest.fixture
+def count_queries():
+    """SQL statements a response issued, from its Server-Timing header"""
+    def count(response):
+        db_timing = response.headers["Server-Timing"].split(",")[0]
+        return int(db_timing.split('desc="')[1].split(" ")[0])
+    return count
@@ -0,0 +1,44 @@
+from datetime import date, timedelta
+
+import pytest
+
+import crud
+
+TODAY = date.today()
+
+@pytest.fixture
+def logged_habit(client, user, habit):
+    client.post("/api/logs/bulk", headers=user.headers, json={"logs": [
+        {"habit_id": habit, "date": str(TODAY - timedelta(days=n)), "completed": n % 4 != 1, "value": n}
+        for n in range(-1, 120) if n % 9 != 3
+    ]})
+    return habit
+
+@pytest.mark.parametrize("calendar", [False, True])
+def test_bundle_matches_the_individual_endpoints(client, user, logged_habit, calendar):
+    params = f"days=20&weeks=6&months=4&calendar={str(calendar).lower()}"
+    bundle = client.get(f"/api/habits/{logged_habit}/analytics?{params}", headers=user.headers).json()
+
+    def get(path):
+        return client.get(f"/api/habits/{logged_habit}/{path}", headers=user.headers).json()
+
+    assert bundle["insights"] == get("insights")
+    assert bundle["weekly"] == get(f"trends/weekly?weeks=6&calendar={str(calendar).lower()}")
+    assert bundle["monthly"] == get(f"trends/monthly?months=4&calendar={str(calendar).lower()}")
+    assert bundle["daily"] == get("chart-data?days=20")
+    assert bundle["logs"] == get(f"logs?start_date={TODAY - timedelta(days=20)}&end_date={TODAY}")
+
+def test_only_the_requested_sections_come_back(client, user, logged_habit):
+    bundle = client.get(f"/api/habits/{logged_habit}/analytics?sections=insights,weekly", headers=user.headers).json()
+    assert set(bundle) == {"habit_id", "insights", "weekly"}
+    for sections in ["", "insights,streaks"]:
+        assert client.get(f"/api/habits/{logged_habit}/analytics?sections={sections}", headers=user.headers).status_code == 422
+
+def test_habits_without_stats_match_the_live_queries(db, make_habit):
+    start = TODAY - timedelta(days=200)
+    habit = make_habit(start, {start + timedelta(days=n): n % 3 != 0 for n in range(205)})
+    bundle = crud.get_habit_analytics(db, habit.id, habit.user_id)
+    assert bundle["insights"] == crud.calculate_insights(db, habit.id, habit.user_id)
+    assert bundle["weekly"] == crud.get_weekly_trend(db, habit.id, user_id=habit.user_id)
+    assert bundle["monthly"] == crud.get_monthly_trend(db, habit.id, user_id=habit.user_id)
+    assert bundle["daily"] == crud.get_daily_logs_for_chart(db, habit.id, 30, habit.user_id)
@@ -0,0 +1,38 @@
+import pytest
+
+import auth
+from models import User
+
+def test_cached_user_saves_a_query(client, user, count_queries):
+    auth.user_cache.delete(user.id)
+    cold = count_queries(client.get("/api/habits", headers=user.headers))
+    warm = count_queries(client.get("/api/habits", headers=user.headers))
+    assert cold == warm + 1
+    assert auth.user_cache.get(user.id).email == user.email
+
+def test_user_writes_evict_the_cached_user(client, user, db):
+    client.get("/api/habits", headers=user.headers)
+    db.get(User, user.id).email = f"renamed-{user.email}"
+    db.commit()
+    assert auth.user_cache.get(user.id) is None
+
+def test_stateless_mode_trusts_the_token_claims(client, user, count_queries, monkeypatch):
+    client.get("/api/habits", headers=user.headers)
+    warm = count_queries(client.get("/api/habits", headers=user.headers))
+    monkeypatch.setattr(auth, "AUTH_STATELESS", True)
+    auth.user_cache.delete(user.id)
+    assert count_queries(client.get("/api/habits", headers=user.headers)) == warm
+    assert auth.user_cache.get(user.id) is None
+
+@pytest.mark.parametrize("stateless", [False, True])
+def test_bad_tokens_are_rejected(client, monkeypatch, stateless):
+    monkeypatch.setattr(auth, "AUTH_STATELESS", stateless)
+    forged = auth.jwt.encode({"sub": "1"}, "not-the-secret", algorithm=auth.ALGORITHM)
+    for token in ["garbage", forged, auth.create_access_token({"sub": "not-a-number"})]:
+        assert client.get("/api/habits", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+
+def test_deleted_users_tokens_stop_working(client, user, db):
+    client.get("/api/habits", headers=user.headers)
+    db.delete(db.get(User, user.id))
+    db.commit()
+    assert client.get("/api/habits", headers=user.headers).status_code == 401
@@ -0,0 +1,47 @@
+import os
+import random
+import sys
+from datetime import date, datetime
+
+from sqlalchemy import func, select
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import datagen  # noqa: E402
+from bench_suite import regressions  # noqa: E402
+from models import Habit, HabitLog, HabitStats, User  # noqa: E402
+
+def _rows(seed):
+    spec = datagen.DataSpec(years=2, seed=seed)
+    return list(datagen._log_rows(random.Random(seed), spec, 1, "quantity", 10, date(2022, 1, 1), datetime(2024, 1, 1)))
+
+def test_generated_logs_are_reproducible_and_follow_the_spec():
+    rows = _rows(7)
+    assert rows == _rows(7)
+    assert rows != _rows(8)
+    completed = [row for row in rows if row["completed"]]
+    # Long-run completion rate is the density, with values meeting the goal exactly on completed days
+    assert abs(len(completed) / datagen.DataSpec(years=2).days - 0.7) < 0.1
+    assert all(row["value"] >= 10 for row in completed)
+    assert all(row["value"] < 10 for row in rows if not row["completed"])
+
+def test_generate_writes_users_habits_logs_and_stats(db):
+    first_user = (db.scalar(select(func.max(User.id))) or 0) + 1
+    written = datagen.generate(datagen.DataSpec(users=2, habits_per_user=3, years=0.25), verbose=False)
+
+    habits = db.scalars(select(Habit).where(Habit.user_id >= first_user)).all()
+    assert len(habits) == 6
+    habit_ids = [habit.id for habit in habits]
+    assert db.scalar(select(func.count(HabitLog.id)).where(HabitLog.habit_id.in_(habit_ids))) == written
+    assert db.scalar(select(func.count(HabitStats.habit_id)).where(HabitStats.habit_id.in_(habit_ids))) == 6
+    assert db.get(User, first_user).email == datagen.email_for(first_user)
+
+def test_regressions_flag_latency_queries_and_memory():
+    base = {"case": {"p50_ms": 10.0, "queries": 3, "peak_kib": 1000}}
+    assert regressions({"case": {"p50_ms": 10.9, "queries": 3, "peak_kib": 1050}}, base, 0.1) == []
+    # Cases missing from the baseline, and slowdowns under the 1 ms noise floor, pass
+    assert regressions({"new": {"p50_ms": 99.0, "queries": 9, "peak_kib": 9999}}, base, 0.1) == []
+    fast = {"case": {"p50_ms": 0.5, "queries": 3, "peak_kib": 1000}}
+    assert regressions({"case": {"p50_ms": 1.4, "queries": 3, "peak_kib": 1000}}, fast, 0.1) == []
+    found = regressions({"case": {"p50_ms": 20.0, "queries": 4, "peak_kib": 2000}}, base, 0.1)
+    assert [line.split(":")[1].split()[0] for line in found] == ["p50", "queries", "peak"]
@@ -0,0 +1,52 @@
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import crud
+from models import HabitLog, HabitStats
+from schemas import MAX_BULK_LOGS
+
+START = date(2024, 1, 1)
+
+def _entries(habit_id):
+    """A backfill with gaps, repeated days and partial updates"""
+    entries = []
+    for n in range(40):
+        day = START + timedelta(days=n % 30)
+        entries.append(SimpleNamespace(
+            habit_id=habit_id, date=day,
+            value=n if n % 3 else None,
+            completed=None if n % 5 == 0 else n % 4 != 0,
+        ))
+    return entries
+
+def _state(db, habit_id):
+    logs = [
+        (log.date, log.value, log.completed)
+        for log in db.query(HabitLog).filter(HabitLog.habit_id == habit_id).order_by(HabitLog.date)
+    ]
+    stats = db.get(HabitStats, habit_id)
+    columns = ["total_completed", "last_completed_date", "last_run_length", "longest_streak", "completion_origin", "completion_bits"]
+    return logs, {column: getattr(stats, column) for column in columns}
+
+def test_bulk_matches_sequential_upserts(db, make_habit):
+    bulk, sequential = make_habit(START, htype="quantity", goal=10), make_habit(START, htype="quantity", goal=10)
+    results = crud.bulk_upsert_logs(db, bulk.user_id, _entries(bulk.id))
+    for entry in _entries(sequential.id):
+        crud.upsert_log(db, sequential.id, entry.date, entry.value, entry.completed, sequential.user_id)
+
+    assert {result["status"] for result in results} == {"upserted"}
+    assert _state(db, bulk.id) == _state(db, sequential.id)
+
+def test_other_users_habits_are_not_found(client, user, other_user, habit):
+    day = str(date.today())
+    response = client.post("/api/logs/bulk", headers=other_user.headers, json={
+        "logs": [{"habit_id": habit, "date": day, "completed": True}],
+    })
+    assert response.json()["results"][0]["status"] == "not_found"
+    assert client.get(f"/api/habits/{habit}/logs?start_date={day}", headers=user.headers).json() == []
+
+def test_batches_over_the_limit_are_rejected(client, user, habit):
+    entry = {"habit_id": habit, "date": str(date.today()), "completed": True}
+    assert client.post("/api/logs/bulk", headers=user.headers, json={"logs": [entry] * (MAX_BULK_LOGS + 1)}).status_code == 422
+    response = client.post("/api/logs/bulk", headers=user.headers, json={"logs": [entry] * MAX_BULK_LOGS})
+    assert response.json()["upserted"] == MAX_BULK_LOGS
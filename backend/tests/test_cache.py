@@ -0,0 +1,54 @@
+from datetime import date
+
+import pytest
+
+from analytics_cache import analytics_cache
+from cache import RedisCache, TTLCache
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    assert cache.stats()["size"] == 2
+
+def test_ttl_cache_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("cache.time.monotonic", lambda: now[0])
+    cache = TTLCache(ttl=5)
+    cache.set("a", 1)
+    now[0] += 4.9
+    assert cache.get("a") == 1
+    now[0] += 0.2
+    assert cache.get("a", "gone") == "gone"
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+def test_redis_cache_round_trips_json_under_its_prefix():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis()
+    cache, neighbour = RedisCache(client, prefix="a:"), RedisCache(client, prefix="b:")
+    cache.set("k", {"rate": 50.0, "days": [1, 2]})
+    neighbour.set("k", 1)
+    assert cache.get("k") == {"rate": 50.0, "days": [1, 2]}
+    cache.clear()
+    assert (cache.get("k"), neighbour.get("k")) == (None, 1)
+
+def test_trend_reads_are_cached_until_the_next_write(client, user, habit, count_queries):
+    url = f"/api/habits/{habit}/trends/weekly"
+    first = client.get(url, headers=user.headers)
+    hits = analytics_cache.stats()["hits"]
+    second = client.get(url, headers=user.headers)
+    assert second.json() == first.json()
+    assert analytics_cache.stats()["hits"] == hits + 1
+    assert count_queries(second) < count_queries(first)
+
+    client.post(f"/api/habits/{habit}/logs", headers=user.headers, json={"date": str(date.today()), "completed": True})
+    third = client.get(url, headers=user.headers)
+    assert analytics_cache.stats()["hits"] == hits + 1
+    assert third.json()[-1]["completed_days"] == first.json()[-1]["completed_days"] + 1
+
+def test_cached_insights_are_per_user(client, user, other_user, habit):
+    client.get(f"/api/habits/{habit}/insights", headers=user.headers)
+    assert client.get(f"/api/habits/{habit}/insights", headers=other_user.headers).status_code == 404
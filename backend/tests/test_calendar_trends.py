@@ -0,0 +1,26 @@
+"""Calendar trends served from the materialized counters must match the live queries"""
+from datetime import date, timedelta
+
+import crud
+from database import SessionLocal
+from models import Habit, User
+from trends import buckets_from_logs, calendar_month_buckets, calendar_month_ranges, calendar_week_buckets, calendar_week_ranges
+
+def test_future_dated_logs_are_left_out_of_the_current_period():
+    today = date.today()
+    db = SessionLocal()
+    try:
+        user = User(email="calendar@example.com", hashed_password="not-a-hash")
+        db.add(user)
+        db.flush()
+        habit = Habit(user_id=user.id, name="Run", htype="boolean", start_date=today - timedelta(days=60))
+        db.add(habit)
+        db.commit()
+        for days_ago in range(-3, 40):
+            crud.upsert_log(db, habit.id, today - timedelta(days=days_ago), None, days_ago % 4 != 0, user.id)
+
+        logs = [(log.date, log.completed) for log in crud.logs_in_range(db, habit.id, today - timedelta(days=120), today + timedelta(days=3))]
+        assert calendar_week_buckets(db, habit.id, 6, today, user.id) == buckets_from_logs(logs, calendar_week_ranges(6, today), today)
+        assert calendar_month_buckets(db, habit.id, 3, today, user.id) == buckets_from_logs(logs, calendar_month_ranges(3, today), today)
+    finally:
+        db.close()
@@ -0,0 +1,79 @@
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import analytics
+import columnar
+from trends import buckets_from_logs, calendar_month_ranges, calendar_week_ranges, rolling_ranges
+
+TODAY = date(2024, 6, 30)
+START = date(2023, 1, 1)
+
+@pytest.fixture
+def habits(make_habit):
+    """Three habits with random logs, as {habit_id: {date: (completed, value)}}"""
+    rng = random.Random(15)
+    habits = {}
+    for density in (0.3, 0.7, 0.95):
+        logs = {}
+        for n in range((TODAY - START).days + 2):
+            if rng.random() < density:
+                logs[START + timedelta(days=n)] = (rng.random() < density, rng.choice([None, rng.randrange(10)]))
+        habits[make_habit(START, logs, htype="quantity", goal=5).id] = logs
+    return habits
+
+def test_columns_load_every_log(db, habits):
+    columns = columnar.load_columns(db, habits)
+    for habit_id, logs in habits.items():
+        habit = columns.habit(habit_id)
+        assert [date.fromordinal(int(o)) for o in habit.ordinals] == sorted(logs)
+        assert habit.completed.tolist() == [logs[d][0] for d in sorted(logs)]
+        assert habit.values.tolist() == [logs[d][1] for d in sorted(logs)]
+    assert len(columnar.load_columns(db, habits, TODAY, TODAY)) == sum(TODAY in logs for logs in habits.values())
+
+def test_columnar_analytics_match_analytics_and_trends(db, habits):
+    columns = columnar.load_columns(db, habits)
+    ranges = [rolling_ranges(20, 7, TODAY), calendar_week_ranges(30, TODAY), calendar_month_ranges(18, TODAY)]
+    for habit_id, logs in habits.items():
+        habit = columns.habit(habit_id)
+        completed_dates = sorted(d for d, (done, _) in logs.items() if done)
+        for window in (None, 7, 28):
+            assert columnar.current_streak(habit.completed_ordinals(), TODAY, window) == analytics.current_streak(completed_dates, TODAY, window)
+        assert columnar.longest_streak(habit.completed_ordinals()) == analytics.longest_streak(completed_dates)
+        pairs = sorted((d, done) for d, (done, _) in logs.items())
+        for bucket_ranges in ranges:
+            assert columnar.bucket_rows(habit, bucket_ranges, TODAY) == buckets_from_logs(pairs, bucket_ranges, TODAY)
+
+def test_rolling_series_match_a_day_by_day_pass(db, habits):
+    columns = columnar.load_columns(db, habits)
+    start = TODAY - timedelta(days=60)
+    days = [start + timedelta(days=n) for n in range(61)]
+    for habit_id, logs in habits.items():
+        habit = columns.habit(habit_id)
+        rates = columnar.rolling_completion_rate(habit, start, TODAY, 7)
+        averages = columnar.moving_average(habit, start, TODAY, 7)
+        for i, day in enumerate(days):
+            window = days[max(i - 6, 0):i + 1]
+            done = sum(1 for d in window if logs.get(d, (False, None))[0])
+            assert rates[i] == pytest.approx(done / len(window) * 100)
+            values = [logs[d][1] for d in window if d in logs and logs[d][1] is not None]
+            if values:
+                assert averages[i] == pytest.approx(sum(values) / len(values))
+            else:
+                assert averages.mask[i]
+
+def test_completion_rates_by_habit(db, habits):
+    start = TODAY - timedelta(days=89)
+    rates = columnar.completion_rates_by_habit(columnar.load_columns(db, habits), start, TODAY)
+    for habit_id, logs in habits.items():
+        done = sum(1 for d, (completed, _) in logs.items() if completed and start <= d <= TODAY)
+        assert rates[habit_id] == pytest.approx(done / 90 * 100)
+
+def test_empty_columns():
+    columns = columnar.from_rows([])
+    assert len(columns) == 0
+    assert columnar.longest_streak(columns.completed_ordinals()) == 0
+    assert columnar.current_streak(columns.completed_ordinals(), TODAY) == 0
+    assert not np.any(columnar.daily_completed(columns, TODAY - timedelta(days=3), TODAY))
@@ -0,0 +1,54 @@
+import asyncio
+from datetime import date, timedelta
+
+import httpx
+import pytest
+
+import crud
+import crud_async
+import main
+from database import AsyncSessionLocal, async_url
+
+START = date.today() - timedelta(days=40)
+
+@pytest.mark.parametrize("url,expected", [
+    ("sqlite:///./habits.db", "sqlite+aiosqlite:///./habits.db"),
+    ("postgresql://u:p@db/habits", "postgresql+asyncpg://u:p@db/habits"),
+    ("postgresql+psycopg2://u:p@db/habits", "postgresql+asyncpg://u:p@db/habits"),
+])
+def test_async_url_swaps_the_driver(url, expected):
+    assert async_url(url) == expected
+
+def test_async_layer_returns_what_crud_returns(db, make_habit):
+    habit = make_habit(START, {START + timedelta(days=n): n % 3 != 0 for n in range(40)})
+    crud.rebuild_habit_stats(db, habit.id)
+    db.commit()
+
+    async def scenario():
+        async with AsyncSessionLocal() as session:
+            return (
+                await crud_async.calculate_insights(session, habit.id, habit.user_id),
+                await crud_async.get_weekly_trend(session, habit.id, user_id=habit.user_id),
+                [log.id for log in await crud_async.logs_in_range(session, habit.id, START, date.today(), habit.user_id)],
+                await crud_async.get_habit(session, habit.id, habit.user_id + 1000),
+            )
+
+    insights, weekly, log_ids, foreign = asyncio.run(scenario())
+    assert insights == crud.calculate_insights(db, habit.id, habit.user_id)
+    assert weekly == crud.get_weekly_trend(db, habit.id, user_id=habit.user_id)
+    assert log_ids == [log.id for log in crud.logs_in_range(db, habit.id, START, date.today(), habit.user_id)]
+    assert foreign is None
+
+def test_concurrent_check_ins_all_land(client, user, habit):
+    async def scenario():
+        async with httpx.AsyncClient(app=main.app, base_url="http://test") as http:
+            return await asyncio.gather(*(
+                http.post(f"/api/habits/{habit}/logs", headers=user.headers, json={
+                    "date": str(date.today() - timedelta(days=n)), "completed": True,
+                })
+                for n in range(20)
+            ))
+
+    assert [response.status_code for response in asyncio.run(scenario())] == [200] * 20
+    insights = client.get(f"/api/habits/{habit}/insights", headers=user.headers).json()
+    assert insights["twenty_eight_day_streak"] == 20
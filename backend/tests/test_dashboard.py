@@ -0,0 +1,34 @@
+from datetime import date, timedelta
+
+def _add_habit(client, user, n, completed_today):
+    habit = client.post("/api/habits", headers=user.headers, json={
+        "name": f"Habit {n}", "htype": "quantity", "goal": 5, "start_date": str(date.today() - timedelta(days=20)),
+    }).json()["id"]
+    for days_ago in range(n + 1):
+        client.post(f"/api/habits/{habit}/logs", headers=user.headers, json={
+            "date": str(date.today() - timedelta(days=days_ago)), "completed": completed_today or days_ago > 0, "value": n,
+        })
+    return habit
+
+def test_dashboard_matches_the_per_habit_endpoints(client, user):
+    habits = [_add_habit(client, user, n, completed_today=n % 2 == 0) for n in range(4)]
+    dashboard = client.get("/api/dashboard", headers=user.headers).json()
+    assert [row["habit"]["id"] for row in dashboard] == habits
+    for row in dashboard:
+        habit = row["habit"]["id"]
+        assert row["insights"] == client.get(f"/api/habits/{habit}/insights", headers=user.headers).json()
+        today_log = client.get(f"/api/habits/{habit}/logs?start_date={date.today()}", headers=user.headers).json()
+        assert row["today_log"] == today_log[0]
+
+def test_dashboard_query_count_does_not_grow_with_habits(client, user, count_queries):
+    _add_habit(client, user, 0, completed_today=True)
+    client.get("/api/dashboard", headers=user.headers)
+    few = count_queries(client.get("/api/dashboard", headers=user.headers))
+    for n in range(1, 6):
+        _add_habit(client, user, n, completed_today=False)
+    assert count_queries(client.get("/api/dashboard", headers=user.headers)) == few
+
+def test_archived_habits_are_left_out(client, user):
+    kept, archived = _add_habit(client, user, 0, True), _add_habit(client, user, 1, True)
+    client.delete(f"/api/habits/{archived}", headers=user.headers)
+    assert [row["habit"]["id"] for row in client.get("/api/dashboard", headers=user.headers).json()] == [kept]
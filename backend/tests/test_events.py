@@ -0,0 +1,85 @@
+import asyncio
+import json
+from datetime import date
+
+import httpx
+import pytest
+
+import events
+from events import LocalBroker, RedisBroker
+
+def test_local_broker_delivers_to_the_users_subscribers_only():
+    async def scenario():
+        broker = LocalBroker(queue_size=10)
+        assert not await broker.has_subscribers(1)
+        async with broker.subscribe(1) as queue:
+            assert await broker.has_subscribers(1)
+            await broker.publish(1, {"type": "log", "habit_id": 7})
+            await broker.publish(2, {"type": "log", "habit_id": 8})
+            assert queue.get_nowait() == {"type": "log", "habit_id": 7}
+            assert queue.empty()
+        assert not await broker.has_subscribers(1)
+
+    asyncio.run(scenario())
+
+def test_slow_subscriber_is_told_to_resync():
+    async def scenario():
+        broker = LocalBroker(queue_size=2)
+        async with broker.subscribe(1) as queue:
+            for n in range(3):
+                await broker.publish(1, {"type": "log", "n": n})
+            assert queue.get_nowait() == {"type": "resync"}
+            assert queue.empty()
+
+    asyncio.run(scenario())
+
+def test_event_stream_formats_server_sent_events():
+    async def scenario():
+        stream = events.event_stream(424242)
+        assert (await stream.__anext__()).startswith("retry: ")
+        next_event = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        await events.publish(424242, "habit_archived", habit_id=3)
+        chunk = await next_event
+        await stream.aclose()
+        return chunk
+
+    chunk = asyncio.run(scenario())
+    assert chunk.startswith("event: habit_archived\ndata: ")
+    assert json.loads(chunk.split("data: ", 1)[1]) == {"type": "habit_archived", "habit_id": 3}
+
+def test_check_in_is_pushed_to_the_users_stream(client, user, habit):
+    import main
+
+    async def scenario():
+        async with events.broker.subscribe(user.id) as queue:
+            async with httpx.AsyncClient(app=main.app, base_url="http://test") as api:
+                response = await api.post(
+                    f"/api/habits/{habit}/logs", headers=user.headers, json={"date": str(date.today()), "completed": True}
+                )
+            assert response.status_code == 200
+            return queue.get_nowait()
+
+    event = asyncio.run(scenario())
+    assert event["type"] == "log"
+    assert event["habit_id"] == habit
+    assert event["log"]["completed"] is True
+    assert event["insights"]["seven_day_streak"] == 1
+
+def test_redis_broker_sees_subscribers_on_other_workers():
+    fakeredis = pytest.importorskip("fakeredis")
+
+    async def scenario():
+        server = fakeredis.FakeServer()
+        writer = RedisBroker(fakeredis.FakeAsyncRedis(server=server))
+        reader = RedisBroker(fakeredis.FakeAsyncRedis(server=server))
+        assert not await writer.has_subscribers(5)
+        async with reader.subscribe(5) as queue:
+            assert await writer.has_subscribers(5)
+            await writer.publish(5, {"type": "habit_archived", "habit_id": 1})
+            event = await asyncio.wait_for(queue.get(), 5)
+        assert not await writer.has_subscribers(5)
+        reader._listener.cancel()
+        return event
+
+    assert asyncio.run(scenario()) == {"type": "habit_archived", "habit_id": 1}
@@ -0,0 +1,61 @@
+import csv
+import io
+from datetime import date, timedelta
+
+import export
+
+def test_pdf_report_renders_charts_from_the_crud_series(client, user, habit, db):
+    today = date.today()
+    client.post("/api/logs/bulk", headers=user.headers, json={"logs": [
+        {"habit_id": habit, "date": str(today - timedelta(days=n)), "completed": n % 2 == 0} for n in range(20)
+    ]})
+    assert export.generate_pdf_report(db, user.id).startswith(b"%PDF")
+
+def test_daily_chart_accepts_the_api_series():
+    series = [{"date": "2024-03-01", "completed": True, "value": None}, {"date": "2024-03-02", "completed": False, "value": None}]
+    chart = export.create_daily_chart(series)
+    assert chart.contents[0].categoryAxis.categoryNames == ["03/01", "03/02"]
+
+def _expected_csv_rows(client, user, habits):
+    """The report's rows rebuilt from the habits and logs endpoints"""
+    rows = []
+    for habit in habits:
+        rows.append([f"Habit: {habit['name']}"])
+        if habit["goal"]:
+            rows.append([f"Goal: {habit['goal']}"])
+        rows.append(["Date", "Completed", "Value"])
+        logs = client.get(f"/api/habits/{habit['id']}/logs?start_date=2000-01-01", headers=user.headers).json()
+        for log in sorted(logs, key=lambda log: log["date"], reverse=True):
+            rows.append([log["date"], "Yes" if log["completed"] else "No", str(log["value"] or "")])
+        rows.append([])
+    return rows
+
+def test_streamed_csv_matches_the_stored_logs(client, user, monkeypatch):
+    monkeypatch.setattr(export, "CSV_CHUNK_ROWS", 7)
+    today = date.today()
+    habits = []
+    for n, goal in enumerate([None, 8, None]):
+        habits.append(client.post("/api/habits", headers=user.headers, json={
+            "name": f"Habit, \"{n}\"", "htype": "quantity" if goal else "boolean", "goal": goal,
+            "start_date": str(today - timedelta(days=90)),
+        }).json())
+    # The last habit has no logs and still gets its header
+    client.post("/api/logs/bulk", headers=user.headers, json={"logs": [
+        {"habit_id": habit["id"], "date": str(today - timedelta(days=d)), "completed": d % 3 != 0, "value": d or None}
+        for habit in habits[:2] for d in range(25)
+    ]})
+
+    response = client.get("/api/export/csv", headers=user.headers)
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0][0] == "Habit Tracker Report" and rows[1] == []
+    assert rows[2:] == _expected_csv_rows(client, user, habits)
+
+def test_csv_chunks_stay_bounded(db, make_habit, monkeypatch):
+    monkeypatch.setattr(export, "CSV_CHUNK_ROWS", 10)
+    habit = make_habit(date(2024, 1, 1), {date(2024, 1, 1) + timedelta(days=n): True for n in range(95)})
+    chunks = list(export.iter_csv_report(db, habit.user_id))
+    assert len(chunks) > 9
+    assert all(chunk.count("\n") <= 10 for chunk in chunks)
+    # The first line carries the generation time
+    assert "".join(chunks).split("\n", 1)[1] == export.generate_csv_report(db, habit.user_id).split("\n", 1)[1]
@@ -0,0 +1,26 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import crud
+import export_jobs
+from models import Habit
+
+def test_renaming_a_habit_invalidates_the_cached_report(client, user, habit, db, monkeypatch):
+    # Render in a thread; the report itself is the same as from the process pool
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(export_jobs, "_get_executor", lambda: executor)
+    client.post(f"/api/habits/{habit}/logs", headers=user.headers, json={"date": str(date.today()), "completed": True})
+
+    first = export_jobs.submit_pdf_job(db, user.id)
+    assert first["status"] == "pending"
+    while export_jobs.get_job(first["id"], user.id)["status"] == "pending":
+        time.sleep(0.05)
+    assert export_jobs.get_job(first["id"], user.id)["status"] == "done"
+    assert export_jobs.submit_pdf_job(db, user.id)["status"] == "done"
+
+    crud.update_habit(db, db.get(Habit, habit), "Run 5k", None, None)
+    again = export_jobs.submit_pdf_job(db, user.id)
+    assert again["status"] == "pending"
+    assert again["cache_key"] != first["cache_key"]
+    executor.shutdown()
@@ -0,0 +1,122 @@
+"""Concurrent check-ins on one habit must leave the same stats and bitmap as a rebuild from habit_logs"""
+import asyncio
+from datetime import date, timedelta
+
+from sqlalchemy import select
+
+import crud_async
+from database import AsyncSessionLocal, SessionLocal
+from habit_stats import load_bitmap, rebuild_habit_stats
+from models import HabitPeriodStats, HabitStats
+
+START = date.today() - timedelta(days=120)
+
+def snapshot(db, habit_id):
+    stats = db.get(HabitStats, habit_id)
+    periods = db.execute(
+        select(HabitPeriodStats.period, HabitPeriodStats.period_start, HabitPeriodStats.completed, HabitPeriodStats.logged)
+        .where(HabitPeriodStats.habit_id == habit_id)
+    ).all()
+    return {
+        "total_completed": stats.total_completed,
+        "longest_streak": stats.longest_streak,
+        "last_completed_date": stats.last_completed_date,
+        "last_run_length": stats.last_run_length,
+        "completion_origin": stats.completion_origin,
+        "completion_bits": stats.completion_bits,
+        "periods": sorted(periods),
+    }
+
+def assert_matches_rebuild(habit_id):
+    db = SessionLocal()
+    try:
+        incremental = snapshot(db, habit_id)
+        rebuild_habit_stats(db, habit_id)
+        db.flush()
+        db.expire_all()
+        assert incremental == snapshot(db, habit_id)
+        db.rollback()
+    finally:
+        db.close()
+
+async def make_habit(email):
+    async with AsyncSessionLocal() as db:
+        user = await crud_async.create_user(db, email, "not-a-hash")
+        habit = await crud_async.create_habit(db, user.id, "Read", "boolean", None, START)
+        return user.id, habit.id
+
+async def check_in(user_id, habit_id, d, completed=True):
+    async with AsyncSessionLocal() as db:
+        return await crud_async.upsert_log(db, habit_id, d, None, completed, user_id)
+
+def test_concurrent_check_ins_keep_stats_and_bitmap():
+    async def scenario():
+        user_id, habit_id = await make_habit("concurrent@example.com")
+        for day in range(0, 80, 2):
+            await asyncio.gather(
+                check_in(user_id, habit_id, START + timedelta(days=day)),
+                check_in(user_id, habit_id, START + timedelta(days=day + 1)),
+            )
+        return habit_id
+
+    habit_id = asyncio.run(scenario())
+    db = SessionLocal()
+    try:
+        stats = db.get(HabitStats, habit_id)
+        assert stats.total_completed == 80
+        assert stats.longest_streak == 80
+    finally:
+        db.close()
+    assert_matches_rebuild(habit_id)
+
+def test_concurrent_first_check_ins():
+    async def scenario():
+        user_id, habit_id = await make_habit("first@example.com")
+        results = await asyncio.gather(*(
+            check_in(user_id, habit_id, START + timedelta(days=day)) for day in range(4)
+        ))
+        assert all(log is not None for log in results)
+        return habit_id
+
+    assert_matches_rebuild(asyncio.run(scenario()))
+
+def test_other_users_habit_is_not_written():
+    async def scenario():
+        _, habit_id = await make_habit("owner@example.com")
+        other_id, _ = await make_habit("other@example.com")
+        assert await check_in(other_id, habit_id, START) is None
+        return habit_id
+
+    habit_id = asyncio.run(scenario())
+    db = SessionLocal()
+    try:
+        assert db.get(HabitStats, habit_id) is None
+    finally:
+        db.close()
+
+def test_concurrent_backfills_keep_bitmap():
+    # Un-completions and out-of-order days take the bitmap path rather than the streak fast path
+    async def scenario():
+        user_id, habit_id = await make_habit("bitmap@example.com")
+        for day in range(30):
+            await check_in(user_id, habit_id, START + timedelta(days=day))
+        for day in range(0, 30, 3):
+            await asyncio.gather(
+                check_in(user_id, habit_id, START + timedelta(days=29 - day), completed=False),
+                check_in(user_id, habit_id, START + timedelta(days=day + 40)),
+                check_in(user_id, habit_id, START + timedelta(days=day + 1), completed=False),
+            )
+        return habit_id
+
+    habit_id = asyncio.run(scenario())
+    db = SessionLocal()
+    try:
+        bitmap = load_bitmap(db, db.get(HabitStats, habit_id))
+        expected = {START + timedelta(days=day) for day in range(30)}
+        expected -= {START + timedelta(days=29 - day) for day in range(0, 30, 3)}
+        expected -= {START + timedelta(days=day + 1) for day in range(0, 30, 3)}
+        expected |= {START + timedelta(days=day + 40) for day in range(0, 30, 3)}
+        assert {START + timedelta(days=day) for day in range(80) if bitmap.is_set(START + timedelta(days=day))} == expected
+    finally:
+        db.close()
+    assert_matches_rebuild(habit_id)
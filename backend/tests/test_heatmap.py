@@ -0,0 +1,50 @@
+from datetime import date, timedelta
+
+from crud import run_length_encode
+
+TODAY = date.today()
+
+def _decode(runs):
+    return [value for value, length in zip(runs[::2], runs[1::2]) for _ in range(length)]
+
+def test_run_length_encoding():
+    assert run_length_encode([]) == []
+    assert run_length_encode([0, 0, 0, 2, 1, 1, 0]) == [0, 3, 2, 1, 1, 2, 0, 1]
+    values = [0] * 40 + [1, 2, 2] + [0] * 300
+    assert _decode(run_length_encode(values)) == values
+
+def _add_habit(client, user, completed_days_ago):
+    habit = client.post("/api/habits", headers=user.headers, json={
+        "name": "Read", "htype": "boolean", "start_date": str(TODAY - timedelta(days=400)),
+    }).json()["id"]
+    client.post("/api/logs/bulk", headers=user.headers, json={"logs": [
+        {"habit_id": habit, "date": str(TODAY - timedelta(days=n)), "completed": n in completed_days_ago}
+        for n in range(0, 400, 3)
+    ]})
+    return habit
+
+def test_heatmap_counts_completed_habits_per_day(client, user, other_user, count_queries):
+    first = set(range(0, 400, 6))
+    second = set(range(0, 90, 3))
+    _add_habit(client, user, first)
+    _add_habit(client, user, second)
+    archived = _add_habit(client, user, set(range(0, 400, 3)))
+    client.delete(f"/api/habits/{archived}", headers=user.headers)
+    _add_habit(client, other_user, set(range(0, 400, 3)))
+
+    dense = client.get("/api/activity/heatmap", headers=user.headers)
+    body = dense.json()
+    expected = [(n in first) + (n in second) for n in reversed(range(365))]
+    assert (body["start"], body["end"]) == (str(TODAY - timedelta(days=364)), str(TODAY))
+    assert (body["encoding"], body["counts"], body["max"]) == ("dense", expected, 2)
+    assert count_queries(dense) == 1
+
+    rle = client.get("/api/activity/heatmap?encoding=rle&days=120", headers=user.headers).json()
+    assert rle["encoding"] == "rle"
+    assert _decode(rle["counts"]) == expected[-120:]
+
+def test_heatmap_without_activity(client, user):
+    body = client.get("/api/activity/heatmap?days=7", headers=user.headers).json()
+    assert (body["counts"], body["max"]) == ([0] * 7, 0)
+    assert client.get("/api/activity/heatmap?days=0", headers=user.headers).status_code == 422
+    assert client.get("/api/activity/heatmap?encoding=png", headers=user.headers).status_code == 422
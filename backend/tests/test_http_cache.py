@@ -0,0 +1,52 @@
+from datetime import date, datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from http_cache import _etag_matches
+
+PATHS = ["logs", "insights", "trends/weekly", "trends/monthly", "chart-data", "analytics"]
+
+@pytest.mark.parametrize("path", PATHS)
+def test_matching_etag_gets_a_bodyless_304(client, user, habit, path, count_queries):
+    url = f"/api/habits/{habit}/{path}"
+    first = client.get(url, headers=user.headers)
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    cached = client.get(url, headers={**user.headers, "If-None-Match": first.headers["ETag"]})
+    assert (cached.status_code, cached.content) == (304, b"")
+    assert cached.headers["ETag"] == first.headers["ETag"]
+    # A single lookup answers it
+    assert count_queries(cached) == 1
+
+def test_a_check_in_changes_the_etag(client, user, habit):
+    url = f"/api/habits/{habit}/insights"
+    etag = client.get(url, headers=user.headers).headers["ETag"]
+    client.post(f"/api/habits/{habit}/logs", headers=user.headers, json={"date": str(date.today()), "completed": True})
+
+    fresh = client.get(url, headers={**user.headers, "If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+    assert fresh.json()["seven_day_streak"] == 1
+
+def test_if_modified_since(client, user, habit):
+    url = f"/api/habits/{habit}/trends/weekly"
+    last_modified = client.get(url, headers=user.headers).headers["Last-Modified"]
+    assert client.get(url, headers={**user.headers, "If-Modified-Since": last_modified}).status_code == 304
+
+    earlier = format_datetime(datetime.now(timezone.utc) - timedelta(days=2), usegmt=True)
+    assert client.get(url, headers={**user.headers, "If-Modified-Since": earlier}).status_code == 200
+    assert client.get(url, headers={**user.headers, "If-Modified-Since": "not a date"}).status_code == 200
+    # If-None-Match wins when both are sent
+    both = {**user.headers, "If-Modified-Since": last_modified, "If-None-Match": '"stale"'}
+    assert client.get(url, headers=both).status_code == 200
+
+def test_another_users_habit_is_not_found_before_any_validator_check(client, other_user, habit):
+    response = client.get(f"/api/habits/{habit}/insights", headers={**other_user.headers, "If-None-Match": "*"})
+    assert response.status_code == 404
+
+def test_etags_compare_weakly():
+    assert _etag_matches('"a", W/"1-x"', 'W/"1-x"')
+    assert _etag_matches('"1-x"', 'W/"1-x"')
+    assert _etag_matches("*", 'W/"1-x"')
+    assert not _etag_matches('"1-y"', 'W/"1-x"')
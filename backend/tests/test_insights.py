@@ -0,0 +1,53 @@
+from datetime import date, timedelta
+
+import crud
+from analytics import count_in_range, current_streak, longest_streak, window_streaks
+
+TODAY = date.today()
+
+def days_ago(n):
+    return TODAY - timedelta(days=n)
+
+def reference_insight(start_date, logs):
+    """Insights the slow way: walk back day by day"""
+    completed = {d for d, done in logs.items() if done}
+    streak, day = 0, TODAY
+    while day in completed:
+        streak += 1
+        day -= timedelta(days=1)
+    total_days = (TODAY - start_date).days + 1
+    in_range = sum(1 for d in completed if start_date <= d <= TODAY)
+    return min(streak, 7), min(streak, 28), in_range / total_days * 100
+
+def test_streak_helpers():
+    dates = [days_ago(n) for n in (40, 39, 38, 37, 10, 2, 1, 0)]
+    assert current_streak(dates, TODAY) == 3
+    assert current_streak(dates, TODAY, window=2) == 2
+    assert current_streak(dates, days_ago(3)) == 0
+    assert window_streaks(dates, TODAY, (7, 28)) == [3, 3]
+    assert longest_streak(dates) == 4
+    assert count_in_range(dates, days_ago(10), days_ago(1)) == 3
+
+def test_live_insights_match_a_day_by_day_count(make_habit, db):
+    start = days_ago(90)
+    logs = {days_ago(n): n % 5 != 3 for n in range(95)}  # includes logs before start_date
+    logs.update({days_ago(n): True for n in range(40)})
+    logs[days_ago(45)] = False
+    logs[TODAY + timedelta(days=1)] = True  # a log for tomorrow counts for nothing yet
+    habit = make_habit(start, logs)
+
+    insight = crud.calculate_insights(db, habit.id, habit.user_id)
+    seven, twenty_eight, percent = reference_insight(start, logs)
+    assert (insight.seven_day_streak, insight.twenty_eight_day_streak) == (seven, twenty_eight) == (7, 28)
+    assert insight.avg_completion_percent == percent
+
+def test_streak_is_zero_without_a_completion_today(make_habit, db):
+    habit = make_habit(days_ago(10), {days_ago(1): True, days_ago(2): True, TODAY: False})
+    insight = crud.calculate_insights(db, habit.id)
+    assert (insight.seven_day_streak, insight.twenty_eight_day_streak) == (0, 0)
+    assert insight.avg_completion_percent == 2 / 11 * 100
+
+def test_insights_check_ownership(make_habit, db):
+    habit = make_habit(days_ago(10), {TODAY: True})
+    other = make_habit(days_ago(10))
+    assert crud.calculate_insights(db, habit.id, other.user_id) is None
@@ -0,0 +1,32 @@
+from datetime import date, timedelta
+
+from models import HabitStats
+
+def _log(client, user, habit, d):
+    return client.post(f"/api/habits/{habit}/logs", headers=user.headers, json={"date": str(d), "completed": True})
+
+def test_log_dates_are_bounded_by_start_date_and_tomorrow(client, user, habit, db):
+    today = date.today()
+    assert _log(client, user, habit, today + timedelta(days=1)).status_code == 200
+    assert _log(client, user, habit, today + timedelta(days=2)).status_code == 422
+    assert _log(client, user, habit, date(9999, 12, 31)).status_code == 422
+    assert _log(client, user, habit, today - timedelta(days=731)).status_code == 422
+    assert _log(client, user, habit, today - timedelta(days=730)).status_code == 200
+
+    stats = db.get(HabitStats, habit)
+    assert stats.completion_origin == today - timedelta(days=730)
+    assert len(stats.completion_bits) <= 732 // 8 + 1
+
+def test_bulk_reports_dates_before_the_start_date(client, user, habit):
+    today = date.today()
+    response = client.post("/api/logs/bulk", headers=user.headers, json={"logs": [
+        {"habit_id": habit, "date": str(today), "completed": True},
+        {"habit_id": habit, "date": str(today - timedelta(days=800)), "completed": True},
+    ]})
+    assert [result["status"] for result in response.json()["results"]] == ["upserted", "before_start_date"]
+
+def test_bulk_rejects_future_dates(client, user, habit):
+    response = client.post("/api/logs/bulk", headers=user.headers, json={"logs": [
+        {"habit_id": habit, "date": str(date.today() + timedelta(days=30)), "completed": True},
+    ]})
+    assert response.status_code == 422
@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+
+import export
+from pagination import decode_cursor, encode_cursor
+
+def _log_days(client, user, habit, days):
+    today = date.today()
+    response = client.post("/api/logs/bulk", headers=user.headers, json={"logs": [
+        {"habit_id": habit, "date": str(today - timedelta(days=n)), "completed": n % 3 != 0} for n in range(days)
+    ]})
+    assert response.json()["upserted"] == days
+
+def test_without_limit_or_cursor_the_whole_range_is_returned(client, user, habit):
+    _log_days(client, user, habit, 400)
+    start = str(date.today() - timedelta(days=500))
+    response = client.get(f"/api/habits/{habit}/logs?start_date={start}", headers=user.headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 400
+    assert "X-Next-Cursor" not in response.headers
+
+def test_cursor_pages_cover_the_range_once_in_order(client, user, habit):
+    _log_days(client, user, habit, 25)
+    start = str(date.today() - timedelta(days=30))
+    everything = client.get(f"/api/habits/{habit}/logs?start_date={start}", headers=user.headers).json()
+
+    pages, cursor = [], None
+    while True:
+        url = f"/api/habits/{habit}/logs?start_date={start}&limit=10" + (f"&cursor={cursor}" if cursor else "")
+        response = client.get(url, headers=user.headers)
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [log for page in pages for log in page] == everything
+
+def test_ndjson_streams_the_whole_range(client, user, habit):
+    _log_days(client, user, habit, 25)
+    start = str(date.today() - timedelta(days=30))
+    response = client.get(f"/api/habits/{habit}/logs?start_date={start}&limit=7&format=ndjson", headers=user.headers)
+    assert len(response.text.splitlines()) == 25
+
+def test_bad_cursor_is_a_400(client, user, habit):
+    assert client.get(f"/api/habits/{habit}/logs?cursor=not-a-cursor", headers=user.headers).status_code == 400
+
+def test_cursor_round_trip():
+    class Log:
+        date = date(2024, 2, 29)
+        id = 12345
+    assert decode_cursor(encode_cursor(Log)) == (date(2024, 2, 29), 12345)
+
+def test_pdf_lists_every_log_unless_capped(client, user, habit, db):
+    _log_days(client, user, habit, 400)
+    assert len(export.pdf_log_rows(db, habit)) == 1 + 400
+    capped = export.pdf_log_rows(db, habit, max_rows=100)
+    assert len(capped) == 1 + 100 + 1
+    assert capped[1][0] == str(date.today())
+    assert capped[-1][0].startswith("Older logs omitted")
@@ -0,0 +1,35 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from migrations import HABIT_LOG_UNIQUE_INDEX, ensure_habit_log_unique_index
+from models import HabitLog
+
+def test_a_second_log_for_the_same_day_is_rejected(db, make_habit):
+    habit = make_habit(date(2024, 1, 1), {date(2024, 1, 2): True})
+    db.add(HabitLog(habit_id=habit.id, date=date(2024, 1, 2), completed=False))
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+
+def test_migration_collapses_duplicates_and_adds_the_index(tmp_path):
+    bind = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with bind.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE habit_logs (id INTEGER PRIMARY KEY, habit_id INTEGER, date DATE, "
+            "completed BOOLEAN, value INTEGER, created_at TIMESTAMP)"
+        ))
+        conn.execute(text(
+            "INSERT INTO habit_logs (habit_id, date, completed, value) VALUES "
+            "(1, '2024-01-02', 0, 1), (1, '2024-01-02', 1, 2), (1, '2024-01-03', 1, 3), (2, '2024-01-02', 0, 4)"
+        ))
+
+    assert ensure_habit_log_unique_index(bind)
+    assert HABIT_LOG_UNIQUE_INDEX in {index["name"] for index in inspect(bind).get_indexes(HabitLog.__tablename__)}
+    with bind.connect() as conn:
+        rows = conn.execute(text("SELECT habit_id, date, value FROM habit_logs ORDER BY habit_id, date")).all()
+    # The latest insert wins
+    assert rows == [(1, "2024-01-02", 2), (1, "2024-01-03", 3), (2, "2024-01-02", 4)]
+    assert not ensure_habit_log_unique_index(bind)
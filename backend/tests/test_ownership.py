@@ -0,0 +1,27 @@
+from datetime import date
+
+import pytest
+
+READS = ["logs", "insights", "trends/weekly", "trends/monthly", "chart-data", "analytics"]
+
+@pytest.mark.parametrize("path", READS)
+def test_reads_of_another_users_habit_are_not_found(client, user, other_user, habit, path, count_queries):
+    own = client.get(f"/api/habits/{habit}/{path}", headers=user.headers)
+    foreign = client.get(f"/api/habits/{habit}/{path}", headers=other_user.headers)
+    missing = client.get(f"/api/habits/999999/{path}", headers=user.headers)
+    assert own.status_code == 200
+    assert (foreign.status_code, missing.status_code) == (404, 404)
+    # The ownership check rides on the data query rather than adding a lookup
+    assert count_queries(foreign) <= count_queries(own)
+
+def test_writes_to_another_users_habit_are_not_found(client, user, other_user, habit):
+    log = {"date": str(date.today()), "completed": True}
+    assert client.post(f"/api/habits/{habit}/logs", headers=other_user.headers, json=log).status_code == 404
+    assert client.delete(f"/api/habits/{habit}", headers=other_user.headers).status_code == 404
+    assert client.get(f"/api/habits/{habit}/logs", headers=user.headers).json() == []
+    assert [h["id"] for h in client.get("/api/habits", headers=user.headers).json()] == [habit]
+
+def test_a_habit_without_logs_is_still_found(client, user, habit):
+    insights = client.get(f"/api/habits/{habit}/insights", headers=user.headers).json()
+    assert insights["seven_day_streak"] == 0
+    assert client.get(f"/api/habits/{habit}/logs", headers=user.headers).json() == []
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+from passlib.hash import bcrypt
+
+import password_pool
+from auth import BCRYPT_ROUNDS
+from models import User
+
+def test_saturated_pool_rejects_with_429():
+    release = threading.Event()
+
+    async def scenario():
+        capacity = password_pool.stats()["capacity"]
+        jobs = [asyncio.ensure_future(password_pool.run_password_job(release.wait)) for _ in range(capacity)]
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as rejected:
+            await password_pool.run_password_job(lambda: "hashed")
+        release.set()
+        await asyncio.gather(*jobs)
+        # Slots come back as jobs finish
+        return rejected.value, await password_pool.run_password_job(lambda: "hashed")
+
+    rejected_before = password_pool.stats()["rejected"]
+    error, result = asyncio.run(scenario())
+    assert (error.status_code, error.headers["Retry-After"]) == (429, "1")
+    assert result == "hashed"
+    assert password_pool.stats()["rejected"] == rejected_before + 1
+    assert password_pool.stats()["in_flight"] == 0
+
+def test_login_answers_429_when_saturated(client, user):
+    capacity = password_pool.stats()["capacity"]
+    for _ in range(capacity):
+        password_pool._slots.acquire()
+    try:
+        response = client.post("/api/auth/login", json={"email": user.email, "password": "pw"})
+    finally:
+        for _ in range(capacity):
+            password_pool._slots.release()
+    assert response.status_code == 429
+    assert client.post("/api/auth/login", json={"email": user.email, "password": "pw"}).status_code == 200
+
+def test_login_upgrades_outdated_hashes(client, user, db):
+    stored = db.get(User, user.id)
+    stored.hashed_password = bcrypt.using(rounds=5).hash("pw")
+    db.commit()
+
+    assert client.post("/api/auth/login", json={"email": user.email, "password": "pw"}).status_code == 200
+    db.expire_all()
+    upgraded = db.get(User, user.id).hashed_password
+    assert upgraded.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+
+    assert client.post("/api/auth/login", json={"email": user.email, "password": "pw"}).status_code == 200
+    db.expire_all()
+    assert db.get(User, user.id).hashed_password == upgraded
+    assert client.post("/api/auth/login", json={"email": user.email, "password": "wrong"}).status_code == 401
@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+import pool_metrics
+from database import engine, engine_options
+from pool_metrics import TimedQueuePool, instrument
+
+@pytest.fixture
+def small_engine(tmp_path):
+    bind = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05
+    )
+    stats = instrument(bind, "test_pool")
+    yield bind, stats
+    pool_metrics.pools.pop("test_pool")
+    bind.dispose()
+
+def test_engine_options_follow_the_url():
+    options = engine_options("sqlite:///./habits.db")
+    assert options["poolclass"] is TimedQueuePool
+    assert options["connect_args"] == {"check_same_thread": False}
+    assert engine_options("postgresql://db/habits", asyncio=True)["poolclass"] is pool_metrics.TimedAsyncAdaptedQueuePool
+    assert "poolclass" not in engine_options("sqlite:///:memory:")
+
+def test_exhausted_pool_records_a_timeout(small_engine):
+    bind, stats = small_engine
+    with bind.connect() as held:
+        held.execute(text("SELECT 1"))
+        with pytest.raises(exc.TimeoutError):
+            bind.connect()
+        assert stats.snapshot()["checked_out"] == 1
+    report = stats.snapshot()
+    assert (report["checkouts"], report["timeouts"], report["checked_out"]) == (1, 1, 0)
+    assert report["held_ms_max"] > 0
+
+def test_stats_survive_dispose(small_engine):
+    bind, stats = small_engine
+    bind.dispose()
+    with bind.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert stats.snapshot()["checkouts"] == 1
+
+def test_sqlite_connections_get_the_pragmas():
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+def test_pool_metrics_endpoint(client, user):
+    client.get("/api/habits", headers=user.headers)
+    report = client.get("/api/metrics/pool").json()
+    assert {"primary", "primary_async"} <= set(report)
+    assert report["primary_async"]["checkouts"] > 0
@@ -0,0 +1,50 @@
+import logging
+import re
+from contextlib import contextmanager
+from datetime import date
+
+from sqlalchemy import event
+
+import request_metrics
+from database import async_engine, engine
+
+@contextmanager
+def statements():
+    """Every statement run on the primary engines while the block runs"""
+    seen = []
+    def record(conn, cursor, statement, *args):
+        seen.append(statement)
+    for bind in (engine, async_engine.sync_engine):
+        event.listen(bind, "after_cursor_execute", record)
+    try:
+        yield seen
+    finally:
+        for bind in (engine, async_engine.sync_engine):
+            event.remove(bind, "after_cursor_execute", record)
+
+def test_server_timing_counts_every_statement(client, user, habit, count_queries):
+    client.post(f"/api/habits/{habit}/logs", headers=user.headers, json={"date": str(date.today()), "completed": True})
+    for path in ["/api/dashboard", f"/api/habits/{habit}/analytics", f"/api/habits/{habit}/insights"]:
+        with statements() as seen:
+            response = client.get(path, headers=user.headers)
+        assert count_queries(response) == len(seen) > 0
+        assert re.fullmatch(
+            r'db;dur=[\d.]+;desc="\d+ queries", handler;dur=[\d.]+, serialize;dur=[\d.]+, total;dur=[\d.]+',
+            response.headers["Server-Timing"]
+        )
+
+def test_prometheus_metrics_group_by_route_template(client, user, habit):
+    client.get(f"/api/habits/{habit}/insights", headers=user.headers)
+    client.get("/api/habits/999999/insights", headers=user.headers)
+    text = client.get("/metrics").text
+    route = 'method="GET",route="/api/habits/{habit_id}/insights"'
+    assert f'habit_tracker_http_requests_total{{{route},status="200"}}' in text
+    assert f'habit_tracker_http_requests_total{{{route},status="404"}}' in text
+    assert re.search(rf'habit_tracker_db_queries_total\{{{re.escape(route)}\}} [1-9]', text)
+    assert "habit_tracker_pool_checkouts{" in text
+
+def test_slow_queries_are_logged_with_their_route(client, user, monkeypatch, caplog):
+    monkeypatch.setattr(request_metrics, "SLOW_QUERY_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="habit_tracker.slow_queries"):
+        client.get("/api/habits", headers=user.headers)
+    assert any("in GET /api/habits:" in record.getMessage() for record in caplog.records)
@@ -0,0 +1,47 @@
+import asyncio
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import routing
+from database import Base
+
+@pytest.fixture
+def stale_replica(tmp_path, monkeypatch):
+    """A replica that has the schema but none of the primary's rows yet"""
+    url = tmp_path / "replica.db"
+    Base.metadata.create_all(create_engine(f"sqlite:///{url}"))
+    replica = create_async_engine(f"sqlite+aiosqlite:///{url}")
+    monkeypatch.setattr(routing, "DATABASE_REPLICA_URL", f"sqlite:///{url}")
+    monkeypatch.setattr(routing, "AsyncReplicaSessionLocal", async_sessionmaker(replica, class_=AsyncSession, expire_on_commit=False))
+    monkeypatch.setattr(routing, "recent_writers", routing.TTLCache(ttl=60))
+    yield replica
+    asyncio.run(replica.dispose())
+
+def test_reads_go_to_the_replica(client, user, habit, stale_replica):
+    # The habit was created before the replica was configured, so nothing pins this user to the primary
+    assert client.get(f"/api/habits/{habit}/insights", headers=user.headers).status_code == 404
+
+def test_writers_read_their_own_writes_from_the_primary(client, user, other_user, habit, stale_replica):
+    client.post(f"/api/habits/{habit}/logs", headers=user.headers, json={"date": str(date.today()), "completed": True})
+    insights = client.get(f"/api/habits/{habit}/insights", headers=user.headers)
+    assert insights.status_code == 200
+    assert insights.json()["seven_day_streak"] == 1
+    # Only the writer is pinned
+    assert routing.use_replica(other_user.id)
+    assert not routing.use_replica(user.id)
+
+def test_the_window_expires(user, stale_replica, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("cache.time.monotonic", lambda: now[0])
+    routing.note_write(user.id)
+    assert not routing.use_replica(user.id)
+    now[0] += 61
+    assert routing.use_replica(user.id)
+
+def test_without_a_replica_everything_reads_the_primary(user):
+    routing.note_write(user.id)
+    assert routing.recent_writers.get(user.id) is None
+    assert not routing.use_replica(user.id)
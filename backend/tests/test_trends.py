@@ -0,0 +1,31 @@
+from datetime import date, timedelta
+
+import pytest
+
+import crud
+from trends import buckets_from_logs, rolling_buckets, rolling_ranges
+
+TODAY = date(2024, 5, 15)
+
+@pytest.fixture
+def logged_habit(make_habit):
+    # Gaps, missed days and a log after TODAY, which the trends leave out
+    logs = {TODAY - timedelta(days=n): n % 3 != 0 for n in range(-2, 150) if n % 7 != 5}
+    return make_habit(TODAY - timedelta(days=160), logs), logs
+
+@pytest.mark.parametrize("count,size", [(4, 7), (3, 30), (12, 7)])
+def test_grouped_buckets_match_a_pass_over_the_logs(db, logged_habit, count, size):
+    habit, logs = logged_habit
+    expected = buckets_from_logs(sorted(logs.items()), rolling_ranges(count, size, TODAY), TODAY)
+    assert rolling_buckets(db, habit.id, count, size, TODAY) == expected
+    assert rolling_buckets(db, habit.id, count, size, TODAY, habit.user_id) == expected
+
+def test_empty_windows_score_against_their_length(db, make_habit):
+    habit = make_habit(TODAY - timedelta(days=60), {TODAY: True})
+    buckets = rolling_buckets(db, habit.id, 2, 7, TODAY, habit.user_id)
+    assert [(b["completed_days"], b["total_days"]) for b in buckets] == [(0, 7), (1, 1)]
+
+def test_another_users_habit_has_no_trend(db, logged_habit):
+    habit, _ = logged_habit
+    assert rolling_buckets(db, habit.id, 4, 7, TODAY, habit.user_id + 1000) is None
+    assert crud.get_weekly_trend(db, habit.id, user_id=habit.user_id + 1000) is None
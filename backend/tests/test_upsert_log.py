@@ -0,0 +1,34 @@
+from datetime import date
+
+import pytest
+
+import crud
+from models import HabitLog, HabitStats
+
+DAY = date(2024, 3, 5)
+
+@pytest.fixture(params=["on_conflict", "fallback"])
+def upsert_path(request, monkeypatch):
+    if request.param == "fallback":
+        monkeypatch.setattr(crud, "dialect_insert", lambda db: None)
+    return request.param
+
+def test_none_fields_keep_their_stored_value(db, make_habit, upsert_path):
+    habit = make_habit(date(2024, 3, 1), htype="quantity", goal=5)
+    steps = [(3, True), (None, False), (7, None), (None, None)]
+    stored = [crud.upsert_log(db, habit.id, DAY, value, completed, habit.user_id) for value, completed in steps]
+    assert [(log.value, log.completed) for log in stored] == [(3, True), (3, False), (7, False), (7, False)]
+    assert db.query(HabitLog).filter(HabitLog.habit_id == habit.id).count() == 1
+    # Stats follow the final completed flag, not the number of writes
+    assert db.get(HabitStats, habit.id).total_completed == 0
+
+def test_the_returned_log_matches_the_stored_row(db, make_habit, upsert_path):
+    habit = make_habit(date(2024, 3, 1))
+    log = crud.upsert_log(db, habit.id, DAY, None, True, habit.user_id)
+    stored = db.query(HabitLog).filter(HabitLog.habit_id == habit.id).one()
+    assert (log.id, log.date, log.completed, log.value) == (stored.id, stored.date, stored.completed, stored.value)
+
+def test_another_users_habit_is_left_alone(db, make_habit, upsert_path):
+    habit = make_habit(date(2024, 3, 1))
+    assert crud.upsert_log(db, habit.id, DAY, None, True, habit.user_id + 1000) is None
+    assert db.query(HabitLog).filter(HabitLog.habit_id == habit.id).count() == 0
@@ -0,0 +1,152 @@
+from bisect import bisect_left, bisect_right
+from calendar import monthrange
+from datetime import date, timedelta
+from typing import Dict, List, Sequence, Tuple
+from sqlalchemy import select, func, case, cast, extract, literal, Integer
+from sqlalchemy.orm import Session
+from models import HabitLog
+from queries import habit_with_logs
+from habit_stats import period_counts
+
+def _days_before(db: Session, anchor: date):
+    """SQL expression for the whole number of days between HabitLog.date and anchor"""
+    if db.get_bind().dialect.name == "sqlite":
+        return cast(func.julianday(anchor) - func.julianday(HabitLog.date), Integer)
+    return literal(anchor) - HabitLog.date
+
+def _month_number(column):
+    return extract("year", column) * 12 + extract("month", column)
+
+def _grouped_counts(db: Session, habit_id: int, bucket, start: date, end: date, user_id: int | None = None) -> Dict[int, Tuple[int, int]] | None:
+    """Map bucket -> (completed logs, total logs) for one habit, from a single GROUP BY.
+
+    With user_id the query is joined to the user's habit and None means it wasn't found.
+    """
+    bucket = bucket.label("bucket")
+    columns = [
+        bucket,
+        func.count(HabitLog.id),
+        func.coalesce(func.sum(case((HabitLog.completed == True, 1), else_=0)), 0)
+    ]
+    if user_id is None:
+        stmt = select(*columns).where(
+            HabitLog.habit_id == habit_id,
+            HabitLog.date >= start,
+            HabitLog.date <= end
+        )
+    else:
+        stmt = habit_with_logs(columns, habit_id, user_id, HabitLog.date >= start, HabitLog.date <= end)
+    rows = db.execute(stmt.group_by(bucket)).all()
+    if user_id is not None and not rows:
+        return None
+    # A NULL bucket is the outer join's placeholder row for a habit with no logs in range
+    return {int(b): (int(completed), int(total)) for b, total, completed in rows if b is not None}
+
+def bucket_row(start: date, end: date, counts: Tuple[int, int]) -> Dict:
+    completed, logged = counts
+    # Buckets without any logs are scored against their full length, as before
+    total = logged if logged else (end - start).days + 1
+    completion_rate = (completed / total * 100) if total > 0 else 0
+    return {
+        "start_date": start,
+        "end_date": end,
+        "completion_rate": completion_rate,
+        "completed_days": completed,
+        "total_days": total
+    }
+
+def rolling_ranges(count: int, size: int, today: date) -> List[Tuple[date, date]]:
+    """(start, end) of count consecutive size-day windows ending today, oldest first"""
+    ends = [today - timedelta(days=i * size) for i in reversed(range(count))]
+    return [(end - timedelta(days=size - 1), end) for end in ends]
+
+def calendar_week_ranges(count: int, today: date) -> List[Tuple[date, date]]:
+    """(monday, sunday) of the last count weeks including the current one, oldest first"""
+    week_end = today + timedelta(days=6 - today.weekday())
+    ends = [week_end - timedelta(days=i * 7) for i in reversed(range(count))]
+    return [(end - timedelta(days=6), end) for end in ends]
+
+def calendar_month_ranges(count: int, today: date) -> List[Tuple[date, date]]:
+    """(first, last day) of the last count calendar months including the current one, oldest first"""
+    current = today.year * 12 + today.month - 1
+    ranges = []
+    for i in reversed(range(count)):
+        year, month = divmod(current - i, 12)
+        month_start = date(year, month + 1, 1)
+        ranges.append((month_start, month_start.replace(day=monthrange(year, month + 1)[1])))
+    return ranges
+
+def _rows_for(ranges: List[Tuple[date, date]], counts: Dict[int, Tuple[int, int]]) -> List[Dict]:
+    # counts are keyed by how many buckets back from the newest one they fall
+    last = len(ranges) - 1
+    return [bucket_row(start, end, counts.get(last - k, (0, 0))) for k, (start, end) in enumerate(ranges)]
+
+def buckets_from_logs(logs: Sequence[Tuple[date, bool]], ranges: List[Tuple[date, date]], today: date) -> List[Dict]:
+    """The same rows as the bucket queries, computed from (date, completed) pairs sorted by date"""
+    dates = [d for d, _ in logs]
+    buckets = []
+    for start, end in ranges:
+        in_range = logs[bisect_left(dates, start):bisect_right(dates, min(end, today))]
+        completed = sum(1 for _, done in in_range if done)
+        buckets.append(bucket_row(start, end, (completed, len(in_range))))
+    return buckets
+
+def _current_period(db: Session, habit_id: int, bucket, start: date, today: date) -> Tuple[int, int]:
+    """Live (completed, logged) for the current period, from its start up to today.
+
+    The materialized counters include logs dated after today, which the live
+    queries leave out, so the one period that can hold them is recounted.
+    """
+    return _grouped_counts(db, habit_id, bucket, start, today).get(0, (0, 0))
+
+def rolling_buckets(db: Session, habit_id: int, count: int, size: int, today: date | None = None, user_id: int | None = None) -> List[Dict] | None:
+    """Completion counts for count consecutive size-day windows ending today, oldest first"""
+    today = today or date.today()
+    ranges = rolling_ranges(count, size, today)
+    counts = _grouped_counts(db, habit_id, _days_before(db, today) // size, ranges[0][0], today, user_id)
+    if counts is None:
+        return None
+    return _rows_for(ranges, counts)
+
+def calendar_week_buckets(db: Session, habit_id: int, count: int, today: date | None = None, user_id: int | None = None) -> List[Dict] | None:
+    """Completion counts for the last count Monday-Sunday weeks including the current one, oldest first.
+
+    Served from the materialized weekly counters when the habit has them, except
+    for the current week.
+    """
+    today = today or date.today()
+    ranges = calendar_week_ranges(count, today)
+    start, week_end = ranges[0][0], ranges[-1][1]
+    found, materialized = period_counts(db, habit_id, "week", start, week_end, user_id)
+    if not found:
+        return None
+    if materialized is not None:
+        counts = {(week_end - period_start).days // 7: value for period_start, value in materialized.items()}
+        counts[0] = _current_period(db, habit_id, _days_before(db, week_end) // 7, ranges[-1][0], today)
+    else:
+        counts = _grouped_counts(db, habit_id, _days_before(db, week_end) // 7, start, today, user_id)
+    if counts is None:
+        return None
+    return _rows_for(ranges, counts)
+
+def calendar_month_buckets(db: Session, habit_id: int, count: int, today: date | None = None, user_id: int | None = None) -> List[Dict] | None:
+    """Completion counts for the last count calendar months including the current one, oldest first.
+
+    Served from the materialized monthly counters when the habit has them, except
+    for the current month.
+    """
+    today = today or date.today()
+    current = today.year * 12 + today.month - 1
+    ranges = calendar_month_ranges(count, today)
+    start = ranges[0][0]
+    found, materialized = period_counts(db, habit_id, "month", start, today, user_id)
+    if not found:
+        return None
+    if materialized is not None:
+        counts = {current - (period_start.year * 12 + period_start.month - 1): value for period_start, value in materialized.items()}
+        counts[0] = _current_period(db, habit_id, (today.year * 12 + today.month) - _month_number(HabitLog.date), ranges[-1][0], today)
+    else:
+        counts = _grouped_counts(db, habit_id, (today.year * 12 + today.month) - _month_number(HabitLog.date), start, today, user_id)
+    if counts is None:
+        return None
+    return _rows_for(ranges, counts)
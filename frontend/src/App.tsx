@@ -3,6 +3,7 @@ import LoginPage from "./pages/LoginPage"
 import RegisterPage from "./pages/RegisterPage"
 import DashboardPage from "./pages/DashboardPage"
 import { AuthProvider } from "./context/AuthContext"
+import { EventsProvider } from "./context/EventsContext"
 import { useAuth } from "./hooks/useAuth"
 
 function AppContent() {
@@ -30,7 +31,9 @@ export default function App() {
   return (
     <Router>
       <AuthProvider>
-        <AppContent />
+        <EventsProvider>
+          <AppContent />
+        </EventsProvider>
       </AuthProvider>
     </Router>
   )
@@ -0,0 +1,88 @@
+import { useState, useEffect, useMemo } from "react"
+import { useAuth } from "../hooks/useAuth"
+import "../styling/ActivityHeatmap.css"
+
+interface Heatmap {
+  start: string
+  end: string
+  max: number
+  encoding: "dense" | "rle"
+  counts: number[]
+}
+
+interface Cell {
+  date: string
+  count: number
+}
+
+// Expand [count, days, count, days, ...] back to one count per day
+function decodeCounts(heatmap: Heatmap): number[] {
+  if (heatmap.encoding === "dense") return heatmap.counts
+  const counts: number[] = []
+  for (let i = 0; i < heatmap.counts.length; i += 2) {
+    for (let n = 0; n < heatmap.counts[i + 1]; n++) counts.push(heatmap.counts[i])
+  }
+  return counts
+}
+
+function level(count: number, max: number): number {
+  if (count === 0 || max === 0) return 0
+  return Math.min(4, Math.ceil((count / max) * 4))
+}
+
+export default function ActivityHeatmap() {
+  const [heatmap, setHeatmap] = useState<Heatmap | null>(null)
+  const { token } = useAuth()
+
+  const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000"
+
+  useEffect(() => {
+    fetchHeatmap()
+  }, [])
+
+  const fetchHeatmap = async () => {
+    try {
+      const response = await fetch(`${API_URL}/api/activity/heatmap?days=365&encoding=rle`, {
+        headers: { Authorization: `Bearer ${token}` },
+      })
+      if (!response.ok) return
+      setHeatmap(await response.json())
+    } catch (err) {
+      console.error(err)
+    }
+  }
+
+  // One column per week, Sunday at the top; the first column is padded up to the start day
+  const cells = useMemo(() => {
+    if (!heatmap) return []
+    const start = new Date(`${heatmap.start}T00:00:00Z`)
+    const padding: (Cell | null)[] = Array(start.getUTCDay()).fill(null)
+    return padding.concat(
+      decodeCounts(heatmap).map((count, i) => {
+        const day = new Date(start.getTime() + i * 86400000)
+        return { date: day.toISOString().split("T")[0], count }
+      }),
+    )
+  }, [heatmap])
+
+  if (!heatmap) return null
+
+  return (
+    <div className="heatmap-container">
+      <h2 className="heatmap-title">Activity</h2>
+      <div className="heatmap-grid">
+        {cells.map((cell, i) =>
+          cell ? (
+            <div
+              key={cell.date}
+              className={`heatmap-cell heatmap-level-${level(cell.count, heatmap.max)}`}
+              title={`${cell.date}: ${cell.count} completed`}
+            />
+          ) : (
+            <div key={`pad-${i}`} className="heatmap-cell heatmap-pad" />
+          ),
+        )}
+      </div>
+    </div>
+  )
+}
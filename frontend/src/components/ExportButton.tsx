@@ -9,9 +9,40 @@ export default function ExportButton({ habitId }: ExportButtonProps) {
   const { token } = useAuth()
   const API_URL = (import.meta as any).env.VITE_API_URL || "http://localhost:8000"
 
+  const waitForPdfJob = async (): Promise<string> => {
+    const submit = await fetch(`${API_URL}/api/export/pdf/jobs`, {
+      method: "POST",
+      headers: {
+        Authorization: `Bearer ${token}`,
+      },
+    })
+    if (!submit.ok) {
+      throw new Error("Export failed")
+    }
+    let job = await submit.json()
+    while (job.status === "pending") {
+      await new Promise((resolve) => setTimeout(resolve, 1000))
+      const poll = await fetch(`${API_URL}/api/export/pdf/jobs/${job.id}`, {
+        headers: {
+          Authorization: `Bearer ${token}`,
+        },
+      })
+      if (!poll.ok) {
+        throw new Error("Export failed")
+      }
+      job = await poll.json()
+    }
+    if (job.status !== "done") {
+      throw new Error(job.error || "Export failed")
+    }
+    return `${API_URL}/api/export/pdf/jobs/${job.id}/download`
+  }
+
   const handleExport = async (format: "csv" | "pdf") => {
     try {
-      const url = habitId ? `${API_URL}/api/export/${format}?habit_id=${habitId}` : `${API_URL}/api/export/${format}`
+      const url = format === "pdf"
+        ? await waitForPdfJob()
+        : habitId ? `${API_URL}/api/export/${format}?habit_id=${habitId}` : `${API_URL}/api/export/${format}`
 
       const response = await fetch(url, {
         headers: {
@@ -1,5 +1,6 @@
 import { useState, useEffect } from "react"
 import { useAuth } from "../hooks/useAuth"
+import { useHabitEvents } from "../hooks/useHabitEvents"
 import HabitDetailModal from "./HabitDetailModal"
 import ConfirmationModal from "./ConfirmationModal"
 import "../styling/HabitCard.css"
@@ -16,24 +17,35 @@ interface Habit {
 
 interface HabitCardProps {
   habit: Habit
+  initialTodayLog?: any
+  initialStreak?: number
   onDeleted: (habitId: number) => void
   onModalOpen: () => void
   onModalClose: () => void
 }
 
-export default function HabitCard({ habit, onDeleted, onModalOpen, onModalClose }: HabitCardProps) {
+export default function HabitCard({ habit, initialTodayLog, initialStreak, onDeleted, onModalOpen, onModalClose }: HabitCardProps) {
   const [loading, setLoading] = useState(false)
-  const [todayLog, setTodayLog] = useState<any>(null)
+  const [todayLog, setTodayLog] = useState<any>(initialTodayLog ?? null)
   const [showModal, setShowModal] = useState(false)
   const [showDeleteModal, setShowDeleteModal] = useState(false)
-  const [streak, setStreak] = useState(0)
+  const [streak, setStreak] = useState(initialStreak ?? 0)
   const { token } = useAuth()
 
   const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000"
 
+  // Every check-in (from here, the detail modal or another tab) pushes the log and new streak
+  const eventsConnected = useHabitEvents((event) => {
+    if (event.type !== "log" || event.habit_id !== habit.id) return
+    const today = new Date().toISOString().split("T")[0]
+    if (event.log.date === today) setTodayLog(event.log)
+    setStreak(event.insights.seven_day_streak)
+  })
+
   useEffect(() => {
-    fetchTodayLog()
-    fetchStreak()
+    // The dashboard endpoint already supplies today's log and streak
+    if (initialTodayLog === undefined) fetchTodayLog()
+    if (initialStreak === undefined) fetchStreak()
   }, [])
 
   const fetchTodayLog = async () => {
@@ -94,8 +106,9 @@ export default function HabitCard({ habit, onDeleted, onModalOpen, onModalClose
         throw new Error(`Failed to log habit: ${response.status} ${errorText}`)
       }
       
-      await fetchTodayLog()
-      await fetchStreak()
+      setTodayLog(await response.json())
+      // With the event stream open the new streak arrives as a "log" event
+      if (!eventsConnected) await fetchStreak()
     } catch (err) {
       console.error('Logging error:', err)
     } finally {
@@ -198,8 +211,10 @@ export default function HabitCard({ habit, onDeleted, onModalOpen, onModalClose
           onClose={() => {
             setShowModal(false)
             onModalClose()
-            fetchTodayLog()
-            fetchStreak()
+            if (!eventsConnected) {
+              fetchTodayLog()
+              fetchStreak()
+            }
           }}
         />
       )}
@@ -1,5 +1,6 @@
 import { useState, useEffect, useMemo } from "react"
 import { useAuth } from "../hooks/useAuth"
+import { useHabitEvents } from "../hooks/useHabitEvents"
 import { LineChart, Line, BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from "recharts"
 import "../styling/HabitDetailModal.css"
 
@@ -27,6 +28,7 @@ export default function HabitDetailModal({ habit, onClose }: HabitDetailModalPro
   const [logValue, setLogValue] = useState("")
   const [selectedDate, setSelectedDate] = useState(new Date().toISOString().split("T")[0])
   const [activeTab, setActiveTab] = useState<"logs" | "weekly" | "monthly" | "daily">("logs")
+  const [trendsStale, setTrendsStale] = useState(false)
   const { token } = useAuth()
 
   const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000"
@@ -35,6 +37,31 @@ export default function HabitDetailModal({ habit, onClose }: HabitDetailModalPro
     fetchData()
   }, [])
 
+  // A pushed log is patched into the logs, insights and daily chart; the trend
+  // buckets can't be patched without the old log, so they are refetched when shown
+  const eventsConnected = useHabitEvents((event) => {
+    if (event.type === "log" && event.habit_id === habit.id) {
+      const log = event.log
+      setInsights(event.insights)
+      setLogs((current) => {
+        const windowStart = new Date(Date.now() - 30 * 86400000).toISOString().split("T")[0]
+        if (log.date < windowStart) return current
+        const others = current.filter((l) => l.date !== log.date)
+        return [...others, log].sort((a, b) => a.date.localeCompare(b.date))
+      })
+      setChartData((current) =>
+        current.map((d) => (d.date === log.date ? { ...d, completed: log.completed, value: log.value } : d)),
+      )
+      setTrendsStale(true)
+    } else if (event.type === "resync" || (event.type === "logs_changed" && event.habit_ids.includes(habit.id))) {
+      fetchData()
+    }
+  })
+
+  useEffect(() => {
+    if (trendsStale && (activeTab === "weekly" || activeTab === "monthly")) fetchTrends()
+  }, [trendsStale, activeTab])
+
   const chartSeriesData = useMemo(() => {
     const isBoolean = habit.htype === "boolean"
     return chartData.map((d) => ({
@@ -44,33 +71,36 @@ export default function HabitDetailModal({ habit, onClose }: HabitDetailModalPro
   }, [chartData, habit.htype])
 
   const fetchData = async () => {
+    setTrendsStale(false)
     try {
-      const thirtyDaysAgo = new Date(Date.now() - 30 * 24 * 60 * 60 * 1000).toISOString().split("T")[0]
-      const today = new Date().toISOString().split("T")[0]
+      const response = await fetch(
+        `${API_URL}/api/habits/${habit.id}/analytics?sections=logs,insights,weekly,monthly,daily&days=30`,
+        { headers: { Authorization: `Bearer ${token}` } },
+      )
+      if (!response.ok) return
 
-      const [logsRes, insightsRes, weeklyRes, monthlyRes, chartRes] = await Promise.all([
-        fetch(`${API_URL}/api/habits/${habit.id}/logs?start_date=${thirtyDaysAgo}&end_date=${today}`, {
-          headers: { Authorization: `Bearer ${token}` },
-        }),
-        fetch(`${API_URL}/api/habits/${habit.id}/insights`, {
-          headers: { Authorization: `Bearer ${token}` },
-        }),
-        fetch(`${API_URL}/api/habits/${habit.id}/trends/weekly`, {
-          headers: { Authorization: `Bearer ${token}` },
-        }),
-        fetch(`${API_URL}/api/habits/${habit.id}/trends/monthly`, {
-          headers: { Authorization: `Bearer ${token}` },
-        }),
-        fetch(`${API_URL}/api/habits/${habit.id}/chart-data?days=30`, {
-          headers: { Authorization: `Bearer ${token}` },
-        }),
-      ])
+      const analytics = await response.json()
+      setLogs(analytics.logs)
+      setInsights(analytics.insights)
+      setWeeklyTrend(analytics.weekly)
+      setMonthlyTrend(analytics.monthly)
+      setChartData(analytics.daily)
+    } catch (err) {
+      console.error(err)
+    }
+  }
+
+  const fetchTrends = async () => {
+    setTrendsStale(false)
+    try {
+      const response = await fetch(`${API_URL}/api/habits/${habit.id}/analytics?sections=weekly,monthly`, {
+        headers: { Authorization: `Bearer ${token}` },
+      })
+      if (!response.ok) return
 
-      if (logsRes.ok) setLogs(await logsRes.json())
-      if (insightsRes.ok) setInsights(await insightsRes.json())
-      if (weeklyRes.ok) setWeeklyTrend(await weeklyRes.json())
-      if (monthlyRes.ok) setMonthlyTrend(await monthlyRes.json())
-      if (chartRes.ok) setChartData(await chartRes.json())
+      const analytics = await response.json()
+      setWeeklyTrend(analytics.weekly)
+      setMonthlyTrend(analytics.monthly)
     } catch (err) {
       console.error(err)
     }
@@ -93,7 +123,8 @@ export default function HabitDetailModal({ habit, onClose }: HabitDetailModalPro
 
       if (response.ok) {
         setLogValue("")
-        await fetchData()
+        // With the event stream open the change arrives as a "log" event
+        if (!eventsConnected) await fetchData()
       }
     } catch (err) {
       console.error(err)
@@ -1,5 +1,6 @@
 import { useState, useEffect } from "react"
 import { useAuth } from "../hooks/useAuth"
+import { useHabitEvents } from "../hooks/useHabitEvents"
 import HabitCard from "./HabitCard"
 import "../styling/HabitList.css"
 
@@ -13,13 +14,29 @@ interface Habit {
   start_date: string
 }
 
+interface HabitLog {
+  id: number
+  habit_id: number
+  date: string
+  value: number | null
+  completed: boolean
+}
+
+interface DashboardEntry {
+  habit: Habit
+  today_log: HabitLog | null
+  insights: {
+    seven_day_streak: number
+  }
+}
+
 interface HabitListProps {
   onModalOpen: () => void
   onModalClose: () => void
 }
 
 export default function HabitList({ onModalOpen, onModalClose }: HabitListProps) {
-  const [habits, setHabits] = useState<Habit[]>([])
+  const [habits, setHabits] = useState<DashboardEntry[]>([])
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState("")
   const { token } = useAuth()
@@ -30,9 +47,23 @@ export default function HabitList({ onModalOpen, onModalClose }: HabitListProps)
     fetchHabits()
   }, [])
 
+  useHabitEvents((event) => {
+    if (event.type === "habit_created") {
+      setHabits((current) =>
+        current.some((entry) => entry.habit.id === event.habit.id)
+          ? current
+          : [...current, { habit: event.habit, today_log: null, insights: { seven_day_streak: 0 } }],
+      )
+    } else if (event.type === "habit_archived") {
+      setHabits((current) => current.filter((entry) => entry.habit.id !== event.habit_id))
+    } else if (event.type === "logs_changed" || event.type === "resync") {
+      fetchHabits()
+    }
+  })
+
   const fetchHabits = async () => {
     try {
-      const response = await fetch(`${API_URL}/api/habits`, {
+      const response = await fetch(`${API_URL}/api/dashboard`, {
         headers: {
           Authorization: `Bearer ${token}`,
         },
@@ -50,7 +81,7 @@ export default function HabitList({ onModalOpen, onModalClose }: HabitListProps)
   }
 
   const handleHabitDeleted = (habitId: number) => {
-    setHabits(habits.filter((h) => h.id !== habitId))
+    setHabits((current) => current.filter((h) => h.habit.id !== habitId))
   }
 
   if (loading) {
@@ -72,10 +103,12 @@ export default function HabitList({ onModalOpen, onModalClose }: HabitListProps)
   return (
     <div className="habits-container">
       <h2 className="habits-title">Your Habits</h2>
-      {habits.map((habit) => (
+      {habits.map((entry) => (
         <HabitCard 
-          key={habit.id} 
-          habit={habit} 
+          key={entry.habit.id} 
+          habit={entry.habit} 
+          initialTodayLog={entry.today_log}
+          initialStreak={entry.insights.seven_day_streak}
           onDeleted={handleHabitDeleted}
           onModalOpen={onModalOpen}
           onModalClose={onModalClose}
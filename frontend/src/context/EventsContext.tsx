@@ -0,0 +1,95 @@
+import { createContext, useState, useEffect, useRef, useCallback, type ReactNode } from "react"
+import { useAuth } from "../hooks/useAuth"
+
+export interface HabitEvent {
+  type: "log" | "habit_created" | "habit_archived" | "logs_changed" | "resync"
+  [key: string]: any
+}
+
+type Listener = (event: HabitEvent) => void
+
+export interface EventsContextType {
+  // True while the event stream is open; when false, components refetch after writes as before
+  connected: boolean
+  subscribe: (listener: Listener) => () => void
+}
+
+export const EventsContext = createContext<EventsContextType | undefined>(undefined)
+
+// Parse "event: ...\ndata: ...\n\n" blocks; comments (heartbeats) and retry lines are skipped
+function parseEvents(buffer: string): { events: HabitEvent[]; rest: string } {
+  const blocks = buffer.split("\n\n")
+  const rest = blocks.pop() ?? ""
+  const events = blocks.flatMap((block) => {
+    const data = block
+      .split("\n")
+      .filter((line) => line.startsWith("data: "))
+      .map((line) => line.slice(6))
+      .join("\n")
+    return data ? [JSON.parse(data) as HabitEvent] : []
+  })
+  return { events, rest }
+}
+
+export function EventsProvider({ children }: { children: ReactNode }) {
+  const [connected, setConnected] = useState(false)
+  const listeners = useRef(new Set<Listener>())
+  const { token } = useAuth()
+
+  const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000"
+
+  useEffect(() => {
+    if (!token) return
+    const controller = new AbortController()
+    let retryDelay = 1000
+    let reconnecting = false
+
+    // fetch rather than EventSource, which cannot send the Authorization header
+    const connect = async () => {
+      while (!controller.signal.aborted) {
+        try {
+          const response = await fetch(`${API_URL}/api/events`, {
+            headers: { Authorization: `Bearer ${token}` },
+            signal: controller.signal,
+          })
+          if (!response.ok || !response.body) throw new Error(`Event stream failed: ${response.status}`)
+          setConnected(true)
+          retryDelay = 1000
+          // Events sent while the stream was down are lost, so everyone refetches once it is back
+          if (reconnecting) listeners.current.forEach((listener) => listener({ type: "resync" }))
+          const reader = response.body.pipeThrough(new TextDecoderStream()).getReader()
+          let buffer = ""
+          while (true) {
+            const { value, done } = await reader.read()
+            if (done) break
+            const parsed = parseEvents(buffer + value)
+            buffer = parsed.rest
+            parsed.events.forEach((event) => listeners.current.forEach((listener) => listener(event)))
+          }
+        } catch (err) {
+          if (controller.signal.aborted) return
+          console.error("Event stream error:", err)
+        }
+        setConnected(false)
+        reconnecting = true
+        await new Promise((resolve) => setTimeout(resolve, retryDelay))
+        retryDelay = Math.min(retryDelay * 2, 30000)
+      }
+    }
+
+    connect()
+    return () => {
+      controller.abort()
+      setConnected(false)
+    }
+  }, [token])
+
+  const subscribe = useCallback((listener: Listener) => {
+    listeners.current.add(listener)
+    return () => {
+      listeners.current.delete(listener)
+    }
+  }, [])
+
+  return <EventsContext.Provider value={{ connected, subscribe }}>{children}</EventsContext.Provider>
+}
@@ -0,0 +1,17 @@
+import { useContext, useEffect, useRef } from "react"
+import { EventsContext, type HabitEvent } from "../context/EventsContext"
+
+// Call handler for every pushed event; returns whether the event stream is connected
+export function useHabitEvents(handler: (event: HabitEvent) => void): boolean {
+  const context = useContext(EventsContext)
+  if (!context) {
+    throw new Error("useHabitEvents must be used within EventsProvider")
+  }
+  const handlerRef = useRef(handler)
+  handlerRef.current = handler
+  const { subscribe, connected } = context
+
+  useEffect(() => subscribe((event) => handlerRef.current(event)), [subscribe])
+
+  return connected
+}
@@ -3,6 +3,7 @@ import { useAuth } from "../hooks/useAuth"
 import HabitList from "../components/HabitList"
 import AddHabitForm from "../components/AddHabitForm"
 import ExportButton from "../components/ExportButton"
+import ActivityHeatmap from "../components/ActivityHeatmap"
 import "../styling/DashboardPage.css"
 
 export default function DashboardPage() {
@@ -44,6 +45,7 @@ export default function DashboardPage() {
       </header>
 
       <main className="dashboard-main">
+        <ActivityHeatmap key={refreshTrigger} />
         <div className="dashboard-grid">
           <div className="form-section">
             <AddHabitForm onHabitAdded={handleHabitAdded} />